@@ -0,0 +1,47 @@
+"""Fail when importing the CLI entry point gets slower than the budget, or pulls in
+modules it should never need, such as the GUI toolkit.
+
+Uses `python -X importtime`. Run from the repository root:
+    python benchmarks/import_budget.py [budget_ms]
+"""
+import subprocess
+import sys
+
+ENTRY_POINT = 'clinic.cli.clinic_cli'
+BUDGET_MS = 150
+FORBIDDEN = ('PyQt6', 'clinic.gui', 'sqlite3')
+
+
+def import_times(module):
+    """Return {module name: cumulative microseconds} for one cold import of module."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    # best of a few runs, so a busy machine does not fail the check on its own
+    runs = [import_times(ENTRY_POINT) for _ in range(3)]
+    elapsed_ms = min(run[ENTRY_POINT] for run in runs) / 1000
+    forbidden = sorted(name for name in runs[0] if name.startswith(FORBIDDEN))
+
+    print(f'import {ENTRY_POINT}: {elapsed_ms:.1f} ms (budget {budget_ms:.0f} ms)')
+    failed = False
+    if elapsed_ms > budget_ms:
+        print('FAIL: CLI startup is over its import-time budget')
+        failed = True
+    if forbidden:
+        print('FAIL: CLI startup imports ' + ', '.join(forbidden))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare the memory used by 100k patients and 1M notes in the slotted layout against
+the previous dict-backed layout, where every Patient eagerly owned a PatientRecord and
+a NoteDAOPickle.
+
+Run from the repository root:
+    python benchmarks/memory_benchmark.py
+"""
+import gc
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, '.')
+
+from clinic.note import Note
+from clinic.patient import Patient
+
+PATIENTS = 100_000
+NOTES = 1_000_000
+
+
+class DictNoteDAO:
+    def __init__(self):
+        self.autosave = False
+        self.notes = []
+        self.autocounter = 0
+        self.filename = ''
+
+
+class DictPatientRecord:
+    def __init__(self):
+        self.note_dao = DictNoteDAO()
+
+
+class DictPatient:
+    def __init__(self, phn, name, birth_date, phone, email, address):
+        self.phn = phn
+        self.name = name
+        self.birth_date = birth_date
+        self.phone = phone
+        self.email = email
+        self.address = address
+        self.patient_record = DictPatientRecord()
+
+
+class DictNote:
+    def __init__(self, code, text, timestamp):
+        self.code = code
+        self.text = text
+        self.timestamp = timestamp
+
+
+def patient_fields(phn):
+    # built fresh each time, the way json decoding hands them over
+    birth_date = '%04d-%02d-%02d' % (1940 + phn % 70, 1 + phn % 12, 1 + phn % 28)
+    return (phn, f'Patient {phn}', birth_date, f'250{phn:07d}', f'patient{phn}@example.com', f'{phn} Main Street')
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    objects = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    gc.collect()
+    return size
+
+
+def main():
+    start = datetime(2024, 1, 1)
+    results = [
+        ('patients, dict-backed', PATIENTS,
+            measure(lambda: [DictPatient(*patient_fields(phn)) for phn in range(PATIENTS)])),
+        ('patients, slotted', PATIENTS,
+            measure(lambda: [Patient(*patient_fields(phn), autosave=True) for phn in range(PATIENTS)])),
+        ('notes, dict-backed', NOTES,
+            measure(lambda: [DictNote(code, 'note text', start + timedelta(seconds=code)) for code in range(NOTES)])),
+        ('notes, slotted', NOTES,
+            measure(lambda: [Note(code, 'note text', start + timedelta(seconds=code)) for code in range(NOTES)])),
+    ]
+    for label, count, size in results:
+        print(f'{label:24} {count:>9} objects {size / 2**20:9.1f} MiB {size / count:7.0f} bytes each')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""Show that PHN lookups and set_current_patient cost the same whatever the roster size.
+
+Run from the repository root:
+    python benchmarks/phn_lookup_benchmark.py
+"""
+import random
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from clinic.dao.patient_dao_json import PatientDAOJSON
+
+SIZES = (1_000, 10_000, 100_000)
+LOOKUPS = 20_000
+
+
+def build(size):
+    dao = PatientDAOJSON(autosave=False)
+    for phn in range(1, size + 1):
+        dao.create_patient(phn, f'Patient {phn}', '1980-01-01', '2500000000', f'p{phn}@example.com', 'Main St')
+    return dao
+
+
+def main():
+    print(f'{"patients":>10} {"search_patient":>16} {"set_current_patient":>21}')
+    for size in SIZES:
+        dao = build(size)
+        phns = [random.randint(1, size) for _ in range(LOOKUPS)]
+        search = min(timeit.repeat(lambda: [dao.search_patient(phn) for phn in phns], number=1, repeat=5))
+        current = min(timeit.repeat(lambda: [dao.set_current_patient(phn) for phn in phns], number=1, repeat=5))
+        print(f'{size:>10} {search / LOOKUPS * 1e6:>13.2f} us {current / LOOKUPS * 1e6:>18.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Load a running `python -m clinic serve` with concurrent keep-alive clients and report
+throughput and latency.
+
+Each client logs in with a session of its own, keeps one connection open and
+sends a mix of patient lookups, name searches and note listings for the patients
+already in the store. Run from the repository root, with the server started in
+another terminal:
+    python benchmarks/server_load.py [port] [clients] [requests per client] [username] [password]
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+HOST = '127.0.0.1'
+
+
+async def request(reader, writer, method, path, payload=None, token=None):
+    """Send one request on a kept-alive connection; return (status, decoded body)."""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    auth = f'Authorization: Bearer {token}\r\n' if token else ''
+    writer.write(f'{method} {path} HTTP/1.1\r\nHost: {HOST}\r\n{auth}Content-Length: {len(body)}\r\n\r\n'.encode()
+        + body)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    data = await reader.readexactly(length) if length else b''
+    return status, json.loads(data) if data else None
+
+
+async def client(port, count, phns, names, latencies, errors, username, password):
+    """One clinician: logs in with a session of their own, then sends count requests."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    _, answer = await request(reader, writer, 'POST', '/login', {'username': username, 'password': password})
+    token = answer['token']
+    try:
+        for _ in range(count):
+            roll = random.random()
+            if roll < 0.6:
+                path = f'/patients/{random.choice(phns)}'
+            elif roll < 0.85:
+                path = f'/patients?name={random.choice(names)}'
+            else:
+                path = f'/patients/{random.choice(phns)}/notes?limit=20'
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, 'GET', path, token=token)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        await request(reader, writer, 'POST', '/logout', token=token)
+        writer.close()
+
+
+async def run(port, clients, count, username, password):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    status, answer = await request(reader, writer, 'POST', '/login', {'username': username, 'password': password})
+    if status != 200:
+        sys.exit(f'login failed: {status} {answer}')
+    status, patients = await request(reader, writer, 'GET', '/patients?limit=1000', token=answer['token'])
+    await request(reader, writer, 'POST', '/logout', token=answer['token'])
+    writer.close()
+    if not patients:
+        sys.exit('the store has no patients to look up')
+    phns = [patient['phn'] for patient in patients]
+    names = [patient['name'].split()[0] for patient in patients]
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, count, phns, names, latencies, errors, username, password)
+        for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f'{len(latencies)} requests from {clients} clients in {elapsed:.2f} s: {len(latencies) / elapsed:.0f} req/s')
+    print(f'latency p50 {percentile(0.50):.2f} ms  p95 {percentile(0.95):.2f} ms  p99 {percentile(0.99):.2f} ms')
+    if errors:
+        print(f'{len(errors)} requests failed, e.g. status {errors[0]}')
+
+
+def main():
+    args = sys.argv[1:]
+    port = int(args[0]) if len(args) > 0 else 8080
+    clients = int(args[1]) if len(args) > 1 else 20
+    count = int(args[2]) if len(args) > 2 else 500
+    username = args[3] if len(args) > 3 else 'user'
+    password = args[4] if len(args) > 4 else '123456'
+    asyncio.run(run(port, clients, count, username, password))
+
+
+if __name__ == '__main__':
+    main()
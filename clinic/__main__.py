@@ -1,27 +1,34 @@
-import os
 import sys
-from clinic.cli.clinic_cli import ClinicCLI
-import clinic.gui.clinic_gui
 
 def main():
 	# You can run either a command-line interface (CLI) 
 	# or a graphical user interface (GUI) to your clinic.
-	if len(sys.argv) != 2:
+	# or serve the clinic as a JSON API over HTTP.
+	if len(sys.argv) != 2 and not (len(sys.argv) == 3 and sys.argv[1] == 'serve'):
 		print('ERROR: wrong number of arguments')
 		print('\nCorrect Command usage:')
 		print('python -m clinic option')
-		print('where option is either cli or gui')
+		print('where option is either cli, gui or serve [port]')
 		sys.exit()
 
+	# each mode imports only what it needs, so the CLI never loads the GUI toolkit
 	if sys.argv[1] == 'cli':
+		from clinic.cli.clinic_cli import ClinicCLI
 		ClinicCLI()
 	elif sys.argv[1] == 'gui':
+		import clinic.gui.clinic_gui
 		clinic.gui.clinic_gui.main()
+	elif sys.argv[1] == 'serve':
+		from clinic.server import main as serve
+		if len(sys.argv) == 3 and not sys.argv[2].isdigit():
+			print('ERROR: the port must be a number')
+			sys.exit()
+		serve(int(sys.argv[2]) if len(sys.argv) == 3 else 8080)
 	else:
 		print('ERROR: Wrong argument')
 		print('\nCorrect Command usage:')
 		print('python -m clinic option')
-		print('where option is either cli or gui')
+		print('where option is either cli, gui or serve [port]')
 
 
 if __name__ == '__main__':
@@ -2,6 +2,8 @@ from clinic.controller import Controller
 from clinic.exception.illegal_access_exception import IllegalAccessException
 from clinic.exception.no_current_patient_exception import NoCurrentPatientException
 
+PAGE_SIZE = 10
+
 class AppointmentMenuCLI():
 
     def __init__(self, controller):
@@ -23,20 +25,23 @@ class AppointmentMenuCLI():
                 self.retrieve_notes()
                 input('Type ENTER to continue.')
             elif response == 3:
-                self.update_note()
+                self.retrieve_notes('prefix')
                 input('Type ENTER to continue.')
             elif response == 4:
-                self.delete_note()
+                self.update_note()
                 input('Type ENTER to continue.')
             elif response == 5:
-                self.list_full_patient_record()
+                self.delete_note()
                 input('Type ENTER to continue.')
             elif response == 6:
+                self.list_full_patient_record()
+                input('Type ENTER to continue.')
+            elif response == 7:
                 self.end_appointment()
                 print('\nAPPOINTMENT FINISHED.')
                 break
             else:
-                print('\nWRONG CHOICE. Please pick a choice between 1 and 6.')
+                print('\nWRONG CHOICE. Please pick a choice between 1 and 7.')
                 input('Type ENTER to continue.')
         return
 
@@ -44,10 +49,11 @@ class AppointmentMenuCLI():
         print('\n\nMEDICAL CLINIC SYSTEM - APPOINTMENT MENU\n\n')
         print('1 - Add note to patient record')
         print('2 - Retrieve notes from patient record by text')
-        print('3 - Change note from patient record')
-        print('4 - Remove note from patient record')
-        print('5 - List full patient record')
-        print('6 - Finish appointment')
+        print('3 - Retrieve notes from patient record by words starting with the text')
+        print('4 - Change note from patient record')
+        print('5 - Remove note from patient record')
+        print('6 - List full patient record')
+        print('7 - Finish appointment')
 
     def create_note(self):
         print('ADD NOTE TO PATIENT RECORD:')
@@ -61,11 +67,16 @@ class AppointmentMenuCLI():
             print('\nERROR ADDING NEW NOTE.') 
             print('Cannot add a note without a valid current patient.')
 
-    def retrieve_notes(self):
-        print('RETRIEVE NOTES FROM PATIENT RECORD BY TEXT:')
+    def retrieve_notes(self, match='substring'):
+        # 'substring' finds the text anywhere in a note, 'prefix' finds notes with
+        # words starting with each search word, in any order
+        if match == 'prefix':
+            print('RETRIEVE NOTES FROM PATIENT RECORD BY WORDS:')
+        else:
+            print('RETRIEVE NOTES FROM PATIENT RECORD BY TEXT:')
         try:
             search_string = input('Search for: ')
-            found_notes = self.controller.retrieve_notes(search_string)
+            found_notes = self.controller.retrieve_notes(search_string, match)
             if found_notes:
                 print('\nNotes found for %s:\n' % search_string)
                 for note in found_notes:
@@ -126,12 +137,20 @@ class AppointmentMenuCLI():
     def list_full_patient_record(self):
         print('LIST FULL PATIENT RECORD:\n')
         try:
-            notes = self.controller.list_notes()
-            if notes:
+            before_code = None
+            while True:
+                notes = self.controller.list_notes(PAGE_SIZE, before_code)
+                if not notes:
+                    if before_code is None:
+                        print('\nPatient record is empty.\n')
+                    break
                 for note in notes:
                     self.print_note_data(note)
-            else:
-                print('\nPatient record is empty.\n')
+                if len(notes) < PAGE_SIZE:
+                    break
+                if input('Type n for older notes, or ENTER to stop: ').lower() != 'n':
+                    break
+                before_code = notes[-1].code
         except IllegalAccessException:
             print('\nMUST LOGIN FIRST.')
         except NoCurrentPatientException:
@@ -7,7 +7,8 @@ from getpass import getpass
 class ClinicCLI():
 
 	def __init__(self):
-		self.controller = Controller(autosave=True)
+		# several terminals can work on the same data directory
+		self.controller = Controller(autosave=True, journal=True, shared=True)
 		self.main_menu_cli = MainMenuCLI(self.controller)
 		self.login_menu()
 
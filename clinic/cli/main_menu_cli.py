@@ -4,6 +4,8 @@ from clinic.exception.illegal_access_exception import IllegalAccessException
 from clinic.exception.illegal_operation_exception import IllegalOperationException
 from clinic.cli.appointment_menu_cli import AppointmentMenuCLI
 
+PAGE_SIZE = 20
+
 class MainMenuCLI():
 
     def __init__(self, controller):
@@ -110,6 +112,12 @@ class MainMenuCLI():
                 print('\nPatients found with name %s:\n' % search_string)
                 for patient in found_patients:
                     print(patient)
+                return
+            similar_patients = self.controller.retrieve_patients(search_string, 'fuzzy')
+            if similar_patients:
+                print('\nNo exact match. Patients with a similar name to %s:\n' % search_string)
+                for patient in similar_patients:
+                    print(patient)
             else:
                 print('\nNo patients found with name: %s\n' % search_string)
         except IllegalAccessException:
@@ -184,12 +192,20 @@ class MainMenuCLI():
     def list_all_patients(self):
         print('LIST ALL PATIENTS:\n')
         try:
-            patients = self.controller.list_patients()
-            if patients:
+            after = None
+            while True:
+                patients = self.controller.list_patients(PAGE_SIZE, after)
+                if not patients:
+                    if after is None:
+                        print('\nNo patients registered in the clinic.\n')
+                    break
                 for patient in patients:
                     print(patient)
-            else:
-                print('\nNo patients registered in the clinic.\n')
+                if len(patients) < PAGE_SIZE:
+                    break
+                if input('\nType n for the next page, or ENTER to stop: ').lower() != 'n':
+                    break
+                after = patients[-1].phn
         except IllegalAccessException:
             print('\nMUST LOGIN FIRST.')
 
@@ -2,7 +2,7 @@ from clinic.patient import Patient
 from clinic.note import Note
 from clinic.patient_record import PatientRecord
 from datetime import datetime
-from typing import List
+from typing import List, Tuple
 from clinic.exception.invalid_login_exception import InvalidLoginException
 from clinic.exception.duplicate_login_exception import DuplicateLoginException
 from clinic.exception.invalid_logout_exception import InvalidLogoutException
@@ -11,29 +11,112 @@ from clinic.exception.illegal_operation_exception import IllegalOperationExcepti
 from clinic.exception.no_current_patient_exception import NoCurrentPatientException
 from clinic.dao.patient_dao_json import PatientDAOJSON
 from clinic.dao.note_dao_pickle import NoteDAOPickle
+from clinic.dao.clinic_note_index import ClinicNoteIndex
+from clinic.query_cache import QueryCache
+from clinic.session import Session
+from functools import wraps
 import hashlib
+import atexit
+import threading
+
+def with_session(method):
+  """Run a Controller method for a logged in session, by default the one of the last login().
+  Calls from all sessions take turns, so one controller can serve several threads."""
+  @wraps(method)
+  def wrapper(self, *args, session: Session = None, **kwargs):
+    with self._lock:
+      if session is None:
+        session = self._session
+      if not session:
+        raise IllegalAccessException
+      return method(self, *args, session=session, **kwargs)
+  return wrapper
 
 class Controller:
-  def __init__(self, autosave=True):
-    """Initializes the Controller for managing user authentication and patient records."""
-    self._logged_in = False
+  def __init__(self, autosave=True, journal=False, backend='json', group_commit=False, phn_index=False,
+  cache_size=256, shared=False):
+    """Initializes the Controller for managing user authentication and patient records.
+    With journal, patient changes are appended to a log instead of rewriting patients.json.
+    backend is 'json' for patients.json and records/, 'sqlite' for clinic/clinic.db,
+    or 'index' for read-only lookups through the memory-mapped PHN index.
+    With group_commit, saves are coalesced by a background writer; see flush().
+    With phn_index, every full save also rewrites the PHN index used by the 'index' backend.
+    Up to cache_size patient and note query results are cached; see cache_stats().
+    With shared, other processes may use the same data directory at the same time: changes are
+    made under a file lock on top of theirs, and theirs are picked up before every query.
+    Several clinicians can use one controller through sessions; see open_session()."""
+    self._session = None
+    self._sessions = set()
+    self._lock = threading.RLock()
     self.patients = {}
     self.autocounter = 0
     self.autosave = autosave
-    self.patient_dao = PatientDAOJSON(autosave)
+    # the other backends are imported on demand to keep startup of the default one fast
+    if backend == 'sqlite':
+      from clinic.dao.patient_dao_sqlite import PatientDAOSQLite
+      self.patient_dao = PatientDAOSQLite(autosave)
+    elif backend == 'index':
+      from clinic.dao.patient_dao_indexed import PatientDAOIndexed
+      self.patient_dao = PatientDAOIndexed()
+    else:
+      self.patient_dao = PatientDAOJSON(autosave, journal, group_commit, phn_index=phn_index, shared=shared)
+    if group_commit:
+      atexit.register(self.flush)
+    self.note_index = None
+    if backend != 'index':
+      self.note_index = ClinicNoteIndex('clinic/notes_index.db' if autosave else ':memory:')
+      self.patient_dao.note_listener = self.note_index
     self.users = self.load_users()
+    self.query_cache = QueryCache(cache_size)
+    self._generations = {}
 
   def _is_logged_in(self) -> bool:
     """Check is the user is logged in."""
-    return self._logged_in
-    
+    return bool(self._session)
+
+  def _is_current_patient(self, phn: int) -> bool:
+    """Check if a patient is the current patient of any session."""
+    return any(session.current_patient is not None and int(session.current_patient.phn) == int(phn)
+      for session in self._sessions)
+
+  def _sync(self, session: Session) -> None:
+    """Pick up what other processes changed in a shared store, and drop the cached results it affects.
+    The DAOs also pick up changes before their own reads, so changes are told by the DAO generations,
+    not by what refresh() returns."""
+    refresh = getattr(self.patient_dao, 'refresh', None)
+    if refresh is None:
+      return
+    refresh()
+    self._invalidate_if_changed('patients', self.patient_dao)
+    current_patient = session.current_patient
+    if current_patient is not None:
+      note_dao = current_patient.patient_record.note_dao
+      note_dao.refresh()
+      self._invalidate_if_changed(self._notes_namespace(current_patient.phn), note_dao)
+
+  def _invalidate_if_changed(self, namespace, dao) -> None:
+    """Drop the cached results of a namespace if its DAO has picked up changes since they were cached."""
+    if self._generations.get(namespace) != dao.generation:
+      self.query_cache.invalidate(namespace)
+      self._generations[namespace] = dao.generation
+
+  def _cached(self, session: Session, namespace, query, run):
+    """Answer a query from the cache, or run it and cache a copy of its result."""
+    self._sync(session)
+    found, result = self.query_cache.get(namespace, query)
+    if not found:
+      result = run()
+      self.query_cache.put(namespace, query, list(result))
+      return result
+    return list(result)
+
+  def _notes_namespace(self, phn: int):
+    """Cache namespace of the note queries of one patient."""
+    return ('notes', int(phn))
+
   def _patient_exists(self, phn: int) -> bool:
     """Check if a patient exists in the records."""
-    try:
-      self.patient_dao.search_patient(phn)
-      return True
-    except IllegalOperationException:
-      return False
+    return self.patient_dao.search_patient(phn) is not None
   
   def load_users(self):
     """Load users from file into a dictionary. Users are predefined if autosave is False."""
@@ -61,150 +144,213 @@ class Controller:
     hex_dig = hash_object.hexdigest()       # Get the hexadecimal digest of the hashed password
     return hex_dig
 
-  def login(self, username: str, password: str) -> bool:
-    """Log in the user."""
-    if self._logged_in:
-        raise DuplicateLoginException
+  def login(self, username: str, password: str) -> Session:
+    """Log in the user. The new session is used by every call that is not given one."""
+    with self._lock:
+      if self._is_logged_in():
+          raise DuplicateLoginException
+      self._session = self.open_session(username, password)
+      return self._session
+
+  def open_session(self, username: str, password: str) -> Session:
+    """Log in a user alongside the ones already logged in, such as another clinician of the same clinic."""
     if self.users.get(username):
       password_hash = self.get_password_hash(password)
       if self.users.get(username) == password_hash:
-        self._logged_in = True
-        return True
+        session = Session(username)
+        with self._lock:
+          self._sessions.add(session)
+        return session
       else:
         raise InvalidLoginException
     else:
       raise InvalidLoginException
     
-  def logout(self) -> bool:
-    """Log out the user."""
-    if not self._is_logged_in():
-      raise InvalidLogoutException
-    self._logged_in = False
-    return True
+  def logout(self, session: Session = None) -> bool:
+    """Log out the user, or the given session."""
+    with self._lock:
+      if session is None:
+        session = self._session
+      if not session:
+        raise InvalidLogoutException
+      self.flush()
+      session.logged_in = False
+      session.current_patient = None
+      self._sessions.discard(session)
+      if session is self._session:
+        self._session = None
+      return True
+
+  def flush(self) -> None:
+    """Wait until every change made so far is written to disk."""
+    self.patient_dao.flush()
   
-  def create_patient(self, phn: int, name: str, birth_date: str, phone: str, email: str, address: str
-  ) -> Patient:
+  @with_session
+  def create_patient(self, phn: int, name: str, birth_date: str, phone: str, email: str, address: str,
+  session: Session = None) -> Patient:
     """Create a new patient record."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
     try:
       if self.patient_dao.search_patient(phn):
         raise IllegalOperationException
     except IllegalOperationException:
       pass
-    return self.patient_dao.create_patient(phn, name, birth_date, phone, email, address)
+    patient = self.patient_dao.create_patient(phn, name, birth_date, phone, email, address)
+    self.query_cache.invalidate('patients')
+    return patient
   
-  def search_patient(self, phn: int) -> Patient:
+  @with_session
+  def search_patient(self, phn: int, session: Session = None) -> Patient:
     """Search for a patient by phn."""
-    if not self._is_logged_in():
-        raise IllegalAccessException
     return self.patient_dao.search_patient(phn)
 
-  def retrieve_patients(self, name: str) -> List[Patient]:
-    """Retrieve patients by name."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    return self.patient_dao.retrieve_patients(name)
+  @with_session
+  def retrieve_patients(self, name: str, match: str = 'substring', session: Session = None) -> List[Patient]:
+    """Retrieve patients by name. match is 'substring', or 'fuzzy' for names that sound alike."""
+    return self._cached(session, 'patients', ('retrieve', name.lower(), match),
+      lambda: self.patient_dao.retrieve_patients(name, match))
+
+  @with_session
+  def complete_patients(self, prefix: str, limit: int = 10, session: Session = None) -> List[Patient]:
+    """Retrieve up to limit patients whose name, or a word of it, starts with prefix, for search-as-you-type."""
+    return self._cached(session, 'patients', ('complete', prefix.lower(), limit),
+      lambda: self.patient_dao.complete_patients(prefix, limit))
+
+  @with_session
+  def find_patients_by_email(self, email: str, session: Session = None) -> List[Patient]:
+    """Find the patients registered with an email address, ignoring case."""
+    return self.patient_dao.find_patients_by_email(email)
+
+  @with_session
+  def find_patients_by_phone(self, phone: str, session: Session = None) -> List[Patient]:
+    """Find the patients registered with a phone number, comparing digits only."""
+    return self.patient_dao.find_patients_by_phone(phone)
 
+  @with_session
+  def find_patients_born_between(self, start: str, end: str, session: Session = None) -> List[Patient]:
+    """Find the patients born between two dates (YYYY-MM-DD, both included), oldest first."""
+    return self.patient_dao.find_patients_born_between(start, end)
+
+  @with_session
   def update_patient(self, phn: int, new_phn: str, new_name: str, new_birth_date: str, new_phone: str, 
-  new_email: str, new_address: str) -> bool:
+  new_email: str, new_address: str, session: Session = None) -> bool:
     """Update a patient's details."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    if not self._patient_exists(phn):
+    if not self._patient_exists(phn) or self._is_current_patient(phn):
       raise IllegalOperationException
-    return self.patient_dao.update_patient(phn, new_phn, new_name, new_birth_date, new_phone, new_email, new_address)
+    updated = self.patient_dao.update_patient(phn, new_phn, new_name, new_birth_date, new_phone, new_email, new_address)
+    self.query_cache.invalidate('patients')
+    self.query_cache.invalidate(self._notes_namespace(phn))
+    self.query_cache.invalidate(self._notes_namespace(new_phn))
+    return updated
   
-  def delete_patient(self, phn: int) -> bool:
+  @with_session
+  def delete_patient(self, phn: int, session: Session = None) -> bool:
     """Delete a patient's record."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    if not self._patient_exists(phn):
+    if not self._patient_exists(phn) or self._is_current_patient(phn):
       raise IllegalOperationException
     self.patient_dao.delete_patient(phn)
+    self.query_cache.invalidate('patients')
+    self.query_cache.invalidate(self._notes_namespace(phn))
     return True
 
-  def list_patients(self) -> List[Patient]:
-    """List all patients."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    return self.patient_dao.list_patients()
+  @with_session
+  def list_patients(self, limit: int = None, after: int = None, session: Session = None) -> List[Patient]:
+    """List all patients in PHN order. With limit, list one page of patients with a PHN greater than after."""
+    return self._cached(session, 'patients', ('list', limit, after), lambda: self.patient_dao.list_patients(limit, after))
 
-  def set_current_patient(self, phn: int) -> None:
+  @with_session
+  def set_current_patient(self, phn: int, session: Session = None) -> None:
     """Set the current active patient."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    return self.patient_dao.set_current_patient(phn)
+    session.current_patient = self.patient_dao.open_patient(phn)
+    return True
 
-  def get_current_patient(self):
+  @with_session
+  def get_current_patient(self, session: Session = None):
     """Get the current patient."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    return self.patient_dao.get_current_patient()
+    return session.current_patient
 
-  def unset_current_patient(self) -> None:
+  @with_session
+  def unset_current_patient(self, session: Session = None) -> None:
     """Unset the current patient."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    return self.patient_dao.unset_current_patient()
+    session.current_patient = None
 
-  def create_note(self, text: str) -> Note:
+  @with_session
+  def create_note(self, text: str, session: Session = None) -> Note:
     """Create a new note for the current patient."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    if self.patient_dao.get_current_patient() == None:
+    if session.current_patient == None:
       raise NoCurrentPatientException
-    return self.patient_dao.get_current_patient().create_note(text)
+    current_patient = session.current_patient
+    note = current_patient.create_note(text)
+    self.query_cache.invalidate(self._notes_namespace(current_patient.phn))
+    return note
   
-  def search_note(self, code: int) -> Note: 
+  @with_session
+  def search_note(self, code: int, session: Session = None) -> Note: 
     """Search for a note by code."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    current_patient = self.patient_dao.get_current_patient()
+    current_patient = session.current_patient
     if not current_patient:
       raise NoCurrentPatientException
     note = current_patient.patient_record.search_note(code)
     return note
     
-  def retrieve_notes(self, text: str) -> List[Note]:
-    """Retrieve notes by text search."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-
-    current_patient = self.patient_dao.get_current_patient()
+  @with_session
+  def retrieve_notes(self, text: str, match: str = 'substring', session: Session = None) -> List[Note]:
+    """Retrieve notes by text search. match is 'substring', 'word' or 'prefix'."""
+    current_patient = session.current_patient
 
     if not current_patient:
       raise NoCurrentPatientException
-    return current_patient.patient_record.retrieve_notes(text)
+    return self._cached(session, self._notes_namespace(current_patient.phn), ('retrieve', text.lower(), match),
+      lambda: current_patient.patient_record.retrieve_notes(text, match))
 
-  def update_note(self, code: int, new_text: str) -> bool:
+  @with_session
+  def update_note(self, code: int, new_text: str, session: Session = None) -> bool:
     """Update a note's text."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    current_patient = self.patient_dao.get_current_patient()
+    current_patient = session.current_patient
     if not current_patient:
       raise NoCurrentPatientException
-    return current_patient.update_note(code, new_text)
+    updated = current_patient.update_note(code, new_text)
+    self.query_cache.invalidate(self._notes_namespace(current_patient.phn))
+    return updated
   
-  def delete_note(self, code: int) -> bool:
+  @with_session
+  def delete_note(self, code: int, session: Session = None) -> bool:
     """Delete a note by code."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    current_patient = self.patient_dao.get_current_patient()
+    current_patient = session.current_patient
     if not current_patient:
       raise NoCurrentPatientException
 
-    return current_patient.delete_note(code)
+    deleted = current_patient.delete_note(code)
+    self.query_cache.invalidate(self._notes_namespace(current_patient.phn))
+    return deleted
     
-  def list_notes(self) -> List[Note]:
-    """List all notes for the current patient from newest to oldest."""
-    if not self._is_logged_in():
-      raise IllegalAccessException
-    current_patient = self.patient_dao.get_current_patient()
+  @with_session
+  def list_notes(self, limit: int = None, before_code: int = None, session: Session = None) -> List[Note]:
+    """List all notes for the current patient from newest to oldest.
+    With limit, list one page of notes with a code lower than before_code."""
+    current_patient = session.current_patient
     if not current_patient:
       raise NoCurrentPatientException
-    return current_patient.patient_record.list_notes()
+    # a copy, as the full listing of the DAO is a live view that other sessions may change
+    return self._cached(session, self._notes_namespace(current_patient.phn), ('list', limit, before_code),
+      lambda: list(current_patient.patient_record.list_notes(limit, before_code)))
 
-  
+  @with_session
+  def search_all_notes(self, text: str, limit: int = 20, prefix: bool = False,
+  session: Session = None) -> List[Tuple[int, int]]:
+    """Search the notes of every patient. Returns (phn, note code) pairs, most recent first."""
+    if self.note_index is None:
+      raise IllegalOperationException
+    if not self.note_index.is_built():
+      self.rebuild_note_index(session=session)
+    return self.note_index.search(text, limit, prefix)
 
+  @with_session
+  def rebuild_note_index(self, session: Session = None) -> None:
+    """Rebuild the clinic-wide note index from the stored notes of every patient."""
+    if self.note_index is None:
+      raise IllegalOperationException
+    self.note_index.rebuild(self.patient_dao.iter_all_notes())
 
+  def cache_stats(self) -> dict:
+    """Hits, misses and size of the query result cache."""
+    return self.query_cache.stats()
@@ -0,0 +1,117 @@
+import os
+import threading
+from clinic.dao.note_index import tokenize
+from typing import Iterable, List, Tuple
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS postings (
+    word TEXT NOT NULL,
+    phn INTEGER NOT NULL,
+    code INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (word, phn, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_note ON postings (phn, code);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+'''
+
+
+class ClinicNoteIndex:
+    """Persistent inverted index over the notes of every patient in the clinic.
+
+    Postings (word, phn, code, timestamp) live in an SQLite file, keyed on the word, so a
+    query only reads the postings of its own words. The note DAOs report every change
+    through note_changed and note_removed, and the patient DAOs report deleted patients
+    and changed PHNs. The database is only opened on first use, so
+    sessions that never touch notes do not pay for it.
+    """
+
+    def __init__(self, filename: str = 'clinic/notes_index.db'):
+        self.filename = filename
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            import sqlite3
+            self._connection = sqlite3.connect(self.filename, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def is_built(self) -> bool:
+        """Check if the index was ever filled from the stored notes."""
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        return row is not None
+
+    def _insert(self, phn: int, note) -> None:
+        timestamp = note.timestamp.isoformat(' ')
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO postings (word, phn, code, timestamp) VALUES (?, ?, ?, ?)',
+            [(word, int(phn), note.code, timestamp) for word in set(tokenize(note.text))])
+
+    def note_changed(self, phn: int, note) -> None:
+        """Index a new note, or re-index a changed one."""
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM postings WHERE phn = ? AND code = ?', (int(phn), note.code))
+            self._insert(phn, note)
+
+    def note_removed(self, phn: int, code: int) -> None:
+        """Drop a deleted note from the index."""
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM postings WHERE phn = ? AND code = ?', (int(phn), code))
+
+    def patient_moved(self, old_phn: int, new_phn: int) -> None:
+        """Move the notes of a patient whose PHN changed over to the new PHN."""
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM postings WHERE phn = ?', (int(new_phn),))
+            self.connection.execute('UPDATE postings SET phn = ? WHERE phn = ?', (int(new_phn), int(old_phn)))
+
+    def patient_removed(self, phn: int) -> None:
+        """Drop every note of a deleted patient from the index."""
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM postings WHERE phn = ?', (int(phn),))
+
+    def rebuild(self, records: Iterable[Tuple[int, Iterable]]) -> None:
+        """Replace the whole index with the given (phn, notes) records."""
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM postings')
+            for phn, notes in records:
+                for note in notes:
+                    self._insert(phn, note)
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+
+    def search(self, query: str, limit: int = 20, prefix: bool = False) -> List[Tuple[int, int]]:
+        """Return (phn, note code) of the notes containing every word of query, newest first.
+
+        With prefix, the words only need to start with the query words.
+        """
+        words = sorted(set(tokenize(query)))
+        if not words:
+            return []
+        with self._lock:
+            if not prefix:
+                rows = self.connection.execute(
+                    'SELECT phn, code, MAX(timestamp) AS latest FROM postings '
+                    'WHERE word IN (' + ', '.join('?' * len(words)) + ') '
+                    'GROUP BY phn, code HAVING COUNT(*) = ? ORDER BY latest DESC LIMIT ?',
+                    words + [len(words), limit]).fetchall()
+                return [(row[0], row[1]) for row in rows]
+            # a query word can match several words of one note, so intersect per query word
+            matches = None
+            for word in words:
+                found = {(row[0], row[1]): row[2] for row in self.connection.execute(
+                    'SELECT phn, code, timestamp FROM postings WHERE word >= ? AND word < ?',
+                    (word, word + '\uffff'))}
+                matches = found if matches is None else {key: matches[key] for key in matches.keys() & found.keys()}
+                if not matches:
+                    return []
+        ranked = sorted(matches.items(), key=lambda item: item[1], reverse=True)
+        return [key for key, _ in ranked[:limit]]
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,81 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Hashable, Iterable, List, Tuple
+
+
+def normalize_email(email: str) -> str:
+    """Emails are matched ignoring case and surrounding spaces."""
+    return email.strip().lower()
+
+
+def normalize_phone(phone: str) -> str:
+    """Phone numbers are matched on their digits only."""
+    return re.sub(r'\D', '', phone)
+
+
+class ExactIndex:
+    """Index from the normalized value of one patient field to the keys of the patients having it."""
+
+    def __init__(self, normalize: Callable[[str], str] = str):
+        self.normalize = normalize
+        self._keys = {}
+        self._values = {}
+
+    def add(self, key: Hashable, value: str) -> None:
+        """Index the field value of the patient stored under key."""
+        value = self.normalize(value)
+        self._values[key] = value
+        self._keys.setdefault(value, []).append(key)
+
+    def remove(self, key: Hashable) -> None:
+        """Drop the patient stored under key from the index."""
+        value = self._values.pop(key, None)
+        keys = self._keys.get(value)
+        if keys is None:
+            return
+        keys.remove(key)
+        if not keys:
+            del self._keys[value]
+
+    def find(self, value: str) -> List[Hashable]:
+        """Keys of the patients whose field equals value once normalized."""
+        return list(self._keys.get(self.normalize(value), ()))
+
+
+class RangeIndex:
+    """Sorted index of one patient field, for range queries such as birth dates between two days.
+
+    ISO dates (YYYY-MM-DD) sort correctly as strings, so they are kept as they are.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._values = {}
+
+    def add(self, key: Hashable, value: str) -> None:
+        """Index the field value of the patient stored under key."""
+        self._values[key] = value
+        insort(self._entries, (value, key))
+
+    def add_all(self, values: Iterable[Tuple[Hashable, str]]) -> None:
+        """Index many (key, value) pairs at once, such as a whole roster on load, sorting only once."""
+        for key, value in values:
+            self._values[key] = value
+            self._entries.append((value, key))
+        self._entries.sort()
+
+    def remove(self, key: Hashable) -> None:
+        """Drop the patient stored under key from the index."""
+        if key not in self._values:
+            return
+        entry = (self._values.pop(key), key)
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def between(self, low: str, high: str) -> List[Hashable]:
+        """Keys of the patients with a value from low to high, both included, in value order."""
+        start = bisect_left(self._entries, (low,))
+        # every (high, key) entry sorts before (high + '\0',)
+        end = bisect_right(self._entries, (high + '\0',))
+        return [key for _, key in self._entries[start:end]]
@@ -0,0 +1,153 @@
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    import fcntl
+except ImportError:
+    # no advisory locks on this platform: only the threads of one process are kept apart
+    fcntl = None
+
+
+# stamps for the changes DAOs pick up from other processes, unique across every DAO of the process
+GENERATIONS = itertools.count(1)
+
+
+def file_identity(filename: str):
+    """Inode, modification time and size of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+class FileLock:
+    """Advisory reader/writer lock on a lock file shared by every process using the data directory.
+
+    Readers hold it shared and writers exclusive, through fcntl.flock. Threads of this
+    process take turns on it. The thread holding it may take it again, and an exclusive
+    hold inside a shared one upgrades the lock until the inner hold ends. Each instance
+    has its own descriptor, so two instances exclude each other even within one process.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = None
+        self._thread_lock = threading.RLock()
+        self._holds = []
+
+    @contextmanager
+    def shared(self):
+        """Hold the lock as a reader."""
+        with self._hold(False):
+            yield
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the lock as the only writer."""
+        with self._hold(True):
+            yield
+
+    @contextmanager
+    def _hold(self, exclusive: bool):
+        with self._thread_lock:
+            held = any(self._holds)
+            if not self._holds or (exclusive and not held):
+                self._flock(exclusive)
+            self._holds.append(exclusive)
+            try:
+                yield
+            finally:
+                self._holds.pop()
+                if not self._holds:
+                    self._unlock()
+                elif exclusive and not held:
+                    # back to the shared hold this one was nested in
+                    self._flock(False)
+
+    def _flock(self, exclusive: bool) -> None:
+        if fcntl is None:
+            return
+        if self._file is None:
+            self._file = open(self.filename, 'a')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _unlock(self) -> None:
+        if fcntl is not None and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        """Release the descriptor of the lock file."""
+        with self._thread_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class TryLock:
+    """Exclusive lock on a lock file that is given up on rather than waited for.
+
+    It is held by the process, not by a thread: one thread may take it and another
+    release it. Like FileLock, two instances exclude each other even within one process.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Take the lock, unless another holder has it. Returns True if taken."""
+        if fcntl is None:
+            return True
+        file = open(self.filename, 'a')
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            return False
+        self._file = file
+        return True
+
+    def release(self) -> None:
+        """Give the lock up, by closing the descriptor that holds it."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def shared_read(method):
+    """Run a DAO method as a reader of the shared store, after picking up the changes of other processes.
+
+    The DAO provides lock (None when the store is not shared) and _refresh(). As reads
+    refresh too, a later refresh() may find nothing new: callers that keep results
+    derived from the DAO compare its generation, which _refresh() renews on every change.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.lock is None:
+            return method(self, *args, **kwargs)
+        with self.lock.shared():
+            self._refresh()
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def exclusive_write(method):
+    """Run a DAO method as the only writer of the shared store, on top of the changes of other processes.
+
+    Besides lock and _refresh(), the DAO provides _remember(), which records the state
+    of the files once this process's own change is written.
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.lock is None:
+            return method(self, *args, **kwargs)
+        with self.lock.exclusive():
+            self._refresh()
+            result = method(self, *args, **kwargs)
+            self._remember()
+            return result
+    return wrapper
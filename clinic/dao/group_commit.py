@@ -0,0 +1,50 @@
+import threading
+
+
+class GroupCommitWriter:
+    """Background writer that coalesces many saves into one.
+
+    DAOs mark themselves dirty after a change instead of writing right away. Their
+    write_pending method is called once from a timer thread after delay seconds,
+    or as soon as batch_size changes have piled up, or on an explicit flush.
+    """
+
+    def __init__(self, delay: float = 1.0, batch_size: int = 50):
+        self.delay = delay
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._dirty = {}
+        self._changes = 0
+        self._timer = None
+
+    def mark_dirty(self, owner) -> None:
+        """Schedule owner.write_pending() for the next group commit."""
+        with self._lock:
+            self._dirty[id(owner)] = owner
+            self._changes += 1
+            if self._changes >= self.batch_size:
+                self._schedule(0)
+            elif self._timer is None:
+                self._schedule(self.delay)
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self) -> None:
+        """Write everything that is dirty now, on the calling thread. This is the durability barrier."""
+        # owners are written outside _lock, so a DAO holding its own locks can still mark itself dirty
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                owners = list(self._dirty.values())
+                self._dirty.clear()
+                self._changes = 0
+            for owner in owners:
+                owner.write_pending()
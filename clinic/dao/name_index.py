@@ -0,0 +1,147 @@
+from bisect import bisect_left, insort
+from typing import Hashable, Iterable, List, Tuple
+
+
+def normalize_name(name: str) -> str:
+    """Case-fold a name and collapse its whitespace."""
+    return ' '.join(name.lower().split())
+
+
+def name_suffixes(name: str) -> List[str]:
+    """The normalized name from each of its words on, such as ['anna smith', 'smith'] for 'Anna  Smith'.
+    A name, or a word of it, starts with a prefix when one of these does."""
+    words = normalize_name(name).split(' ')
+    return [' '.join(words[position:]) for position in range(len(words))]
+
+
+def trigrams(text: str) -> set:
+    """All three-character substrings of text."""
+    return {text[position:position + 3] for position in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Index from the trigrams of case-folded patient names to patient keys.
+
+    A substring query of three or more characters only checks the patients that have
+    every trigram of the query. Shorter queries fall back to a scan of the cached
+    folded names.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._names = {}
+        self._order = {}
+        self._counter = 0
+
+    def add(self, key: Hashable, name: str) -> None:
+        """Index the name of the patient stored under key."""
+        folded = name.lower()
+        self._names[key] = folded
+        self._counter += 1
+        self._order[key] = self._counter
+        for gram in trigrams(folded):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """Drop the patient stored under key from the index."""
+        folded = self._names.pop(key, None)
+        self._order.pop(key, None)
+        if folded is None:
+            return
+        for gram in trigrams(folded):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def search(self, search_string: str) -> List[Hashable]:
+        """Keys of the patients whose name contains search_string, ignoring case, in insertion order."""
+        query = search_string.lower()
+        if len(query) < 3:
+            return [key for key, folded in self._names.items() if query in folded]
+        posting_lists = []
+        for gram in trigrams(query):
+            keys = self._postings.get(gram)
+            if not keys:
+                return []
+            posting_lists.append(keys)
+        posting_lists.sort(key=len)
+        candidates = set(posting_lists[0])
+        for keys in posting_lists[1:]:
+            candidates &= keys
+            if not candidates:
+                return []
+        # trigrams can all match without the query being one contiguous substring
+        found = [key for key in candidates if query in self._names[key]]
+        found.sort(key=self._order.__getitem__)
+        return found
+
+
+class PrefixIndex:
+    """Sorted index of normalized patient names for search-as-you-type.
+
+    Every name is entered once per word, as the rest of the name from that word on, so
+    'smi' finds 'John Smith' as well as 'Smith, Anna'. A prefix is a range of the sorted
+    entries. When the next query extends the previous one, the search starts from the
+    previous range instead of the whole list.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._keys = {}
+        self._entry_ids = {}
+        self._next_id = 0
+        self._last = None
+
+    def _new_entry(self, key: Hashable, name: str) -> List[Tuple[str, int]]:
+        self._next_id += 1
+        entry_id = self._next_id
+        self._keys[entry_id] = key
+        self._entry_ids[key] = (entry_id, name)
+        self._last = None
+        return [(text, entry_id) for text in name_suffixes(name)]
+
+    def add(self, key: Hashable, name: str) -> None:
+        """Index the name of the patient stored under key."""
+        for entry in self._new_entry(key, name):
+            insort(self._entries, entry)
+
+    def add_all(self, names: Iterable[Tuple[Hashable, str]]) -> None:
+        """Index many (key, name) pairs at once, such as a whole roster on load, sorting only once."""
+        for key, name in names:
+            self._entries.extend(self._new_entry(key, name))
+        self._entries.sort()
+
+    def remove(self, key: Hashable) -> None:
+        """Drop the patient stored under key from the index."""
+        entry = self._entry_ids.pop(key, None)
+        if entry is None:
+            return
+        entry_id, name = entry
+        del self._keys[entry_id]
+        for text in name_suffixes(name):
+            position = bisect_left(self._entries, (text, entry_id))
+            if position < len(self._entries) and self._entries[position] == (text, entry_id):
+                del self._entries[position]
+        self._last = None
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Hashable]:
+        """Keys of up to limit patients with a name, or a word of it, starting with prefix."""
+        prefix = normalize_name(prefix)
+        low, high = 0, len(self._entries)
+        if self._last is not None and prefix.startswith(self._last[0]):
+            low, high = self._last[1], self._last[2]
+        low = bisect_left(self._entries, (prefix,), low, high)
+        high = bisect_left(self._entries, (prefix + '\uffff',), low, high)
+        self._last = (prefix, low, high)
+        found = []
+        seen = set()
+        for position in range(low, high):
+            entry_id = self._entries[position][1]
+            if entry_id not in seen:
+                seen.add(entry_id)
+                found.append(self._keys[entry_id])
+                if len(found) == limit:
+                    break
+        return found
@@ -7,7 +7,7 @@ class NoteDAO(ABC):
     def create_note(self, text):
         pass
     @abstractmethod
-    def retrieve_notes(self, search_string):
+    def retrieve_notes(self, search_string, match='substring'):
         pass
     @abstractmethod
     def update_note(self, key, text):
@@ -16,5 +16,5 @@ class NoteDAO(ABC):
     def delete_note(self, key):
         pass
     @abstractmethod
-    def list_notes(self):
+    def list_notes(self, limit=None, before_code=None):
         pass
@@ -1,81 +1,336 @@
+from clinic.exception.illegal_operation_exception import IllegalOperationException
 from clinic.dao.note_dao import NoteDAO
+from clinic.dao.note_index import NoteTextIndex
+from clinic.dao.file_lock import shared_read, exclusive_write, file_identity, GENERATIONS
 from clinic.note import Note
 from datetime import datetime
-from pickle import load, dump
-from typing import Optional, List
+from bisect import bisect_left, insort
+from pickle import load, dump, UnpicklingError
+from typing import Optional, List, Iterator, Union
+from collections.abc import Sequence
+import os
+
+
+class NewestFirstView(Sequence):
+    """Read-only sequence of a patient's notes from newest to oldest. Nothing is copied,
+    iterating walks the code index backwards and view[i] looks up the i-th newest code.
+    It follows later changes to the notes, so take a copy to keep a snapshot."""
+    __slots__ = ('_notes', '_codes')
+
+    def __init__(self, notes: dict, codes: List[int]):
+        self._notes = notes
+        self._codes = codes
+
+    def __len__(self) -> int:
+        return len(self._notes)
+
+    def __iter__(self) -> Iterator[Note]:
+        return reversed(self._notes.values())
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('note index out of range')
+        return self._notes[self._codes[-1 - position]]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
 
 class NoteDAOPickle(NoteDAO):
-    def __init__(self, autosave=False):
+    def __init__(self, autosave=False, compact_after=256):
         self.autosave = autosave
-        self.notes = []
+        self.notes_by_code = {}
+        self.codes = []
         self.autocounter = 0
         self.filename = ''
+        self.log_filename = ''
+        self.compact_after = compact_after
+        self._log_records = 0
+        self._log_current = False
+        self.writer = None
+        # set for patients opened through a read-only DAO, such as PatientDAOIndexed
+        self.read_only = False
+        self._pending = []
+        self.index = NoteTextIndex()
+        self.phn = None
+        self.listener = None
+        self.lock = None
+        self.directory = None
+        self._log_identity = None
+        self._log_offset = 0
+        # renewed whenever notes saved by other processes are picked up
+        self.generation = next(GENERATIONS)
+
+    @property
+    def notes(self) -> List[Note]:
+        """All notes, oldest first"""
+        return list(self.notes_by_code.values())
+
+    def load_notes(self, phn: int, directory: str = 'clinic/records'):
+        """Loads notes of patient with given phn, from the note log or else the old pickle file"""
+        self.phn = phn
+        self.directory = directory
+        self.filename = f'{directory}/{phn}.dat'
+        self.log_filename = f'{directory}/{phn}.notes'
+        self.notes_by_code = {}
+        self.autocounter = 0
+        self._log_records = 0
+        if os.path.exists(self.log_filename):
+            self.replay_log()
+            self._log_current = True
+        else:
+            self._log_current = False
+            try:
+                with open(self.filename, 'rb') as file:
+                    notes = load(file)
+                self.notes_by_code = {int(note.code): note for note in notes}
+                self.autocounter = notes[-1].code if notes else 0
+            except FileNotFoundError:
+                self.notes_by_code = {}
+                self.autocounter = 0
+        self.codes = sorted(self.notes_by_code)
+        self.index.rebuild(self.notes_by_code.values())
+        self._remember()
+
+    def move_notes(self, phn: int, directory: str = 'clinic/records'):
+        """Keep the notes under a new PHN, renaming their saved files to the ones of that PHN"""
+        self._check_writable()
+        if self.autosave:
+            # nothing may still be on its way to the old files
+            if self.writer is not None:
+                self.writer.flush()
+            else:
+                self.write_pending()
+            directory = self.directory or directory
+            for extension in ('.notes', '.dat'):
+                source = f'{directory}/{self.phn}{extension}'
+                target = f'{directory}/{phn}{extension}'
+                if os.path.exists(source):
+                    os.replace(source, target)
+                elif os.path.exists(target):
+                    # left behind by a deleted patient that had this PHN
+                    os.remove(target)
+        self.phn = phn
+        if self.directory is not None:
+            self.filename = f'{self.directory}/{phn}.dat'
+            self.log_filename = f'{self.directory}/{phn}.notes'
 
-    def load_notes(self, phn: int):
-        """Loads notes of patient with given phn"""
-        self.filename = f'clinic/records/{phn}.dat'
+    def read_records(self, offset: int = 0):
+        """Read the records of the note log from offset on. Returns them and the offset after the last whole one."""
+        records = []
         try:
-            with open(self.filename, 'rb') as file:
-                self.notes = load(file)
-            self.autocounter = self.notes[-1].code if self.notes else 0
+            with open(self.log_filename, 'rb') as file:
+                file.seek(offset)
+                while True:
+                    try:
+                        record = load(file)
+                    except (EOFError, UnpicklingError):
+                        # end of the log, or a torn record left by a crash
+                        break
+                    records.append(record)
+                    offset = file.tell()
         except FileNotFoundError:
-            self.notes = []
-            self.autocounter = 0
-        
+            pass
+        return records, offset
+
+    def replay_log(self):
+        """Rebuild the notes by replaying every record of the note log"""
+        notes = {}
+        records, self._log_offset = self.read_records()
+        for record in records:
+            self._log_records += 1
+            op = record[0]
+            if op == 'counter':
+                self.autocounter = max(self.autocounter, record[1])
+            elif op == 'create':
+                notes[record[1]] = Note(record[1], record[2], record[3])
+                self.autocounter = max(self.autocounter, record[1])
+            elif op == 'update' and record[1] in notes:
+                notes[record[1]].text = record[2]
+                notes[record[1]].timestamp = record[3]
+            elif op == 'delete':
+                notes.pop(record[1], None)
+        self.notes_by_code = notes
+
+    def refresh(self) -> bool:
+        """Pick up the notes other processes saved to a shared store. Returns True if a note changed."""
+        if self.lock is None:
+            return False
+        with self.lock.shared():
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        identity = file_identity(self.log_filename)
+        if identity == self._log_identity:
+            return False
+        if identity is not None and self._log_current and identity[0] == self._log_identity[0] \
+                and identity[2] >= self._log_offset:
+            # the log only grew: apply the new records
+            records, self._log_offset = self.read_records(self._log_offset)
+            for record in records:
+                self._apply_record(record)
+        else:
+            # rewritten, or created from the old pickle file
+            self.load_notes(self.phn, self.directory)
+        self._log_identity = identity
+        self.generation = next(GENERATIONS)
+        return True
+
+    def _apply_record(self, record: tuple):
+        """Apply one record written by another process to the loaded notes"""
+        self._log_records += 1
+        op = record[0]
+        if op == 'counter':
+            self.autocounter = max(self.autocounter, record[1])
+            return
+        note = self.notes_by_code.get(record[1])
+        if op == 'create' and note is None:
+            note = Note(record[1], record[2], record[3])
+            if self.codes and note.code < self.codes[-1]:
+                # keep the notes in code order for the newest-first listing
+                self.notes_by_code = dict(sorted({**self.notes_by_code, note.code: note}.items()))
+            else:
+                self.notes_by_code[note.code] = note
+            insort(self.codes, note.code)
+            self.index.add(note.code, note.text)
+            self.autocounter = max(self.autocounter, note.code)
+        elif op in ('create', 'update') and note is not None:
+            self.index.remove(note.code)
+            note.text = record[2]
+            note.timestamp = record[3]
+            self.index.add(note.code, note.text)
+        elif op == 'delete' and note is not None:
+            del self.notes_by_code[note.code]
+            del self.codes[bisect_left(self.codes, note.code)]
+            self.index.remove(note.code)
+
+    def _remember(self):
+        """Record the state of the note log after a change by this process, so it is not read back"""
+        self._log_identity = file_identity(self.log_filename)
+        if self._log_identity is not None:
+            self._log_offset = self._log_identity[2]
+
     def dump_notes(self):
-        """Save current notes"""
-        with open(self.filename, 'wb') as file:
-            dump(self.notes, file)
+        """Save current notes as a compacted note log, one record per note"""
+        tmp_filename = self.log_filename + '.tmp'
+        with open(tmp_filename, 'wb') as file:
+            dump(('counter', self.autocounter), file)
+            for note in list(self.notes_by_code.values()):
+                dump(('create', note.code, note.text, note.timestamp), file)
+        os.replace(tmp_filename, self.log_filename)
+        self._log_records = len(self.notes_by_code) + 1
+        self._log_current = True
+
+    def append_record(self, record: tuple):
+        """Save a single change, right away or with the next group commit when there is a writer"""
+        self._pending.append(record)
+        if self.writer is not None:
+            self.writer.mark_dirty(self)
+        else:
+            self.write_pending()
+
+    def write_pending(self):
+        """Append the unsaved changes to the note log, compacting it once it has grown too long"""
+        records, self._pending = self._pending, []
+        if not records:
+            return
+        if not self._log_current or self._log_records + len(records) - len(self.notes_by_code) > self.compact_after:
+            self.dump_notes()
+            return
+        with open(self.log_filename, 'ab') as file:
+            for record in records:
+                dump(record, file)
+        self._log_records += len(records)
     
+    def _check_writable(self):
+        if self.read_only:
+            raise IllegalOperationException("The notes are read-only.")
+
+    @exclusive_write
     def create_note(self, text: str) -> Note:
         """Create a new note for the current patient."""
+        self._check_writable()
         self.autocounter += 1
         new_note = Note(self.autocounter, text, datetime.now())
-        self.notes.append(new_note)
+        self.notes_by_code[new_note.code] = new_note
+        self.codes.append(new_note.code)
+        self.index.add(new_note.code, new_note.text)
         if self.autosave:
-            self.dump_notes()
+            self.append_record(('create', new_note.code, new_note.text, new_note.timestamp))
+        if self.listener is not None:
+            self.listener.note_changed(self.phn, new_note)
         return new_note
     
+    @shared_read
     def search_note(self, key: int) -> Optional[Note]:
         """Search for a note by code."""
-        for note in self.notes:
-            if int(note.code) == key:
-                return note
-        return None 
+        return self.notes_by_code.get(int(key))
         
-    def retrieve_notes(self, search_string: str) -> List[Note]:
-        """Retrieve notes by text search."""
-        retrieved_notes = []
-        for note in self.notes:
-            if search_string.lower() in note.text.lower():
-                retrieved_notes.append(note)
-        return retrieved_notes
+    @shared_read
+    def retrieve_notes(self, search_string: str, match: str = 'substring') -> List[Note]:
+        """Retrieve notes by text search.
+
+        match is 'substring' for notes containing search_string anywhere, 'word' for notes
+        containing all of its words, or 'prefix' for notes with words starting with each of them.
+        The word and prefix searches are answered from the inverted index.
+        """
+        if match == 'substring':
+            return [note for note in self.notes_by_code.values() if self.index.contains(note.code, search_string)]
+        codes = self.index.search_words(search_string, prefix=(match == 'prefix'))
+        return [self.notes_by_code[code] for code in sorted(codes)]
     
+    @exclusive_write
     def update_note(self, key: int, text: str) -> bool:
         """Update a note's text."""
+        self._check_writable()
         note = self.search_note(key)
         if note:
+            self.index.remove(note.code)
             note.text = text
             note.timestamp = datetime.now()
+            self.index.add(note.code, note.text)
             if self.autosave:
-                self.dump_notes()
+                self.append_record(('update', note.code, note.text, note.timestamp))
+            if self.listener is not None:
+                self.listener.note_changed(self.phn, note)
             return True
         return False
 
+    @exclusive_write
     def delete_note(self, key: int) -> bool:
         """Delete a note by code."""
+        self._check_writable()
         note = self.search_note(key)
         if note:
-            self.notes.remove(note)
+            del self.notes_by_code[note.code]
+            del self.codes[bisect_left(self.codes, note.code)]
+            self.index.remove(note.code)
             if self.autosave:
-                self.dump_notes()
+                self.append_record(('delete', note.code))
+            if self.listener is not None:
+                self.listener.note_removed(self.phn, note.code)
             return True
         return False
     
-    def list_notes(self) -> List[Note]:
-        """List all notes for the current patient from newest to oldest."""
-        lo_notes = []
-        for note in range(len(self.notes)-1, -1, -1):
-            lo_notes.append(self.notes[note])
-        return lo_notes
+    @shared_read
+    def list_notes(self, limit: int = None, before_code: int = None) -> Union[NewestFirstView, List[Note]]:
+        """List all notes for the current patient from newest to oldest.
+
+        With limit, return one page of at most limit notes, starting after before_code
+        when given. The next page starts before the code of the last note of this one.
+        """
+        if limit is None and before_code is None:
+            return NewestFirstView(self.notes_by_code, self.codes)
+        end = len(self.codes) if before_code is None else bisect_left(self.codes, int(before_code))
+        start = 0 if limit is None else max(0, end - limit)
+        return [self.notes_by_code[code] for code in reversed(self.codes[start:end])]
     
@@ -0,0 +1,96 @@
+from clinic.dao.note_dao import NoteDAO
+from clinic.dao.note_index import tokenize
+from clinic.dao.sqlite_connection import data_version
+from clinic.dao.file_lock import GENERATIONS
+from clinic.note import Note
+from datetime import datetime
+from typing import Optional, List
+import sqlite3
+
+class NoteDAOSQLite(NoteDAO):
+    def __init__(self, connection: sqlite3.Connection, phn: int, listener=None):
+        self.connection = connection
+        self.phn = phn
+        self.listener = listener
+        self._data_version = data_version(connection)
+        # renewed whenever changes committed by other processes are seen
+        self.generation = next(GENERATIONS)
+
+    def refresh(self) -> bool:
+        """Check for changes other processes committed to the database, to any patient's notes.
+        Returns True if there were any."""
+        version = data_version(self.connection)
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        self.generation = next(GENERATIONS)
+        return True
+
+    def _to_note(self, row) -> Note:
+        """Build a Note from a (code, text, timestamp) row."""
+        return Note(row[0], row[1], datetime.fromisoformat(row[2]))
+
+    def create_note(self, text: str) -> Note:
+        """Create a new note for the current patient."""
+        with self.connection:
+            row = self.connection.execute(
+                'SELECT MAX(code) FROM notes WHERE phn = ?', (self.phn,)).fetchone()
+            new_note = Note((row[0] or 0) + 1, text, datetime.now())
+            self.connection.execute(
+                'INSERT INTO notes (phn, code, text, timestamp) VALUES (?, ?, ?, ?)',
+                (self.phn, new_note.code, new_note.text, new_note.timestamp.isoformat(' ')))
+        if self.listener is not None:
+            self.listener.note_changed(self.phn, new_note)
+        return new_note
+
+    def search_note(self, key: int) -> Optional[Note]:
+        """Search for a note by code."""
+        row = self.connection.execute(
+            'SELECT code, text, timestamp FROM notes WHERE phn = ? AND code = ?', (self.phn, key)).fetchone()
+        return self._to_note(row) if row else None
+
+    def retrieve_notes(self, search_string: str, match: str = 'substring') -> List[Note]:
+        """Retrieve notes by text search. match is 'substring', 'word' or 'prefix'."""
+        if match == 'substring':
+            rows = self.connection.execute(
+                'SELECT code, text, timestamp FROM notes WHERE phn = ? AND instr(py_lower(text), ?) > 0 ORDER BY code',
+                (self.phn, search_string.lower()))
+            return [self._to_note(row) for row in rows]
+        words = set(tokenize(search_string))
+        notes = []
+        for row in self.connection.execute(
+                'SELECT code, text, timestamp FROM notes WHERE phn = ? ORDER BY code', (self.phn,)):
+            note_words = set(tokenize(row[1]))
+            if match == 'prefix':
+                found = all(any(note_word.startswith(word) for note_word in note_words) for word in words)
+            else:
+                found = words <= note_words
+            if words and found:
+                notes.append(self._to_note(row))
+        return notes
+
+    def update_note(self, key: int, text: str) -> bool:
+        """Update a note's text."""
+        timestamp = datetime.now()
+        with self.connection:
+            cursor = self.connection.execute(
+                'UPDATE notes SET text = ?, timestamp = ? WHERE phn = ? AND code = ?',
+                (text, timestamp.isoformat(' '), self.phn, key))
+        if cursor.rowcount > 0 and self.listener is not None:
+            self.listener.note_changed(self.phn, Note(key, text, timestamp))
+        return cursor.rowcount > 0
+
+    def delete_note(self, key: int) -> bool:
+        """Delete a note by code."""
+        with self.connection:
+            cursor = self.connection.execute('DELETE FROM notes WHERE phn = ? AND code = ?', (self.phn, key))
+        if cursor.rowcount > 0 and self.listener is not None:
+            self.listener.note_removed(self.phn, key)
+        return cursor.rowcount > 0
+
+    def list_notes(self, limit: int = None, before_code: int = None) -> List[Note]:
+        """List all notes for the current patient from newest to oldest, a page at a time with limit."""
+        rows = self.connection.execute(
+            'SELECT code, text, timestamp FROM notes WHERE phn = ? AND code < ? ORDER BY code DESC LIMIT ?',
+            (self.phn, before_code if before_code is not None else 2 ** 63 - 1, limit if limit is not None else -1))
+        return [self._to_note(row) for row in rows]
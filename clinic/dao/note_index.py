@@ -0,0 +1,80 @@
+import re
+from bisect import bisect_left, insort
+from typing import Iterable, List, Set
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words."""
+    return TOKEN.findall(text.lower())
+
+
+class NoteTextIndex:
+    """Inverted index from words to the codes of the notes that contain them.
+
+    The distinct words are also kept sorted, so a prefix query is a range of that list.
+    The lowercased text of every note is cached for plain substring searches.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._words = []
+        self._folded = {}
+
+    def rebuild(self, notes: Iterable) -> None:
+        """Index every note from scratch."""
+        self._postings = {}
+        self._words = []
+        self._folded = {}
+        for note in notes:
+            self.add(note.code, note.text)
+
+    def add(self, code, text: str) -> None:
+        """Index a new note, or the new text of a note that was removed first."""
+        folded = text.lower()
+        self._folded[code] = folded
+        for word in set(TOKEN.findall(folded)):
+            codes = self._postings.get(word)
+            if codes is None:
+                codes = self._postings[word] = set()
+                insort(self._words, word)
+            codes.add(code)
+
+    def remove(self, code) -> None:
+        """Drop a note from the index."""
+        folded = self._folded.pop(code, None)
+        if folded is None:
+            return
+        for word in set(TOKEN.findall(folded)):
+            codes = self._postings.get(word)
+            if codes is None:
+                continue
+            codes.discard(code)
+            if not codes:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+
+    def _codes_for(self, word: str, prefix: bool) -> Set:
+        if not prefix:
+            return self._postings.get(word, set())
+        codes = set()
+        position = bisect_left(self._words, word)
+        while position < len(self._words) and self._words[position].startswith(word):
+            codes |= self._postings[self._words[position]]
+            position += 1
+        return codes
+
+    def search_words(self, query: str, prefix: bool = False) -> Set:
+        """Codes of the notes containing every word of query, or words starting with them when prefix."""
+        result = None
+        for word in set(tokenize(query)):
+            codes = self._codes_for(word, prefix)
+            result = set(codes) if result is None else result & codes
+            if not result:
+                return set()
+        return result or set()
+
+    def contains(self, code, search_string: str) -> bool:
+        """Substring test against the cached lowercase text of a note."""
+        return search_string.lower() in self._folded.get(code, '')
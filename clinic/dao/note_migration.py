@@ -0,0 +1,28 @@
+import os
+import sys
+from clinic.dao.note_dao_pickle import NoteDAOPickle
+
+
+def migrate_records(directory: str = 'clinic/records') -> int:
+    """Convert every old {phn}.dat pickle file in directory into the note log format.
+
+    The .dat file is removed once its .notes log is written. Returns the number of
+    records migrated.
+    """
+    migrated = 0
+    for entry in sorted(os.listdir(directory)):
+        phn, extension = os.path.splitext(entry)
+        if extension != '.dat':
+            continue
+        note_dao = NoteDAOPickle(autosave=True)
+        note_dao.load_notes(phn, directory)
+        if not note_dao._log_current:
+            note_dao.dump_notes()
+            migrated += 1
+        os.remove(note_dao.filename)
+    return migrated
+
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else 'clinic/records'
+    print(f'Migrated {migrate_records(directory)} patient records in {directory}.')
@@ -16,6 +16,6 @@ class PatientDAO(ABC):
     def delete_patient(self, key):
         pass
     @abstractmethod
-    def list_patients(self):
+    def list_patients(self, limit=None, after=None):
         pass
 
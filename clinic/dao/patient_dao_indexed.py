@@ -0,0 +1,173 @@
+from clinic.exception.illegal_operation_exception import IllegalOperationException
+from clinic.dao.patient_dao import PatientDAO
+from clinic.dao.phn_index import PhnIndex
+from clinic.dao.patient_journal import PatientJournal
+from clinic.dao.file_lock import FileLock, shared_read, file_identity, GENERATIONS
+from clinic.dao.field_index import normalize_email, normalize_phone
+from clinic.dao.phonetic_index import name_words, soundex, rank_fuzzy
+from clinic.dao.name_index import name_suffixes, normalize_name
+from clinic.patient import Patient
+from heapq import merge
+from itertools import islice
+from typing import Optional, List, Iterator
+
+
+class PatientDAOIndexed(PatientDAO):
+    """Read-only patient DAO for lookup processes, served from the PHN index that
+    PatientDAOJSON(phn_index=True) writes. Nothing is loaded up front.
+
+    The index is rewritten with every full snapshot of the patients, so the changes
+    journaled since are read from the patient journal and laid over it. Before every
+    query, under the shared lock of the store, the index is mapped again if a writer
+    replaced it, and the journal is read again if it changed. The index is only as
+    recent as the last snapshot of a writer opened with phn_index.
+    """
+
+    def __init__(self, index_filename='clinic/patients.idx', data_filename='clinic/patients.jsonl',
+        snapshot_filename='clinic/patients.json', lock_filename='clinic/patients.lock'):
+        self.index_filename = index_filename
+        self.data_filename = data_filename
+        self.journal = PatientJournal(snapshot_filename)
+        self.lock = FileLock(lock_filename)
+        self.index = None
+        self.changes = {}
+        self._stamp = None
+        # renewed whenever the index or the journal changed
+        self.generation = next(GENERATIONS)
+        self.current_patient = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Pick up a rewritten index and newly journaled changes. Returns True if either changed."""
+        with self.lock.shared():
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        stamp = (file_identity(self.index_filename), self.journal.stamp(), self.journal.size())
+        if stamp == self._stamp:
+            return False
+        if self._stamp is None or stamp[0] != self._stamp[0]:
+            # the old maps stay valid for whoever still reads them, and close once dropped
+            self.index = PhnIndex(self.index_filename, self.data_filename)
+        self.changes = self.journal.changes()
+        self._stamp = stamp
+        self.generation = next(GENERATIONS)
+        return True
+
+    def _search(self, phn: int) -> Optional[Patient]:
+        phn = int(phn)
+        if phn in self.changes:
+            return self.changes[phn]
+        return self.index.search(phn)
+
+    def _patients(self, after: int = None) -> Iterator[Patient]:
+        """Yield the patients in PHN order, starting after the PHN after, with the journaled changes applied."""
+        changes = self.changes
+        if not changes:
+            return self.index.iter_after(after)
+        indexed = (patient for patient in self.index.iter_after(after) if int(patient.phn) not in changes)
+        journaled = [changes[phn] for phn in sorted(changes)
+            if changes[phn] is not None and (after is None or phn > int(after))]
+        return merge(indexed, journaled, key=lambda patient: int(patient.phn))
+
+    @shared_read
+    def search_patient(self, phn: int) -> Optional[Patient]:
+        """Retrieve a single patient by PHN."""
+        if self.current_patient != None and int(self.current_patient.phn) == int(phn):
+            return self.current_patient
+        return self._search(phn)
+
+    def create_patient(self, phn: int, name: str, birth_date: str, phone: str,
+        email: str, address: str) -> Patient:
+        """Patients cannot be added through the index."""
+        raise IllegalOperationException("The PHN index is read-only.")
+
+    @shared_read
+    def retrieve_patients(self, search_string: str, match: str = 'substring') -> List[Patient]:
+        """Retrieve patients matching a name substring, or with match='fuzzy', patients whose
+        name sounds like search_string, closest spelling first."""
+        if match == 'fuzzy':
+            # no name index in this backend: only the edit distances are limited to phonetic matches
+            codes = {soundex(word) for word in name_words(search_string)}
+            candidates = {patient.phn: patient for patient in self._patients()
+                if codes.intersection(soundex(word) for word in name_words(patient.name))}
+            ranked = rank_fuzzy(search_string, ((phn, patient.name) for phn, patient in candidates.items()))
+            return [candidates[phn] for phn in ranked]
+        return [patient for patient in self._patients() if search_string.lower() in patient.name.lower()]
+
+    @shared_read
+    def complete_patients(self, prefix: str, limit: int = 10) -> List[Patient]:
+        """Retrieve up to limit patients with a name, or a word of it, starting with prefix."""
+        prefix = normalize_name(prefix)
+        found = []
+        for patient in self._patients():
+            texts = [text for text in name_suffixes(patient.name) if text.startswith(prefix)]
+            if texts:
+                found.append((min(texts), patient))
+        # the patients come in PHN order, and the sort is stable
+        found.sort(key=lambda entry: entry[0])
+        return [patient for _, patient in found[:limit]]
+
+    @shared_read
+    def find_patients_by_email(self, email: str) -> List[Patient]:
+        """Retrieve the patients registered with this email, ignoring case."""
+        email = normalize_email(email)
+        return [patient for patient in self._patients() if normalize_email(patient.email) == email]
+
+    @shared_read
+    def find_patients_by_phone(self, phone: str) -> List[Patient]:
+        """Retrieve the patients registered with this phone number, comparing digits only."""
+        phone = normalize_phone(phone)
+        return [patient for patient in self._patients() if normalize_phone(patient.phone) == phone]
+
+    @shared_read
+    def find_patients_born_between(self, start: str, end: str) -> List[Patient]:
+        """Retrieve the patients born from start to end (YYYY-MM-DD, both included), oldest first."""
+        found = [patient for patient in self._patients() if start <= patient.birth_date <= end]
+        found.sort(key=lambda patient: patient.birth_date)
+        return found
+
+    def update_patient(self, old_phn: int, new_phn: int, new_name: str, new_birth_date: str, new_phone: str,
+        new_email: str, new_address: str) -> bool:
+        """Patients cannot be changed through the index."""
+        raise IllegalOperationException("The PHN index is read-only.")
+
+    def delete_patient(self, key: int):
+        """Patients cannot be removed through the index."""
+        raise IllegalOperationException("The PHN index is read-only.")
+
+    @shared_read
+    def list_patients(self, limit: int = None, after: int = None) -> List[Patient]:
+        """List all patients in PHN order, or one page of at most limit patients after the PHN after."""
+        return list(islice(self._patients(after), limit))
+
+    def flush(self):
+        """Nothing is ever written through the index"""
+        pass
+
+    @shared_read
+    def open_patient(self, phn: int) -> Patient:
+        """Return a patient with their notes loaded, without making them current. The notes are read-only:
+        changing them raises IllegalOperationException, as for the patients."""
+        patient = self._search(phn)
+        if patient is None:
+            raise IllegalOperationException
+        note_dao = patient.patient_record.note_dao
+        note_dao.read_only = True
+        # notes saved by other processes are picked up under the store lock
+        note_dao.lock = self.lock
+        patient.patient_record.load_notes()
+        return patient
+
+    def set_current_patient(self, phn: int) -> bool:
+        """Set a current patient"""
+        self.current_patient = self.open_patient(phn)
+        return True
+
+    def get_current_patient(self) -> Optional[Patient]:
+        """Return the current patient"""
+        return self.current_patient
+
+    def unset_current_patient(self):
+        """Unset the current patient"""
+        self.current_patient = None
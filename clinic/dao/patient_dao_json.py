@@ -1,131 +1,364 @@
 import json
+import os
 from clinic.exception.illegal_operation_exception import IllegalOperationException
 from clinic.dao.patient_dao import PatientDAO
 from clinic.patient import Patient
 from clinic.dao.note_dao_pickle import NoteDAOPickle 
-from clinic.dao.patient_encoder import PatientEncoder
-from clinic.dao.patient_decoder import PatientDecoder
+from clinic.dao.patient_journal import PatientJournal
+from clinic.dao.file_lock import FileLock, shared_read, exclusive_write, GENERATIONS
+from clinic.dao.group_commit import GroupCommitWriter
+from clinic.dao.phn_index import write_phn_index
+from clinic.dao.patient_stream import iter_patients, dump_patients
+from clinic.dao.name_index import TrigramIndex, PrefixIndex
+from clinic.dao.phonetic_index import PhoneticIndex
+from clinic.dao.field_index import ExactIndex, RangeIndex, normalize_email, normalize_phone
 from typing import Optional, List
+from bisect import bisect_left, bisect_right, insort
 
 
 class PatientDAOJSON(PatientDAO):
-    def __init__(self, autosave=False):
+    def __init__(self, autosave=False, journal=False, group_commit=False, commit_delay=1.0, commit_batch=50,
+        phn_index=False, shared=False):
+        """With shared, several processes can use the same data directory: see refresh()."""
         self.filename = 'clinic/patients.json'
+        self.index_filename = 'clinic/patients.idx'
+        self.index_data_filename = 'clinic/patients.jsonl'
+        self.lock_filename = 'clinic/patients.lock'
         self.autosave = autosave
-        if self.autosave:
-            try:
-                with open(self.filename, 'r') as file:
-                    self._patients = json.load(file, cls=PatientDecoder)
-            except (FileNotFoundError, json.JSONDecodeError):
-                self._patients = {}
+        self.phn_index = autosave and phn_index
+        self.lock = FileLock(self.lock_filename) if autosave and shared else None
+        on_snapshot = self.write_phn_index if self.phn_index else None
+        self.journal = PatientJournal(self.filename, on_snapshot=on_snapshot,
+            lock_filename=self.lock_filename if self.lock else None) if autosave else None
+        self.journaled = autosave and journal
+        self.writer = GroupCommitWriter(commit_delay, commit_batch) if autosave and group_commit else None
+        self._unsaved = set()
+        self._stamp = None
+        self._journal_offset = 0
+        # renewed whenever changes of other processes are picked up
+        self.generation = next(GENERATIONS)
+        if self.autosave and self.lock is not None:
+            with self.lock.shared():
+                self._patients = self._load_patients()
+                self._remember()
+        elif self.autosave:
+            self._patients = self._load_patients()
         else:
             self._patients = {}
+        if self.phn_index and not os.path.exists(self.index_filename):
+            self.write_phn_index(self._patients)
+        self.name_index = TrigramIndex()
+        self.prefix_index = PrefixIndex()
+        self.phonetic_index = PhoneticIndex()
+        self.sorted_phns = []
+        self.email_index = ExactIndex(normalize_email)
+        self.phone_index = ExactIndex(normalize_phone)
+        self.birth_date_index = RangeIndex()
+        self.index_all()
         self.current_patient = None
+        self.note_listener = None
+
+    def _load_patients(self) -> dict:
+        """Read the patients snapshot and replay the journal over it"""
+        try:
+            with open(self.filename, 'r') as file:
+                # PHNs are always int keys, whatever the JSON object keys are
+                patients = {int(key): patient for key, patient in iter_patients(file)}
+        except (FileNotFoundError, json.JSONDecodeError):
+            patients = {}
+        self.journal.replay(patients)
+        return patients
+
+    def refresh(self) -> bool:
+        """Pick up the changes other processes saved to a shared store. Returns True if a patient changed.
+
+        Appends to the journal are read from where this process last stopped. A rewritten
+        snapshot is read again whole, but only the patients that differ are updated.
+        """
+        if self.lock is None:
+            return False
+        with self.lock.shared():
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        stamp = self.journal.stamp()
+        size = self.journal.size()
+        if stamp == self._stamp and size == self._journal_offset:
+            return False
+        changed = False
+        if stamp[:2] == self._stamp[:2] and self._stamp[2] in (stamp[2], None) and size >= self._journal_offset:
+            changes, self._journal_offset = self.journal.read_from(self._journal_offset)
+            for key, patient in changes:
+                changed |= self._merge(key, patient)
+        else:
+            patients = self._load_patients()
+            for key in [key for key in self._patients if key not in patients]:
+                changed |= self._merge(key, None)
+            for key, patient in patients.items():
+                changed |= self._merge(key, patient)
+            self._journal_offset = size
+        self._stamp = stamp
+        if changed:
+            self.generation = next(GENERATIONS)
+        return changed
+
+    def _remember(self):
+        """Record the state of the files after a change by this process, so it is not read back"""
+        self._stamp = self.journal.stamp()
+        self._journal_offset = self.journal.size()
+
+    def _merge(self, key, patient) -> bool:
+        """Apply a change saved by another process, unless this process has an unsaved change to that patient.
+        patient is None for a deleted patient. Returns True if anything changed."""
+        if key in self._unsaved:
+            return False
+        current = self._patients.get(key)
+        if patient is None:
+            if current is None:
+                return False
+            del self._patients[key]
+            self.unindex_patient(key)
+            return True
+        if current is None:
+            self._patients[key] = patient
+            self.index_patient(key, patient)
+            return True
+        fields = ('name', 'birth_date', 'phone', 'email', 'address')
+        if all(getattr(current, field) == getattr(patient, field) for field in fields):
+            return False
+        # update in place, so a current patient keeps its loaded notes
+        self.unindex_patient(key)
+        for field in fields:
+            setattr(current, field, getattr(patient, field))
+        self.index_patient(key, current)
+        return True
 
     def dump_json(self):
         """Save patients when autosave is True"""
         if self.autosave:
+            patients = dict(self._patients)
             with open(self.filename, 'w') as file:
-                json.dump(self._patients, file, cls=PatientEncoder)
+                dump_patients(patients, file)
+            if self.phn_index:
+                self.write_phn_index(patients)
+            self.journal.clear()
+            self._unsaved.clear()
+
+    def write_phn_index(self, patients: dict):
+        """Rewrite the PHN index that PatientDAOIndexed serves lookups from"""
+        write_phn_index(patients.values(), self.index_data_filename, self.index_filename)
+
+    @exclusive_write
+    def write_pending(self):
+        """Called by the group commit writer to save the coalesced changes"""
+        self.dump_json()
+
+    def flush(self):
+        """Write out every change still waiting for a group commit"""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def save_put(self, key, patient):
+        """Persist a created or changed patient, as a journal record when journaled."""
+        if self.journaled:
+            self.journal.append_put(key, patient)
+            self.compact_if_needed()
+        elif self.writer is not None:
+            self._unsaved.add(key)
+            self.writer.mark_dirty(self)
+        else:
+            self.dump_json()
+
+    def save_delete(self, key):
+        """Persist the removal of a patient, as a journal record when journaled."""
+        if self.journaled:
+            self.journal.append_delete(key)
+            self.compact_if_needed()
+        elif self.writer is not None:
+            self._unsaved.add(key)
+            self.writer.mark_dirty(self)
+        else:
+            self.dump_json()
+
+    def compact_if_needed(self):
+        """Start a background snapshot once the journal is past its threshold."""
+        if self.journal.needs_compaction():
+            self.journal.compact(self._patients)
   
+    def index_all(self):
+        """Fill the search indexes with every loaded patient, sorting the sorted ones once"""
+        self.prefix_index.add_all((key, patient.name) for key, patient in self._patients.items())
+        self.sorted_phns = sorted(self._patients)
+        self.birth_date_index.add_all((key, patient.birth_date) for key, patient in self._patients.items())
+        for key, patient in self._patients.items():
+            self.name_index.add(key, patient.name)
+            self.phonetic_index.add(key, patient.name)
+            self.email_index.add(key, patient.email)
+            self.phone_index.add(key, patient.phone)
+
+    def index_patient(self, key, patient):
+        """Add a patient to the search indexes"""
+        self.name_index.add(key, patient.name)
+        self.prefix_index.add(key, patient.name)
+        self.phonetic_index.add(key, patient.name)
+        insort(self.sorted_phns, key)
+        self.email_index.add(key, patient.email)
+        self.phone_index.add(key, patient.phone)
+        self.birth_date_index.add(key, patient.birth_date)
+
+    def unindex_patient(self, key):
+        """Remove a patient from the search indexes"""
+        self.name_index.remove(key)
+        self.prefix_index.remove(key)
+        self.phonetic_index.remove(key)
+        position = bisect_left(self.sorted_phns, key)
+        if position < len(self.sorted_phns) and self.sorted_phns[position] == key:
+            del self.sorted_phns[position]
+        self.email_index.remove(key)
+        self.phone_index.remove(key)
+        self.birth_date_index.remove(key)
+
+    @shared_read
     def search_patient(self, phn: int) -> Optional[Patient]:
         """Retrieve a single patient by PHN."""
-        if self.autosave:
-            phn = str(phn)
-        if phn in self._patients:
-            patient = self._patients[phn]
-            return patient
-        
-        return None
+        return self._patients.get(int(phn))
         
+    @exclusive_write
     def create_patient(self, phn: int, name: str, birth_date: str, phone: str, 
         email: str, address: str) -> Patient:
         """Add a new patient to the collection."""
-        new_patient = Patient(phn, name, birth_date, phone, email, address, self.autosave)
-
-        patient_phn = new_patient.phn
-        if self.autosave:
-            patient_phn = str(patient_phn)
+        new_patient = Patient(int(phn), name, birth_date, phone, email, address, self.autosave)
 
-        if self.search_patient(patient_phn) == None:
+        if new_patient.phn not in self._patients:
             self._patients[new_patient.phn] = new_patient
-            self.dump_json()
+            self.index_patient(new_patient.phn, new_patient)
+            self.save_put(new_patient.phn, new_patient)
         else:
             raise IllegalOperationException("PHN already exists.")
         return new_patient
 
-    def retrieve_patients(self, search_string: str) -> List[Patient]:
-        """Retrieve patients matching a name substring."""
-        retrived_patients = []
-        for patient in self._patients.values():
-            if search_string.lower() in patient.name.lower():
-                retrived_patients.append(patient)
-        self.dump_json()
-        return retrived_patients
+    @shared_read
+    def retrieve_patients(self, search_string: str, match: str = 'substring') -> List[Patient]:
+        """Retrieve patients matching a name substring, or with match='fuzzy', patients whose
+        name sounds like search_string, closest spelling first."""
+        if match == 'fuzzy':
+            return [self._patients[key] for key in self.phonetic_index.search(search_string)]
+        return [self._patients[key] for key in self.name_index.search(search_string)]
 
+    @shared_read
+    def complete_patients(self, prefix: str, limit: int = 10) -> List[Patient]:
+        """Retrieve up to limit patients with a name, or a word of it, starting with prefix."""
+        return [self._patients[key] for key in self.prefix_index.complete(prefix, limit)]
+
+    @shared_read
+    def find_patients_by_email(self, email: str) -> List[Patient]:
+        """Retrieve the patients registered with this email, ignoring case."""
+        return [self._patients[key] for key in self.email_index.find(email)]
+
+    @shared_read
+    def find_patients_by_phone(self, phone: str) -> List[Patient]:
+        """Retrieve the patients registered with this phone number, comparing digits only."""
+        return [self._patients[key] for key in self.phone_index.find(phone)]
+
+    @shared_read
+    def find_patients_born_between(self, start: str, end: str) -> List[Patient]:
+        """Retrieve the patients born from start to end (YYYY-MM-DD, both included), oldest first."""
+        return [self._patients[key] for key in self.birth_date_index.between(start, end)]
+
+    @exclusive_write
     def update_patient(self, old_phn: int, new_phn: str, new_name: str, new_birth_date: str, new_phone: str, 
         new_email: str, new_address: str) -> bool:
         """Update an existing patient."""
-        if self.autosave:
-            _new_phn = str(new_phn)
-            _old_phn = str(old_phn)
-        else:
-            _new_phn = new_phn
-            _old_phn = old_phn
+        _new_phn = int(new_phn)
+        _old_phn = int(old_phn)
 
-        if self.current_patient != None and self.current_patient.phn == old_phn: 
+        if self.current_patient != None and self.current_patient.phn == _old_phn: 
             raise IllegalOperationException
-        if old_phn != new_phn:
+        if _old_phn != _new_phn:
             if _new_phn in self._patients: 
                 raise IllegalOperationException
         if _old_phn not in self._patients: 
             raise IllegalOperationException
 
-        patient = self.search_patient(old_phn)
+        patient = self._patients[_old_phn]
+        if _old_phn != _new_phn:
+            # the notes go along with the patient
+            patient.patient_record.move(_new_phn)
+            if self.note_listener is not None:
+                self.note_listener.patient_moved(_old_phn, _new_phn)
 
-        patient.phn = new_phn
+        patient.phn = _new_phn
         patient.name = new_name
         patient.birth_date = new_birth_date
         patient.phone = new_phone
         patient.email = new_email
         patient.address = new_address
 
-        self.delete_patient(old_phn)
+        del self._patients[_old_phn]
+        self.unindex_patient(_old_phn)
         self._patients[_new_phn] = patient
-        self.dump_json()
+        self.index_patient(_new_phn, patient)
+        if self.journaled and _old_phn != _new_phn:
+            self.journal.append_delete(_old_phn)
+        elif self.writer is not None and _old_phn != _new_phn:
+            self._unsaved.add(_old_phn)
+        self.save_put(_new_phn, patient)
         return True
 
+    @exclusive_write
     def delete_patient(self, key: int):
         """Remove a patient from the collection."""
-        if self.autosave:
-            key = str(key)
+        key = int(key)
 
-        
-        print(f"Attempting to delete patient with key: {key}")
-        keys = list(self._patients.keys())
-        print(f"Available keys in _patients: {keys} of type {type(keys[0])}")
-        
-            
         if key not in self._patients:
-            print(f"Error: Key {key} not found in _patients.")              
             raise IllegalOperationException
         if self._patients[key] == self.current_patient:
             raise IllegalOperationException
         del self._patients[key]
-        self.dump_json()
+        self.unindex_patient(key)
+        self.save_delete(key)
+        if self.note_listener is not None:
+            self.note_listener.patient_removed(key)
 
-    def list_patients(self) -> List[Patient]:
-        """List all patients."""
-        return list(self._patients.values())
+    @shared_read
+    def list_patients(self, limit: int = None, after: int = None) -> List[Patient]:
+        """List all patients in PHN order, or one page of at most limit patients after the PHN after."""
+        start = 0 if after is None else bisect_right(self.sorted_phns, int(after))
+        end = len(self.sorted_phns) if limit is None else start + limit
+        return [self._patients[phn] for phn in self.sorted_phns[start:end]]
+
+    def iter_all_notes(self):
+        """Yield (phn, notes) for every patient, reading each record without keeping it loaded"""
+        if not self.autosave:
+            for patient in self._patients.values():
+                yield patient.phn, patient.patient_record.note_dao.notes
+            return
+        self.flush()
+        for patient in list(self._patients.values()):
+            note_dao = NoteDAOPickle(self.autosave)
+            note_dao.load_notes(patient.phn)
+            yield patient.phn, note_dao.notes
+
+    @shared_read
+    def open_patient(self, phn: int) -> Patient:
+        """Return a patient with their notes loaded and ready to change, without making them current"""
+        patient = self._patients.get(int(phn))
+        if patient is None:
+            raise IllegalOperationException
+        note_dao = patient.patient_record.note_dao
+        if self.lock is not None:
+            # notes of a shared store are written right away, under the same lock as the patients
+            note_dao.lock = self.lock
+        else:
+            note_dao.writer = self.writer
+        patient.patient_record.load_notes()
+        note_dao.listener = self.note_listener
+        return patient
 
     def set_current_patient(self, phn: int) -> bool:
         """Set a current patient"""
-        phn = str(phn)
-        for patient in self._patients.values():
-            if int(patient.phn) == int(phn):
-                self.current_patient = patient
-                return True
-        raise IllegalOperationException
+        self.current_patient = self.open_patient(phn)
+        return True
 
     def get_current_patient(self) -> Optional[Patient]:
         """Return the current patient"""
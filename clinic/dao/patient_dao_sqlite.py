@@ -0,0 +1,201 @@
+from clinic.exception.illegal_operation_exception import IllegalOperationException
+from clinic.dao.patient_dao import PatientDAO
+from clinic.dao.note_dao_sqlite import NoteDAOSQLite
+from clinic.dao.sqlite_connection import connect, data_version, index_name, unindex_name
+from clinic.dao.file_lock import GENERATIONS
+from clinic.dao.phonetic_index import name_words, soundex, rank_fuzzy
+from clinic.dao.field_index import normalize_email, normalize_phone
+from clinic.dao.name_index import trigrams, normalize_name
+from clinic.patient import Patient
+from typing import Optional, List
+import sqlite3
+
+
+class PatientDAOSQLite(PatientDAO):
+    def __init__(self, autosave=False, filename='clinic/clinic.db'):
+        self.filename = filename if autosave else ':memory:'
+        self.autosave = autosave
+        self.connection = connect(self.filename)
+        self._data_version = data_version(self.connection)
+        # renewed whenever changes committed by other processes are seen
+        self.generation = next(GENERATIONS)
+        self.current_patient = None
+        self.note_listener = None
+
+    def refresh(self) -> bool:
+        """Check for changes other processes committed to the database. Returns True if there were any.
+        Queries always read the database, so this only tells callers that keep results derived from it."""
+        version = data_version(self.connection)
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        self.generation = next(GENERATIONS)
+        return True
+
+    def _to_patient(self, row) -> Patient:
+        """Build a Patient, with its notes kept in the same database, from a patients row."""
+        return Patient(row[0], row[1], row[2], row[3], row[4], row[5],
+            self.autosave, NoteDAOSQLite(self.connection, row[0], self.note_listener))
+
+    def flush(self):
+        """Every change is committed as it happens, so there is nothing to wait for"""
+        pass
+
+    def search_patient(self, phn: int) -> Optional[Patient]:
+        """Retrieve a single patient by PHN."""
+        row = self.connection.execute(
+            'SELECT phn, name, birth_date, phone, email, address FROM patients WHERE phn = ?', (int(phn),)).fetchone()
+        return self._to_patient(row) if row else None
+
+    def create_patient(self, phn: int, name: str, birth_date: str, phone: str,
+        email: str, address: str) -> Patient:
+        """Add a new patient to the collection."""
+        try:
+            with self.connection:
+                self.connection.execute(
+                    'INSERT INTO patients (phn, name, name_folded, birth_date, phone, email, address, '
+                    'email_folded, phone_digits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (int(phn), name, name.lower(), birth_date, phone, email, address,
+                     normalize_email(email), normalize_phone(phone)))
+                index_name(self.connection, int(phn), name)
+        except sqlite3.IntegrityError:
+            raise IllegalOperationException("PHN already exists.")
+        return self._to_patient((int(phn), name, birth_date, phone, email, address))
+
+    def retrieve_patients(self, search_string: str, match: str = 'substring') -> List[Patient]:
+        """Retrieve patients matching a name substring, or with match='fuzzy', patients whose
+        name sounds like search_string, closest spelling first."""
+        if match == 'fuzzy':
+            codes = sorted({soundex(word) for word in name_words(search_string)})
+            rows = self.connection.execute(
+                'SELECT phn, name, birth_date, phone, email, address FROM patients WHERE phn IN '
+                '(SELECT phn FROM name_sounds WHERE code IN (%s))' % ', '.join('?' * len(codes)), codes).fetchall()
+            by_phn = {row[0]: row for row in rows}
+            ranked = rank_fuzzy(search_string, ((row[0], row[1]) for row in rows))
+            return [self._to_patient(by_phn[phn]) for phn in ranked]
+        query = search_string.lower()
+        grams = sorted(trigrams(query))
+        if not grams:
+            # too short for a trigram, scan the names
+            rows = self.connection.execute(
+                'SELECT phn, name, birth_date, phone, email, address FROM patients '
+                'WHERE instr(name_folded, ?) > 0 ORDER BY phn', (query,))
+            return [self._to_patient(row) for row in rows]
+        # only the patients with every trigram of the query are checked for the whole substring
+        rows = self.connection.execute(
+            'SELECT phn, name, birth_date, phone, email, address FROM patients WHERE phn IN '
+            '(SELECT phn FROM name_trigrams WHERE gram IN (%s) GROUP BY phn HAVING count(*) = ?) '
+            'AND instr(name_folded, ?) > 0 ORDER BY phn' % ', '.join('?' * len(grams)),
+            grams + [len(grams), query])
+        return [self._to_patient(row) for row in rows]
+
+    def complete_patients(self, prefix: str, limit: int = 10) -> List[Patient]:
+        """Retrieve up to limit patients with a name, or a word of it, starting with prefix."""
+        prefix = normalize_name(prefix)
+        # walk the word suffixes in order and stop at the limit, like PrefixIndex.complete
+        phns = []
+        for (phn,) in self.connection.execute(
+                'SELECT phn FROM name_suffixes WHERE text >= ? AND text < ? ORDER BY text, phn',
+                (prefix, prefix + '\uffff')):
+            if phn not in phns:
+                phns.append(phn)
+                if len(phns) == limit:
+                    break
+        rows = self.connection.execute(
+            'SELECT phn, name, birth_date, phone, email, address FROM patients WHERE phn IN (%s)'
+            % ', '.join('?' * len(phns)), phns)
+        by_phn = {row[0]: row for row in rows}
+        return [self._to_patient(by_phn[phn]) for phn in phns]
+
+    def find_patients_by_email(self, email: str) -> List[Patient]:
+        """Retrieve the patients registered with this email, ignoring case."""
+        rows = self.connection.execute(
+            'SELECT phn, name, birth_date, phone, email, address FROM patients WHERE email_folded = ?',
+            (normalize_email(email),))
+        return [self._to_patient(row) for row in rows]
+
+    def find_patients_by_phone(self, phone: str) -> List[Patient]:
+        """Retrieve the patients registered with this phone number, comparing digits only."""
+        rows = self.connection.execute(
+            'SELECT phn, name, birth_date, phone, email, address FROM patients WHERE phone_digits = ?',
+            (normalize_phone(phone),))
+        return [self._to_patient(row) for row in rows]
+
+    def find_patients_born_between(self, start: str, end: str) -> List[Patient]:
+        """Retrieve the patients born from start to end (YYYY-MM-DD, both included), oldest first."""
+        rows = self.connection.execute(
+            'SELECT phn, name, birth_date, phone, email, address FROM patients '
+            'WHERE birth_date BETWEEN ? AND ? ORDER BY birth_date, phn', (start, end))
+        return [self._to_patient(row) for row in rows]
+
+    def update_patient(self, old_phn: int, new_phn: int, new_name: str, new_birth_date: str, new_phone: str,
+        new_email: str, new_address: str) -> bool:
+        """Update an existing patient, moving their notes along if the PHN changes."""
+        old_phn, new_phn = int(old_phn), int(new_phn)
+        if self.current_patient != None and int(self.current_patient.phn) == old_phn:
+            raise IllegalOperationException
+        try:
+            with self.connection:
+                cursor = self.connection.execute(
+                    'UPDATE patients SET phn = ?, name = ?, name_folded = ?, birth_date = ?, phone = ?, '
+                    'email = ?, address = ?, email_folded = ?, phone_digits = ? WHERE phn = ?',
+                    (new_phn, new_name, new_name.lower(), new_birth_date, new_phone, new_email, new_address,
+                     normalize_email(new_email), normalize_phone(new_phone), old_phn))
+                if cursor.rowcount == 0:
+                    raise IllegalOperationException
+                if old_phn != new_phn:
+                    self.connection.execute('UPDATE notes SET phn = ? WHERE phn = ?', (new_phn, old_phn))
+                    unindex_name(self.connection, old_phn)
+                index_name(self.connection, new_phn, new_name)
+        except sqlite3.IntegrityError:
+            raise IllegalOperationException
+        if old_phn != new_phn and self.note_listener is not None:
+            self.note_listener.patient_moved(old_phn, new_phn)
+        return True
+
+    def delete_patient(self, key: int):
+        """Remove a patient, and their notes, from the collection."""
+        key = int(key)
+        if self.current_patient != None and int(self.current_patient.phn) == key:
+            raise IllegalOperationException
+        with self.connection:
+            cursor = self.connection.execute('DELETE FROM patients WHERE phn = ?', (key,))
+            if cursor.rowcount == 0:
+                raise IllegalOperationException
+            self.connection.execute('DELETE FROM notes WHERE phn = ?', (key,))
+            unindex_name(self.connection, key)
+        if self.note_listener is not None:
+            self.note_listener.patient_removed(key)
+
+    def list_patients(self, limit: int = None, after: int = None) -> List[Patient]:
+        """List all patients in PHN order, or one page of at most limit patients after the PHN after."""
+        rows = self.connection.execute(
+            'SELECT phn, name, birth_date, phone, email, address FROM patients WHERE phn > ? ORDER BY phn LIMIT ?',
+            (int(after) if after is not None else -2 ** 63, limit if limit is not None else -1))
+        return [self._to_patient(row) for row in rows]
+
+    def iter_all_notes(self):
+        """Yield (phn, notes) for every patient that has notes"""
+        phns = [row[0] for row in self.connection.execute('SELECT DISTINCT phn FROM notes')]
+        for phn in phns:
+            yield phn, NoteDAOSQLite(self.connection, phn).list_notes()
+
+    def open_patient(self, phn: int) -> Patient:
+        """Return a patient ready to work with, without making them current"""
+        patient = self.search_patient(phn)
+        if patient is None:
+            raise IllegalOperationException
+        return patient
+
+    def set_current_patient(self, phn: int) -> bool:
+        """Set a current patient"""
+        self.current_patient = self.open_patient(phn)
+        return True
+
+    def get_current_patient(self) -> Optional[Patient]:
+        """Return the current patient"""
+        return self.current_patient
+
+    def unset_current_patient(self):
+        """Unset the current patient"""
+        self.current_patient = None
@@ -8,7 +8,7 @@ class PatientDecoder(json.JSONDecoder):
     def object_hook(self, dct):
         if '__type__' in dct and dct['__type__'] == 'Patient':
             return Patient(
-                dct['phn'],
+                int(dct['phn']),
                 dct['name'],
                 dct['dob'],
                 dct['phone'],
@@ -6,7 +6,7 @@ class PatientEncoder(json.JSONEncoder):
         if isinstance(obj, Patient):
             return {
                 '__type__': 'Patient',
-                'phn': obj.phn,
+                'phn': int(obj.phn),
                 'name': obj.name,
                 'dob': obj.birth_date,
                 'phone': obj.phone,
@@ -0,0 +1,190 @@
+import json
+import os
+import threading
+from clinic.dao.patient_encoder import PatientEncoder
+from clinic.dao.patient_decoder import PatientDecoder
+from clinic.dao.patient_stream import dump_patients
+from clinic.dao.file_lock import FileLock, TryLock, file_identity
+
+
+class PatientJournal:
+    """Append-only log of patient mutations kept next to the patients snapshot.
+
+    Each line is a small JSON record, either a put of a whole patient or a delete.
+    Replaying the log over the snapshot gives the current state. Once the log grows
+    past the threshold it is rotated and a fresh snapshot is written in the background.
+    With lock_filename, the files are shared with other processes: only one of them
+    compacts at a time, holding the compaction lock from rotation to install.
+    """
+
+    def __init__(self, snapshot_filename: str, threshold: int = 64 * 1024, on_snapshot=None, lock_filename=None):
+        self.snapshot_filename = snapshot_filename
+        self.on_snapshot = on_snapshot
+        self.lock_filename = lock_filename
+        self.filename = os.path.splitext(snapshot_filename)[0] + '.journal'
+        self.old_filename = self.filename + '.old'
+        self.compaction_lock = TryLock(self.filename + '.lock') if lock_filename else None
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._compactor = None
+
+    def replay(self, patients: dict) -> None:
+        """Apply the logged mutations, oldest first, to the given patients."""
+        for key, patient in self.changes().items():
+            if patient is None:
+                patients.pop(key, None)
+            else:
+                patients[key] = patient
+
+    def changes(self) -> dict:
+        """The last logged change of each patient: the patient, or None once deleted."""
+        changes = {}
+        for filename in (self.old_filename, self.filename):
+            try:
+                with open(filename, 'r') as file:
+                    for key, patient in self._decode(file):
+                        changes[key] = patient
+            except FileNotFoundError:
+                pass
+        return changes
+
+    def _decode(self, lines):
+        """Yield (key, patient) for each logged put and (key, None) for each delete."""
+        decoder = PatientDecoder()
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # skip a torn write left by a crash
+                continue
+            if entry['op'] == 'put':
+                yield int(entry['key']), decoder.object_hook(entry['patient'])
+            elif entry['op'] == 'delete':
+                yield int(entry['key']), None
+
+    def stamp(self) -> tuple:
+        """Identity of the snapshot and the rotated log, and the inode of the live log.
+
+        While the stamp stays the same, the live log only grows, and reading it from the
+        last known offset gives every change made since.
+        """
+        journal = file_identity(self.filename)
+        return (file_identity(self.snapshot_filename), file_identity(self.old_filename),
+            journal[0] if journal else None)
+
+    def size(self) -> int:
+        """Length in bytes of the live log."""
+        try:
+            return os.path.getsize(self.filename)
+        except FileNotFoundError:
+            return 0
+
+    def read_from(self, offset: int):
+        """Decode the live log from offset on. Returns the (key, patient or None) changes and the new offset."""
+        try:
+            with open(self.filename, 'rb') as file:
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return [], offset
+        # leave a line that is still being written for the next read
+        end = data.rfind(b'\n') + 1
+        lines = data[:end].decode('utf-8').splitlines()
+        return list(self._decode(lines)), offset + end
+
+    def append_put(self, key, patient) -> None:
+        """Log that the patient is now stored under key."""
+        self._append({'op': 'put', 'key': str(key), 'patient': PatientEncoder().default(patient)})
+
+    def append_delete(self, key) -> None:
+        """Log that the patient stored under key was removed."""
+        self._append({'op': 'delete', 'key': str(key)})
+
+    def _append(self, entry: dict) -> None:
+        with self._lock:
+            with open(self.filename, 'a') as file:
+                file.write(json.dumps(entry) + '\n')
+
+    def needs_compaction(self) -> bool:
+        """Check if the log grew past the compaction threshold."""
+        try:
+            return os.path.getsize(self.filename) >= self.threshold
+        except FileNotFoundError:
+            return False
+
+    def compact(self, patients: dict, background: bool = True) -> None:
+        """Rotate the log and write a fresh snapshot of patients.
+
+        The rotated log is only removed after the snapshot is safely in place, so a
+        crash at any point still replays to the same state.
+        """
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            if self.compaction_lock is not None and not self.compaction_lock.acquire():
+                # another process is compacting: its rotated log is not left over from a crash
+                return
+            try:
+                if os.path.exists(self.old_filename):
+                    # left behind by an interrupted compaction, fold the live log into it
+                    if os.path.exists(self.filename):
+                        with open(self.filename, 'r') as src, open(self.old_filename, 'a') as dst:
+                            dst.write(src.read())
+                        os.remove(self.filename)
+                elif os.path.exists(self.filename):
+                    os.replace(self.filename, self.old_filename)
+                snapshot = dict(patients)
+                self._compactor = threading.Thread(target=self._write_snapshot, args=(snapshot,))
+                self._compactor.start()
+            except BaseException:
+                if self.compaction_lock is not None:
+                    self.compaction_lock.release()
+                raise
+        if not background:
+            self.wait()
+
+    def wait(self) -> None:
+        """Wait for a running compaction to finish."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def _write_snapshot(self, patients: dict) -> None:
+        # named for this process, so it is never written by another process's compaction too
+        tmp_filename = f'{self.snapshot_filename}.{os.getpid()}.tmp'
+        if self.lock_filename is None:
+            self._dump_snapshot(tmp_filename, patients)
+            self._install_snapshot(tmp_filename, patients)
+            return
+        lock = FileLock(self.lock_filename)
+        try:
+            self._dump_snapshot(tmp_filename, patients)
+            # other processes must see the old snapshot with the rotated log, or the new one without it
+            with lock.exclusive():
+                self._install_snapshot(tmp_filename, patients)
+        finally:
+            lock.close()
+            self.compaction_lock.release()
+
+    def _dump_snapshot(self, tmp_filename: str, patients: dict) -> None:
+        with open(tmp_filename, 'w') as file:
+            dump_patients(patients, file)
+
+    def _install_snapshot(self, tmp_filename: str, patients: dict) -> None:
+        if self.on_snapshot is not None:
+            self.on_snapshot(patients)
+        os.replace(tmp_filename, self.snapshot_filename)
+        try:
+            os.remove(self.old_filename)
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """Drop the log once a full snapshot has been written some other way."""
+        self.wait()
+        with self._lock:
+            for filename in (self.old_filename, self.filename):
+                try:
+                    os.remove(filename)
+                except FileNotFoundError:
+                    pass
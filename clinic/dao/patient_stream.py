@@ -0,0 +1,88 @@
+import json
+from clinic.dao.patient_encoder import PatientEncoder
+from clinic.dao.patient_decoder import PatientDecoder
+from typing import Iterator, Tuple, TextIO
+
+WHITESPACE = ' \t\n\r'
+
+
+class _ChunkReader:
+    """Keeps a small window of the file and refills it as the parser moves along."""
+
+    def __init__(self, file: TextIO, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Drop what was already parsed and read the next chunk. False at end of file."""
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next character that is not whitespace, or '' at end of file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.buffer, self.pos)
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder):
+        """Decode the next complete JSON value, reading more of the file until it fits."""
+        self.peek()
+        while True:
+            try:
+                value, self.pos = decoder.raw_decode(self.buffer, self.pos)
+                return value
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+
+def iter_patients(file: TextIO, chunk_size: int = 64 * 1024) -> Iterator[Tuple[str, object]]:
+    """Yield (key, patient) pairs from a patients.json file one at a time.
+
+    Each patient is decoded with PatientDecoder as soon as its object is complete,
+    so the whole document is never held as one string or one dict tree.
+    """
+    decoder = PatientDecoder()
+    reader = _ChunkReader(file, chunk_size)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.decode(decoder)
+        reader.expect(':')
+        yield key, reader.decode(decoder)
+        if reader.peek() == ',':
+            reader.pos += 1
+            continue
+        reader.expect('}')
+        return
+
+
+def dump_patients(patients: dict, file: TextIO) -> None:
+    """Write patients to file in the patients.json layout, one patient at a time."""
+    encoder = PatientEncoder()
+    file.write('{')
+    for position, (key, patient) in enumerate(patients.items()):
+        if position:
+            file.write(', ')
+        file.write(json.dumps(str(key)))
+        file.write(': ')
+        file.write(encoder.encode(patient))
+    file.write('}')
@@ -0,0 +1,104 @@
+import json
+import mmap
+import os
+import struct
+from itertools import islice
+from clinic.dao.patient_encoder import PatientEncoder
+from clinic.dao.patient_decoder import PatientDecoder
+from clinic.patient import Patient
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b'PHNIDX01'
+# phn, offset of the patient's line in the data file, length of that line
+RECORD = struct.Struct('<qQI')
+
+
+def write_phn_index(patients: Iterable[Patient], data_filename: str, index_filename: str) -> None:
+    """Write one JSON line per patient to the data file, and a PHN-sorted fixed-width index into it."""
+    # temporary files named for this process, so concurrent writers do not write over each other's
+    suffix = f'.{os.getpid()}.tmp'
+    entries = []
+    with open(data_filename + suffix, 'wb') as data:
+        for patient in patients:
+            line = (json.dumps(patient, cls=PatientEncoder) + '\n').encode('utf-8')
+            entries.append((int(patient.phn), data.tell(), len(line)))
+            data.write(line)
+    entries.sort()
+    with open(index_filename + suffix, 'wb') as index:
+        index.write(MAGIC)
+        for entry in entries:
+            index.write(RECORD.pack(*entry))
+    os.replace(data_filename + suffix, data_filename)
+    os.replace(index_filename + suffix, index_filename)
+
+
+class PhnIndex:
+    """Read side of the PHN index. Both files are memory-mapped, so opening is constant time
+    and a lookup is a binary search that only pages in what it touches."""
+
+    def __init__(self, index_filename: str, data_filename: str):
+        self._decoder = PatientDecoder()
+        with open(index_filename, 'rb') as index:
+            self._index = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._index[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{index_filename} is not a PHN index')
+        self._count = (len(self._index) - len(MAGIC)) // RECORD.size
+        with open(data_filename, 'rb') as data:
+            self._data = mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(data_filename) else b''
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, position: int) -> Tuple[int, int, int]:
+        return RECORD.unpack_from(self._index, len(MAGIC) + position * RECORD.size)
+
+    def _decode(self, offset: int, length: int) -> Patient:
+        return json.loads(self._data[offset:offset + length], object_hook=self._decoder.object_hook)
+
+    def _lower_bound(self, phn: int) -> int:
+        """Position of the first entry with a PHN of at least phn."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < phn:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def page(self, limit: int = None, after: int = None) -> List[Patient]:
+        """Return at most limit patients in PHN order, starting after the PHN after."""
+        return list(islice(self.iter_after(after), limit))
+
+    def iter_after(self, after: int = None) -> Iterator[Patient]:
+        """Yield the patients in PHN order, starting after the PHN after."""
+        start = 0 if after is None else self._lower_bound(int(after) + 1)
+        for position in range(start, self._count):
+            key, offset, length = self._entry(position)
+            yield self._decode(offset, length)
+
+    def search(self, phn: int) -> Optional[Patient]:
+        """Return the patient with this PHN, or None."""
+        phn = int(phn)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            key, offset, length = self._entry(middle)
+            if key < phn:
+                low = middle + 1
+            elif key > phn:
+                high = middle
+            else:
+                patient = self._decode(offset, length)
+                # the data file may be newer than the index if a rewrite was interrupted
+                return patient if int(patient.phn) == phn else None
+        return None
+
+    def __iter__(self) -> Iterator[Patient]:
+        """Yield every patient in PHN order."""
+        return self.iter_after()
+
+    def close(self) -> None:
+        self._index.close()
+        if self._data:
+            self._data.close()
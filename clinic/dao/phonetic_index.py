@@ -0,0 +1,113 @@
+import re
+from typing import Hashable, Iterable, List, Tuple
+
+SOUNDEX_CODES = {}
+for letters, digit in (('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'), ('mn', '5'), ('r', '6')):
+    for letter in letters:
+        SOUNDEX_CODES[letter] = digit
+
+
+def name_words(name: str) -> List[str]:
+    """The case-folded alphabetic words of a name."""
+    return re.findall(r'[^\W\d_]+', name.lower())
+
+
+def soundex(word: str) -> str:
+    """American Soundex code of a word, such as 'r163' for both 'robert' and 'rupert'.
+
+    The first letter is kept as it is, so letters outside a-z still give a usable code.
+    """
+    word = word.lower()
+    if not word:
+        return ''
+    code = word[0]
+    previous = SOUNDEX_CODES.get(word[0], '')
+    for letter in word[1:]:
+        digit = SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate two letters with the same code, vowels do
+        if letter not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+def bounded_distance(first: str, second: str, bound: int) -> int:
+    """Levenshtein distance between two strings, or bound + 1 as soon as it is known to exceed bound."""
+    if abs(len(first) - len(second)) > bound:
+        return bound + 1
+    previous_row = list(range(len(second) + 1))
+    for row, first_letter in enumerate(first, 1):
+        current_row = [row]
+        for column, second_letter in enumerate(second, 1):
+            current_row.append(min(previous_row[column] + 1, current_row[column - 1] + 1,
+                previous_row[column - 1] + (first_letter != second_letter)))
+        if min(current_row) > bound:
+            return bound + 1
+        previous_row = current_row
+    return min(previous_row[-1], bound + 1)
+
+
+def rank_fuzzy(query: str, candidates: Iterable[Tuple[Hashable, str]], max_distance: int = 2) -> List[Hashable]:
+    """Keys of the candidate (key, name) pairs close enough to query, best match first.
+
+    Every word of the query must be within max_distance edits of some word of the name.
+    Matches are ranked by their total distance, then by name.
+    """
+    query_words = name_words(query)
+    if not query_words:
+        return []
+    scored = []
+    for key, name in candidates:
+        words = name_words(name)
+        total = 0
+        for query_word in query_words:
+            distance = min((bounded_distance(query_word, word, max_distance) for word in words),
+                default=max_distance + 1)
+            if distance > max_distance:
+                break
+            total += distance
+        else:
+            scored.append((total, name.lower(), key))
+    scored.sort(key=lambda entry: entry[:2])
+    return [key for _, _, key in scored]
+
+
+class PhoneticIndex:
+    """Index from the Soundex codes of the words of patient names to patient keys.
+
+    A fuzzy search only computes edit distances for the patients sharing a code with
+    a word of the query, never for the whole roster.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._names = {}
+
+    def add(self, key: Hashable, name: str) -> None:
+        """Index the name of the patient stored under key."""
+        self._names[key] = name
+        for word in name_words(name):
+            self._postings.setdefault(soundex(word), set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        """Drop the patient stored under key from the index."""
+        name = self._names.pop(key, None)
+        if name is None:
+            return
+        for word in name_words(name):
+            code = soundex(word)
+            keys = self._postings.get(code)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[code]
+
+    def search(self, query: str, max_distance: int = 2) -> List[Hashable]:
+        """Keys of the patients whose name sounds like query, closest spelling first."""
+        candidates = set()
+        for word in name_words(query):
+            candidates |= self._postings.get(soundex(word), set())
+        return rank_fuzzy(query, ((key, self._names[key]) for key in candidates), max_distance)
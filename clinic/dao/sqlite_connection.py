@@ -0,0 +1,100 @@
+import sqlite3
+from clinic.dao.field_index import normalize_email, normalize_phone
+from clinic.dao.phonetic_index import name_words, soundex
+from clinic.dao.name_index import trigrams, name_suffixes
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS patients (
+    phn INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_folded TEXT NOT NULL,
+    birth_date TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    email TEXT NOT NULL,
+    address TEXT NOT NULL,
+    email_folded TEXT NOT NULL DEFAULT '',
+    phone_digits TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS patients_name_folded ON patients (name_folded);
+CREATE INDEX IF NOT EXISTS patients_email_folded ON patients (email_folded);
+CREATE INDEX IF NOT EXISTS patients_phone_digits ON patients (phone_digits);
+CREATE INDEX IF NOT EXISTS patients_birth_date ON patients (birth_date);
+CREATE TABLE IF NOT EXISTS name_sounds (
+    code TEXT NOT NULL,
+    phn INTEGER NOT NULL,
+    PRIMARY KEY (code, phn)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS name_sounds_phn ON name_sounds (phn);
+CREATE TABLE IF NOT EXISTS name_trigrams (
+    gram TEXT NOT NULL,
+    phn INTEGER NOT NULL,
+    PRIMARY KEY (gram, phn)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS name_trigrams_phn ON name_trigrams (phn);
+CREATE TABLE IF NOT EXISTS name_suffixes (
+    text TEXT NOT NULL,
+    phn INTEGER NOT NULL,
+    PRIMARY KEY (text, phn)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS name_suffixes_phn ON name_suffixes (phn);
+CREATE TABLE IF NOT EXISTS notes (
+    phn INTEGER NOT NULL,
+    code INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (phn, code)
+);
+CREATE INDEX IF NOT EXISTS notes_phn_timestamp ON notes (phn, timestamp);
+'''
+
+
+def data_version(connection: sqlite3.Connection) -> int:
+    """Counter that changes whenever another connection commits to the database, but not on commits of this one."""
+    return connection.execute('PRAGMA data_version').fetchone()[0]
+
+
+def connect(filename: str) -> sqlite3.Connection:
+    """Open the clinic database in WAL mode and make sure its tables and indexes exist."""
+    connection = sqlite3.connect(filename, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    # same case-insensitive matching as the in-memory DAOs, for non-ASCII text too
+    connection.create_function('py_lower', 1, str.lower, deterministic=True)
+    connection.create_function('normalize_email', 1, normalize_email, deterministic=True)
+    connection.create_function('normalize_phone', 1, normalize_phone, deterministic=True)
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(patients)')]
+    if columns and 'email_folded' not in columns:
+        # databases created before the email and phone indexes
+        with connection:
+            connection.execute("ALTER TABLE patients ADD COLUMN email_folded TEXT NOT NULL DEFAULT ''")
+            connection.execute("ALTER TABLE patients ADD COLUMN phone_digits TEXT NOT NULL DEFAULT ''")
+            connection.execute('UPDATE patients SET email_folded = normalize_email(email), '
+                'phone_digits = normalize_phone(phone)')
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    connection.executescript(SCHEMA)
+    if columns and not tables.issuperset(NAME_TABLES):
+        # databases created before fuzzy or indexed name search
+        with connection:
+            for phn, name in connection.execute('SELECT phn, name FROM patients').fetchall():
+                index_name(connection, phn, name)
+    return connection
+
+
+NAME_TABLES = ('name_sounds', 'name_trigrams', 'name_suffixes')
+
+
+def unindex_name(connection: sqlite3.Connection, phn: int) -> None:
+    """Drop the name search entries of the patient with this PHN."""
+    for table in NAME_TABLES:
+        connection.execute(f'DELETE FROM {table} WHERE phn = ?', (phn,))
+
+
+def index_name(connection: sqlite3.Connection, phn: int, name: str) -> None:
+    """Replace the Soundex codes, trigrams and word suffixes stored for the name of the patient with this PHN."""
+    unindex_name(connection, phn)
+    connection.executemany('INSERT OR IGNORE INTO name_sounds (code, phn) VALUES (?, ?)',
+        [(soundex(word), phn) for word in name_words(name)])
+    connection.executemany('INSERT INTO name_trigrams (gram, phn) VALUES (?, ?)',
+        [(gram, phn) for gram in trigrams(name.lower())])
+    connection.executemany('INSERT OR IGNORE INTO name_suffixes (text, phn) VALUES (?, ?)',
+        [(text, phn) for text in name_suffixes(name)])
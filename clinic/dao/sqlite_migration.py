@@ -0,0 +1,55 @@
+import os
+import sys
+from clinic.dao.note_dao_pickle import NoteDAOPickle
+from clinic.dao.patient_journal import PatientJournal
+from clinic.dao.patient_stream import iter_patients
+from clinic.dao.sqlite_connection import connect, index_name
+from clinic.dao.field_index import normalize_email, normalize_phone
+
+
+def migrate_to_sqlite(json_filename: str = 'clinic/patients.json', records_dir: str = 'clinic/records',
+    db_filename: str = 'clinic/clinic.db') -> tuple:
+    """Copy the patients in json_filename and the notes in records_dir into the SQLite database.
+
+    The changes still in the journal next to json_filename are replayed first, so a
+    journaled store is copied as it was last saved. Note codes and timestamps are kept
+    as they are. Returns the number of patients and notes copied.
+    """
+    try:
+        with open(json_filename, 'r') as file:
+            patients = {int(key): patient for key, patient in iter_patients(file)}
+    except FileNotFoundError:
+        # a journaled store that was never compacted
+        patients = {}
+    PatientJournal(json_filename).replay(patients)
+    phns = set()
+    for entry in os.listdir(records_dir):
+        phn, extension = os.path.splitext(entry)
+        if extension in ('.dat', '.notes'):
+            phns.add(phn)
+
+    connection = connect(db_filename)
+    note_count = 0
+    with connection:
+        for patient in patients.values():
+            connection.execute(
+                'INSERT OR REPLACE INTO patients (phn, name, name_folded, birth_date, phone, email, address, '
+                'email_folded, phone_digits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (int(patient.phn), patient.name, patient.name.lower(), patient.birth_date,
+                 patient.phone, patient.email, patient.address,
+                 normalize_email(patient.email), normalize_phone(patient.phone)))
+            index_name(connection, int(patient.phn), patient.name)
+        for phn in phns:
+            note_dao = NoteDAOPickle(autosave=True)
+            note_dao.load_notes(phn, records_dir)
+            connection.executemany(
+                'INSERT OR REPLACE INTO notes (phn, code, text, timestamp) VALUES (?, ?, ?, ?)',
+                [(int(phn), note.code, note.text, note.timestamp.isoformat(' ')) for note in note_dao.notes])
+            note_count += len(note_dao.notes)
+    connection.close()
+    return len(patients), note_count
+
+
+if __name__ == '__main__':
+    patient_count, note_count = migrate_to_sqlite(*sys.argv[1:4])
+    print(f'Migrated {patient_count} patients and {note_count} notes.')
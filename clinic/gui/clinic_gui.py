@@ -1,17 +1,23 @@
 import sys
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QGridLayout, QVBoxLayout, QHBoxLayout,
     QWidget, QLabel, QLineEdit, QPushButton, QMessageBox, QTableWidget,
-    QTableWidgetItem, QPlainTextEdit, QDialog, QHeaderView, QInputDialog)
+    QTableView, QAbstractItemView, QListView, QDialog, QHeaderView, QInputDialog, QCheckBox)
 
 from clinic.controller import Controller
+from clinic.patient import Patient
 
 from clinic.exception.invalid_login_exception import InvalidLoginException
 from clinic.exception.invalid_logout_exception import InvalidLogoutException
 from clinic.gui.note_dialog import NoteDialog
 from clinic.gui.patient_dialog import PatientDialog
-from datetime import datetime
+from clinic.gui.patient_table_model import PatientTableModel
+from clinic.gui.note_list_model import NoteListModel
+from clinic.gui.worker import WorkerPool
+
+PATIENT_PAGE_SIZE = 50
+NOTE_PAGE_SIZE = 20
 
 class ClinicGUI(QMainWindow): 
     def __init__(self):
@@ -19,7 +25,10 @@ class ClinicGUI(QMainWindow):
         self.patient_table = QTableWidget(self) 
         self.setCentralWidget(self.patient_table)
      
-        self.controller = Controller()
+        self.controller = Controller(journal=True, shared=True)
+        # controller calls run on the pool, so saving never blocks the window
+        self.pool = WorkerPool(self)
+        self.pool.busy_changed.connect(self.show_busy)
         self.setWindowTitle("Patient Management System")
         self.setGeometry(100, 100, 800, 600)
         
@@ -102,13 +111,29 @@ class ClinicGUI(QMainWindow):
         self.text_password.setText("")
 
     def logout_button_clicked(self):
-        """Handles logout."""
-        try:
-            if self.controller.logout():
-                QMessageBox.information(self, "Logged out", "You were succesfully logged out.")
-                self.init_login_screen()
-        except InvalidLogoutException:
-            QMessageBox.warning(self, "Error", "Logout failed.")
+        """Handles logout, once every change is saved."""
+        self.pool.submit(self.controller.logout, on_done=self.logged_out, on_error=self.logout_failed)
+
+    def logged_out(self, result):
+        """Shows the login screen again after logging out."""
+        if result:
+            QMessageBox.information(self, "Logged out", "You were succesfully logged out.")
+            self.init_login_screen()
+
+    def logout_failed(self, error):
+        """Reports a failed logout."""
+        QMessageBox.warning(self, "Error", "Logout failed.")
+
+    def show_busy(self, busy):
+        """Shows in the status bar whether changes are still being saved."""
+        if busy:
+            self.statusBar().showMessage("Working...")
+        else:
+            self.statusBar().clearMessage()
+
+    def show_error(self, error):
+        """Reports an error raised by a background call."""
+        QMessageBox.warning(self, "Error", f"Error: {str(error)}")
 
     def quit_button_clicked(self):
         ''' quit the program '''
@@ -117,7 +142,7 @@ class ClinicGUI(QMainWindow):
     def manage_patients_clicked(self):
         """Initializes the patient management screen."""
         self.clear_layout(self.main_layout)
-        self.controller.unset_current_patient()
+        self.pool.submit(self.controller.unset_current_patient)
 
         layout_h = QHBoxLayout()
         layout = QVBoxLayout()
@@ -127,6 +152,13 @@ class ClinicGUI(QMainWindow):
 
         label_patient_retrieve = QLabel("Search by name:")
         self.text_patient_retrieve = QLineEdit()
+        # live search: wait until typing pauses before looking names up
+        # owned by the search box, so it goes away with the screen instead of firing after it
+        self.search_timer = QTimer(self.text_patient_retrieve)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.live_search)
+        self.text_patient_retrieve.textChanged.connect(self.search_timer.start)
         button_patient_retrieve = QPushButton("Search")
         layout_h.addWidget(label_patient_retrieve)
         layout_h.addWidget(self.text_patient_retrieve)
@@ -141,9 +173,12 @@ class ClinicGUI(QMainWindow):
         layout_h.addWidget(button_patient_search)
         layout_h.addWidget(button_clear_search)
 
-        # patient table
-        self.patient_table = QTableWidget(0, 6)
-        self.patient_table.setHorizontalHeaderLabels(["PHN", "Name", "Date of birth", "Phone #", "E-mail", "Address"])
+        # patient table, filled a page at a time as it scrolls
+        self.patient_model = PatientTableModel(self.controller, PATIENT_PAGE_SIZE, self, self.pool)
+        self.patient_table = QTableView()
+        self.patient_table.setModel(self.patient_model)
+        self.patient_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.patient_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.patient_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.refresh_patient_table()
         
@@ -188,15 +223,33 @@ class ClinicGUI(QMainWindow):
             QMessageBox.warning(self, "Error", "Please enter a name to search.")
             #self.refresh_patient_table()
             return
-        try:
+
+        def search():
             patients = self.controller.retrieve_patients(search_name)
-            if len(patients) < 1:
-                QMessageBox.information(self, "No Results", "No patients found with that name.")
-            else:
-                self.refresh_patient_table(patients)
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error: {str(e)}")
+            # misspelled names still find the patients that sound alike
+            return patients or self.controller.retrieve_patients(search_name, 'fuzzy')
+        self.pool.submit(search, on_done=self.show_found_patients, on_error=self.show_error)
+
+    def show_found_patients(self, patients):
+        """Shows the patients found by a search."""
+        if len(patients) < 1:
+            QMessageBox.information(self, "No Results", "No patients found with that name.")
+        else:
+            self.refresh_patient_table(patients)
+
+    def live_search(self):
+        """Shows the patients whose name starts with what was typed so far"""
+        prefix = self.text_patient_retrieve.text().strip()
+        if not prefix:
+            self.refresh_patient_table()
+            return
 
+        def show_completions(patients):
+            # drop results for text that was changed while they were looked up
+            if self.text_patient_retrieve.text().strip() == prefix:
+                self.refresh_patient_table(patients)
+        self.pool.submit(self.controller.complete_patients, prefix, 50, on_done=show_completions,
+            on_error=self.show_error)
 
     def search_patient_clicked(self):
         """Searches patients by PHN"""
@@ -204,16 +257,15 @@ class ClinicGUI(QMainWindow):
         if not phn:
             QMessageBox.warning(self, "Error", "Please enter a PHN to search")
             return
-        patient_the = []
-        patient = self.controller.search_patient(int(phn))
-        patient_the.append(patient)
-        try:
-            if not patient:
-                QMessageBox.information(self, "No Results", "No patient found with that PHN.")
-            else:
-                self.refresh_patient_table(patient_the)
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error: {str(e)}")
+        self.pool.submit(self.controller.search_patient, int(phn), on_done=self.show_found_patient,
+            on_error=self.show_error)
+
+    def show_found_patient(self, patient):
+        """Shows the patient found by PHN"""
+        if not patient:
+            QMessageBox.information(self, "No Results", "No patient found with that PHN.")
+        else:
+            self.refresh_patient_table([patient])
 
     def clear_search_clicked(self):
         """clears the previous search"""
@@ -235,72 +287,96 @@ class ClinicGUI(QMainWindow):
         dialog = PatientDialog()
         if dialog.exec() == QDialog.DialogCode.Accepted:
             phn, name, birth_date, phone, email, address = dialog.get_data()
-            try:
-                new_patient = self.controller.create_patient(phn, name, birth_date, phone, email, address)
-                #self.patients.append(new_patient)
-                self.refresh_patient_table()
+            # show the new row right away, and take it back if it cannot be saved
+            shown = self.patient_model.row_of(phn) == -1
+            if shown:
+                self.patient_model.insert_patient(Patient(phn, name, birth_date, phone, email, address))
+
+            def added(new_patient):
+                self.patient_model.update_patient(phn, new_patient)
                 QMessageBox.information(self, "Success!", "Patient added.")
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"An error occurred: {str(e)}")
+
+            def failed(error):
+                if shown:
+                    self.patient_model.remove_patient(phn)
+                QMessageBox.warning(self, "Error", f"An error occurred: {str(error)}")
+            self.pool.submit(self.controller.create_patient, phn, name, birth_date, phone, email, address,
+                on_done=added, on_error=failed)
+
+    def selected_patient(self):
+        """The patient on the selected row of the table, or None"""
+        selected_row = self.patient_table.currentIndex().row()
+        if selected_row == -1:
+            return None
+        return self.patient_model.patient_at(selected_row)
 
     def delete_patient_clicked(self):
         """Handles deleting a selected patient."""
-        selected_row = self.patient_table.currentRow()
-        if selected_row == -1:
+        patient = self.selected_patient()
+        if patient is None:
             QMessageBox.warning(self, "Error", "Please select a patient.")
             return
-        phn = self.patient_table.item(selected_row, 0).text()
-        self.controller.delete_patient(int(phn))
-        QMessageBox.information(self, "Success!", "Patient deleted.")
-        self.refresh_patient_table()
-        
+        place = self.patient_model.remove_patient(patient.phn)
+
+        def failed(error):
+            self.patient_model.restore_patient(place, patient)
+            QMessageBox.warning(self, "Error", f"An error occurred: {str(error)}")
+        self.pool.submit(self.controller.delete_patient, int(patient.phn),
+            on_done=lambda result: QMessageBox.information(self, "Success!", "Patient deleted."), on_error=failed)
+
     def edit_patient(self):
         """Handles editing an existing patient's details."""
-        selected_row = self.patient_table.currentRow()
-        if selected_row == -1:
+        patient = self.selected_patient()
+        if patient is None:
             QMessageBox.warning(self, "Error", "Please select a patient.")
             return
 
-        # Get the selected patient's details
-        phn = self.patient_table.item(selected_row, 0).text()
-        name = self.patient_table.item(selected_row, 1).text()
-        birth_date = self.patient_table.item(selected_row, 2).text()
-        phone = self.patient_table.item(selected_row, 3).text()
-        email = self.patient_table.item(selected_row, 4).text()
-        address = self.patient_table.item(selected_row, 5).text()
-
-        # Create a dictionary with the patient's details
-        patient_data = {"phn": phn, "name": name, "birth_date": birth_date, "phone": phone, "email": email, "address": address}
-        print(patient_data)
+        # Create a dictionary with the selected patient's details
+        phn = str(patient.phn)
+        patient_data = {"phn": phn, "name": patient.name, "birth_date": patient.birth_date, "phone": patient.phone,
+            "email": patient.email, "address": patient.address}
 
         # Open the PatientDialog with the selected patient's details
         dialog = PatientDialog(patient=patient_data)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             try:
                 updated_phn, updated_name, updated_dob, updated_phone, updated_email, updated_address = dialog.get_data()
-
-                # Update the patient using the controller
-                self.controller.update_patient(int(phn), int(updated_phn), updated_name, updated_dob, updated_phone, updated_email, updated_address)
-                self.refresh_patient_table()
-                QMessageBox.information(self, "Success", "Patient details updated successfully.")
             except Exception as e:
-                print(e)
                 QMessageBox.warning(self, "Error", f"An error occurred: {str(e)}")
+                return
+            updated_phn = int(updated_phn)
+            # show the new details right away, and put the old ones back if they cannot be saved
+            shown = updated_phn == int(phn) or self.patient_model.row_of(updated_phn) == -1
+            if shown:
+                self.patient_model.update_patient(int(phn), Patient(updated_phn, updated_name, updated_dob,
+                    updated_phone, updated_email, updated_address))
+
+            def update():
+                # Update the patient using the controller
+                self.controller.update_patient(int(phn), updated_phn, updated_name, updated_dob, updated_phone, updated_email, updated_address)
+                return self.controller.search_patient(updated_phn)
 
-    def list_patients(self):
-        """Lists all patients"""
-        return self.controller.list_patients()
+            def updated(updated_patient):
+                self.patient_model.update_patient(updated_phn if shown else int(phn), updated_patient)
+                QMessageBox.information(self, "Success", "Patient details updated successfully.")
+
+            def failed(error):
+                if shown:
+                    self.patient_model.update_patient(updated_phn, patient)
+                QMessageBox.warning(self, "Error", f"An error occurred: {str(error)}")
+            self.pool.submit(update, on_done=updated, on_error=failed)
 
     def view_record_clicked(self):
         """Main window layout for maneging patients"""
-        selected_row = self.patient_table.currentRow()
-        if selected_row == -1:
+        patient = self.selected_patient()
+        if patient is None:
             QMessageBox.warning(self, "Error", "Please select a patient.")
             return
-        phn = self.patient_table.item(selected_row, 0).text()
-        name = self.patient_table.item(selected_row, 1).text()
-        self.controller.set_current_patient(int(phn))
-        
+        self.pool.submit(self.controller.set_current_patient, int(patient.phn),
+            on_done=lambda result: self.init_record_screen(patient.phn, patient.name), on_error=self.show_error)
+
+    def init_record_screen(self, phn, name):
+        """Initializes the note management screen of the current patient."""
         self.clear_layout(self.main_layout)
 
         layout = QVBoxLayout()
@@ -311,9 +387,11 @@ class ClinicGUI(QMainWindow):
         
         label_note_retrieve = QLabel("Search by text:")
         self.text_note_retrieve = QLineEdit()
+        self.check_note_words = QCheckBox("Words starting with")
         button_note_retrieve = QPushButton("Search")
         layout_h.addWidget(label_note_retrieve)
         layout_h.addWidget(self.text_note_retrieve)
+        layout_h.addWidget(self.check_note_words)
         layout_h.addWidget(button_note_retrieve)
 
         label_note_search = QLabel("Search by code:")
@@ -325,7 +403,12 @@ class ClinicGUI(QMainWindow):
         layout_h.addWidget(button_note_search)
         layout_h.addWidget(button_clear_search_note)
         
-        self.note_box = QPlainTextEdit()
+        # note list, newest first, with older notes fetched as it scrolls
+        self.note_model = NoteListModel(self.controller, NOTE_PAGE_SIZE, self, self.pool)
+        self.note_box = QListView()
+        self.note_box.setModel(self.note_model)
+        self.note_box.setWordWrap(True)
+        self.note_box.setSpacing(4)
 
         button_manage_create_note = QPushButton("Create Note")
         button_manage_create_note.setStyleSheet("height: 30px;")
@@ -366,28 +449,31 @@ class ClinicGUI(QMainWindow):
         dialog = NoteDialog()  
         if dialog.exec() == QDialog.DialogCode.Accepted:
             note_text = dialog.get_data()  
-            try:
-                self.controller.create_note(note_text)
-                self.refresh_note_box()
-                QMessageBox.information(self, "Success", "Note created successfully.")
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"An error occurred: {str(e)}")
-    
+            self.pool.submit(self.controller.create_note, note_text, on_done=self.note_created,
+                on_error=lambda e: QMessageBox.warning(self, "Error", f"An error occurred: {str(e)}"))
+
+    def note_created(self, note):
+        """Shows a note once it is saved."""
+        self.note_model.insert_note(note)
+        QMessageBox.information(self, "Success", "Note created successfully.")
+
     def retrieve_notes_clicked(self):
         """Retrieves and filters notes by text"""
         search_text = self.text_note_retrieve.text().strip()
         if not search_text:
             QMessageBox.warning(self, "Error", "Please enter text to search.")
             return
-        try:
-            notes = self.controller.retrieve_notes(search_text)
-            if len(notes) < 1:
-                QMessageBox.information(self, "No Results", "No notes found with that text.")
-            else:
-                self.refresh_note_box(notes)
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"Error: {str(e)}")
-
+        # the text anywhere in a note, or words starting with each search word, in any order
+        match = 'prefix' if self.check_note_words.isChecked() else 'substring'
+        self.pool.submit(self.controller.retrieve_notes, search_text, match, on_done=self.show_found_notes,
+            on_error=self.show_error)
+
+    def show_found_notes(self, notes):
+        """Shows the notes found by a text search."""
+        if len(notes) < 1:
+            QMessageBox.information(self, "No Results", "No notes found with that text.")
+        else:
+            self.refresh_note_box(notes)
 
     def search_note_clicked(self):
         """Searches and filters notes by code"""
@@ -396,16 +482,18 @@ class ClinicGUI(QMainWindow):
             QMessageBox.warning(self, "Error", "Please enter a code to search.")
             return
         try:
-            note = []
-            note_the = self.controller.search_note(int(search_code))
-            if note_the:
-                note.append(note_the)
-                self.refresh_note_box(note)
-
-            else:
-                QMessageBox.information(self, "No Results", "No notes found with that code.")
+            code = int(search_code)
         except Exception as e:
             QMessageBox.warning(self, "Error", f"Error: {str(e)}")
+            return
+        self.pool.submit(self.controller.search_note, code, on_done=self.show_found_note, on_error=self.show_error)
+
+    def show_found_note(self, note):
+        """Shows the note found by code."""
+        if note:
+            self.refresh_note_box([note])
+        else:
+            QMessageBox.information(self, "No Results", "No notes found with that code.")
 
     def update_note_clicked(self):
         """Allows editing an existing note by its code."""
@@ -418,62 +506,62 @@ class ClinicGUI(QMainWindow):
             if not new_text.strip():
                 QMessageBox.warning(self, "Error", "Note text cannot be empty.")
                 return
-            try:
-                updated = self.controller.update_note(note_code, new_text)
-                if not updated:
+
+            def update():
+                if not self.controller.update_note(note_code, new_text):
+                    return None
+                return self.controller.search_note(note_code)
+
+            def updated(note):
+                if note is None:
                     QMessageBox.warning(self, "Error", "Note code does not exist.")
                 else:
-                    self.refresh_note_box()
+                    self.note_model.update_note(note)
                     QMessageBox.information(self, "Success", "Note updated successfully!")
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"An error occurred: {str(e)}")
+            self.pool.submit(update, on_done=updated,
+                on_error=lambda e: QMessageBox.warning(self, "Error", f"An error occurred: {str(e)}"))
 
     def delete_note_clicked(self):
         """Handles deleting a selected note for the current patient."""
         note_code, ok = QInputDialog.getInt(self, "Delete Note", "Enter the code of the note you want to delete:")
         if not ok: 
             return
-        try:
-            deleted = self.controller.delete_note(note_code)
-            if not deleted:
+        # take the row away right away, and reload the notes if the note could not be deleted
+        self.note_model.remove_note(note_code)
+
+        def deleted(result):
+            if not result:
+                self.refresh_note_box()
                 QMessageBox.warning(self, "Error", "Note with that code does not exist.")
             else:
-                self.refresh_note_box()
                 QMessageBox.information(self, "Success", f"Note with code {note_code} deleted successfully!")
-        except Exception as e:
-            QMessageBox.warning(self, "Error", f"An error occurred: {str(e)}")
+
+        def failed(error):
+            self.refresh_note_box()
+            QMessageBox.warning(self, "Error", f"An error occurred: {str(error)}")
+        self.pool.submit(self.controller.delete_note, note_code, on_done=deleted, on_error=failed)
 
     def refresh_patient_table(self, patients=None):
-        """Refreshes the patient table with current data from controller."""
-        self.patient_table.setRowCount(0)
+        """Shows the given patients in the table, or lists all patients again."""
         if patients is None:
-            patients = self.list_patients()
-
-        for patient in patients:
-            row_position = self.patient_table.rowCount()
-            self.patient_table.insertRow(row_position)
-
-            self.patient_table.setItem(row_position, 0, QTableWidgetItem(str(patient.phn))) 
-            self.patient_table.setItem(row_position, 1, QTableWidgetItem(patient.name)) 
-            self.patient_table.setItem(row_position, 2, QTableWidgetItem(patient.birth_date))
-            self.patient_table.setItem(row_position, 3, QTableWidgetItem(patient.phone)) 
-            self.patient_table.setItem(row_position, 4, QTableWidgetItem(patient.email)) 
-            self.patient_table.setItem(row_position, 5, QTableWidgetItem(patient.address))
-    
+            self.patient_model.show_all()
+        else:
+            self.patient_model.show_patients(patients)
+
     def refresh_note_box(self, notes=None):
-        """refreshes note box to display updated results"""
-        self.note_box.clear()
+        """Shows the given notes in the note list, or lists all notes again."""
         if notes is None:
-            notes = self.controller.list_notes()
-        for note in notes:
-            time = datetime.strptime(str(note.timestamp), "%Y-%m-%d %H:%M:%S.%f")
-            self.note_box.appendPlainText(f'(Note Code: {note.code}) "{note.text}" Date: {time}\n')
+            self.note_model.show_all()
+        else:
+            self.note_model.show_notes(notes)
 
 def main():
     app = QApplication(sys.argv)
     window = ClinicGUI()
     window.show()
     app.exec()
+    # let the last changes finish saving before exiting
+    window.pool.wait()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,133 @@
+from bisect import bisect_left
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+from clinic.note import Note
+
+
+def format_note(note: Note) -> str:
+    """The text shown for a note in the note list."""
+    return f'(Note Code: {note.code}) "{note.text}" Date: {note.timestamp}'
+
+
+class NoteListModel(QAbstractListModel):
+    """List model over the notes of the current patient, newest first.
+
+    Without a search, older notes are fetched one page at a time as the view
+    scrolls down. Each note is formatted once, when its row is first drawn, and
+    a change only touches the row of the note that changed.
+    """
+
+    def __init__(self, controller, page_size=20, parent=None, pool=None):
+        super().__init__(parent)
+        self.controller = controller
+        self.page_size = page_size
+        self.pool = pool
+        self._fetching = False
+        self._generation = 0
+        self._notes = []
+        self._keys = []
+        self._formatted = {}
+        self._listing = True
+        self._has_more = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._notes)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        note = self._notes[index.row()]
+        text = self._formatted.get(note.code)
+        if text is None:
+            text = self._formatted[note.code] = format_note(note)
+        return text
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._listing and self._has_more and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Append the next page of notes older than the oldest one loaded, in the background with a pool."""
+        before_code = self._notes[-1].code if self._notes else None
+        generation = self._generation
+        if self.pool is None:
+            self._append_page(generation, self.controller.list_notes(self.page_size, before_code))
+            return
+        self._fetching = True
+        self.pool.submit(self.controller.list_notes, self.page_size, before_code,
+            on_done=lambda notes: self._append_page(generation, notes),
+            on_error=lambda error: self._append_page(generation, []))
+
+    def _append_page(self, generation, notes):
+        if generation != self._generation:
+            # the model was reset while this page was loading
+            return
+        self._fetching = False
+        self._has_more = len(notes) == self.page_size
+        if not notes:
+            return
+        first = len(self._notes)
+        self.beginInsertRows(QModelIndex(), first, first + len(notes) - 1)
+        self._notes.extend(notes)
+        self._keys.extend(-note.code for note in notes)
+        self.endInsertRows()
+
+    def show_all(self):
+        """Go back to listing every note of the current patient, starting from the newest page."""
+        self.beginResetModel()
+        self._generation += 1
+        self._fetching = False
+        self._notes = []
+        self._keys = []
+        self._listing = True
+        self._has_more = True
+        self.endResetModel()
+        # load the first page now, as views only ask for more once they are laid out
+        self.fetchMore()
+
+    def show_notes(self, notes):
+        """Show only the given notes, such as search results."""
+        self.beginResetModel()
+        self._generation += 1
+        self._fetching = False
+        self._notes = list(notes)
+        self._keys = [-note.code for note in self._notes]
+        self._listing = False
+        self._has_more = False
+        self.endResetModel()
+
+    def row_of(self, code: int) -> int:
+        """The row showing the note with this code, or -1."""
+        if self._listing:
+            # codes go down the list, so their negatives are sorted
+            row = bisect_left(self._keys, -code)
+            return row if row < len(self._keys) and self._keys[row] == -code else -1
+        return self._keys.index(-code) if -code in self._keys else -1
+
+    def insert_note(self, note: Note):
+        """Add a new note at the top of the listing."""
+        if not self._listing:
+            return
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._notes.insert(0, note)
+        self._keys.insert(0, -note.code)
+        self.endInsertRows()
+
+    def update_note(self, note: Note):
+        """Redraw the row of a note whose text changed."""
+        self._formatted.pop(note.code, None)
+        row = self.row_of(note.code)
+        if row == -1:
+            return
+        self._notes[row] = note
+        self.dataChanged.emit(self.index(row), self.index(row))
+
+    def remove_note(self, code: int):
+        """Remove the row of a deleted note."""
+        self._formatted.pop(code, None)
+        row = self.row_of(code)
+        if row == -1:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._notes[row]
+        del self._keys[row]
+        self.endRemoveRows()
@@ -0,0 +1,167 @@
+from bisect import bisect_left
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from clinic.patient import Patient
+
+HEADERS = ["PHN", "Name", "Date of birth", "Phone #", "E-mail", "Address"]
+FIELDS = ("phn", "name", "birth_date", "phone", "email", "address")
+
+
+class PatientTableModel(QAbstractTableModel):
+    """Table model over the patients of the controller.
+
+    Without a search, patients are listed in PHN order and fetched one page at a
+    time as the view scrolls down. Changes are applied row by row instead of
+    reloading the table.
+    """
+
+    def __init__(self, controller, page_size=50, parent=None, pool=None):
+        super().__init__(parent)
+        self.controller = controller
+        self.page_size = page_size
+        self.pool = pool
+        self._fetching = False
+        self._generation = 0
+        self._patients = []
+        self._phns = []
+        self._listing = True
+        self._has_more = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._patients)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return str(getattr(self._patients[index.row()], FIELDS[index.column()]))
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._listing and self._has_more and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Append the next page of patients after the last one loaded, in the background with a pool."""
+        after = self._phns[-1] if self._phns else None
+        generation = self._generation
+        if self.pool is None:
+            self._append_page(generation, self.controller.list_patients(self.page_size, after))
+            return
+        self._fetching = True
+        self.pool.submit(self.controller.list_patients, self.page_size, after,
+            on_done=lambda patients: self._append_page(generation, patients),
+            on_error=lambda error: self._append_page(generation, []))
+
+    def _append_page(self, generation, patients):
+        if generation != self._generation:
+            # the model was reset while this page was loading
+            return
+        self._fetching = False
+        self._has_more = len(patients) == self.page_size
+        if not patients:
+            return
+        first = len(self._patients)
+        self.beginInsertRows(QModelIndex(), first, first + len(patients) - 1)
+        self._patients.extend(patients)
+        self._phns.extend(int(patient.phn) for patient in patients)
+        self.endInsertRows()
+
+    def show_all(self):
+        """Go back to listing every patient, starting from the first page."""
+        self.beginResetModel()
+        self._generation += 1
+        self._fetching = False
+        self._patients = []
+        self._phns = []
+        self._listing = True
+        self._has_more = True
+        self.endResetModel()
+        # load the first page now, as views only ask for more once they are laid out
+        self.fetchMore()
+
+    def show_patients(self, patients):
+        """Show only the given patients, such as search results."""
+        self.beginResetModel()
+        self._generation += 1
+        self._fetching = False
+        self._patients = list(patients)
+        self._phns = [int(patient.phn) for patient in self._patients]
+        self._listing = False
+        self._has_more = False
+        self.endResetModel()
+
+    def patient_at(self, row: int) -> Patient:
+        """The patient shown on a row."""
+        return self._patients[row]
+
+    def row_of(self, phn: int) -> int:
+        """The row showing the patient with this PHN, or -1."""
+        phn = int(phn)
+        if self._listing:
+            row = bisect_left(self._phns, phn)
+            return row if row < len(self._phns) and self._phns[row] == phn else -1
+        return self._phns.index(phn) if phn in self._phns else -1
+
+    def insert_patient(self, patient: Patient):
+        """Add a new patient at its place in the listing."""
+        if not self._listing:
+            return
+        phn = int(patient.phn)
+        row = bisect_left(self._phns, phn)
+        if row == len(self._phns) and self._has_more:
+            # it comes after pages that are not loaded yet, and will be fetched with them
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._patients.insert(row, patient)
+        self._phns.insert(row, phn)
+        self.endInsertRows()
+
+    def remove_patient(self, phn: int):
+        """Remove the row of a deleted patient. Returns where it was, for restore_patient(), or None."""
+        row = self.row_of(phn)
+        if row == -1:
+            return None
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._patients[row]
+        del self._phns[row]
+        self.endRemoveRows()
+        return self._generation, row
+
+    def restore_patient(self, place, patient: Patient):
+        """Put back a row taken out by remove_patient(), when the delete failed. A listing takes it back
+        at its place by PHN, search results at the row it was on, unless they were replaced since."""
+        if place is None or self.row_of(patient.phn) != -1:
+            return
+        if self._listing:
+            self.insert_patient(patient)
+            return
+        generation, row = place
+        if generation != self._generation:
+            return
+        row = min(row, len(self._patients))
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._patients.insert(row, patient)
+        self._phns.insert(row, int(patient.phn))
+        self.endInsertRows()
+
+    def update_patient(self, old_phn: int, patient: Patient):
+        """Show the new details of a patient, moving the row if the PHN changed."""
+        row = self.row_of(old_phn)
+        if row != -1 and int(patient.phn) == int(old_phn):
+            self._patients[row] = patient
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADERS) - 1))
+            return
+        if row != -1 and not self._listing:
+            # search results keep their order
+            self._patients[row] = patient
+            self._phns[row] = int(patient.phn)
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(HEADERS) - 1))
+            return
+        self.remove_patient(old_phn)
+        self.insert_patient(patient)
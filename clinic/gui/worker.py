@@ -0,0 +1,67 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    """Signals a Worker emits from the pool thread; they are delivered on the GUI thread."""
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+
+class Worker(QRunnable):
+    """Runs one call on a pool thread and reports its result or exception."""
+
+    def __init__(self, function, args):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.function(*self.args)
+        except Exception as e:
+            self.signals.failed.emit(e)
+        else:
+            self.signals.finished.emit(result)
+
+
+class WorkerPool(QObject):
+    """Runs controller calls off the GUI thread.
+
+    The pool has a single thread, so calls run one at a time in the order they were
+    submitted and the controller is never used from two threads at once. Callbacks
+    run on the GUI thread once the call is done.
+    """
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.in_flight = 0
+        self._signals = set()
+
+    def submit(self, function, *args, on_done=None, on_error=None):
+        """Run function(*args) in the background, then on_done(result) or on_error(exception)."""
+        worker = Worker(function, args)
+        signals = worker.signals
+        # the pool deletes the worker once it has run, so keep its signals alive until the callback
+        self._signals.add(signals)
+        signals.finished.connect(lambda result: self._done(signals, on_done, result))
+        signals.failed.connect(lambda error: self._done(signals, on_error, error))
+        self.in_flight += 1
+        if self.in_flight == 1:
+            self.busy_changed.emit(True)
+        self.pool.start(worker)
+
+    def _done(self, signals, callback, value):
+        self._signals.discard(signals)
+        self.in_flight -= 1
+        if self.in_flight == 0:
+            self.busy_changed.emit(False)
+        if callback is not None:
+            callback(value)
+
+    def wait(self):
+        """Block until every submitted call has run, such as before quitting."""
+        self.pool.waitForDone()
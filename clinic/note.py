@@ -1,6 +1,8 @@
 from datetime import datetime
 
 class Note:
+    __slots__ = ('code', 'text', 'timestamp')
+
     def __init__(self, code: int, text: str, timestamp: datetime =None):
         """ Initialize a Note with a unique code, text, and an optional timestamp.
         If no timestamp is provided, the current time is used."""
@@ -8,6 +10,18 @@ class Note:
         self.text = text
         self.timestamp = timestamp or datetime.now()
 
+    def __getstate__(self) -> dict:
+        """Pickle the note as a plain dict, the same state older dict-backed notes had."""
+        return {'code': self.code, 'text': self.text, 'timestamp': self.timestamp}
+
+    def __setstate__(self, state) -> None:
+        """Restore a note pickled either from a dict-backed or a slotted Note."""
+        if isinstance(state, tuple):
+            state = state[1]
+        self.code = state['code']
+        self.text = state['text']
+        self.timestamp = state['timestamp']
+
     def __eq__(self, other) -> bool:
         """Compare this Note with another to check for equality based on code and text."""
         if not isinstance(other, Note):
@@ -19,4 +33,3 @@ class Note:
     def __repr__(self) -> str:
         """Return a string representation of the Note."""
         return f"Note({self.code}, {self.text}, {self.timestamp})"
-    
\ No newline at end of file
@@ -1,17 +1,31 @@
+import sys
 from clinic.patient_record import PatientRecord
 from typing import Union, List
 from clinic.note import Note
 
 class Patient:
-    def __init__(self, phn: int, name: str, birth_date: str, phone: str, email: str, address: str, autosave=False):
-        """Initialize a Patient with personal and contact details, and create an associated patient record."""
+    __slots__ = ('phn', 'name', 'birth_date', 'phone', 'email', 'address', '_autosave', '_patient_record')
+
+    def __init__(self, phn: int, name: str, birth_date: str, phone: str, email: str, address: str, autosave=False,
+        note_dao=None):
+        """Initialize a Patient with personal and contact details. The associated patient record
+        is only created when it is first used, unless a note_dao is given for it."""
         self.phn = phn
         self.name = name
-        self.birth_date = birth_date
+        # birth dates repeat a lot across a large roster, so share one string per date
+        self.birth_date = sys.intern(birth_date) if isinstance(birth_date, str) else birth_date
         self.phone = phone
         self.email = email
         self.address = address
-        self.patient_record = PatientRecord(autosave, phn)
+        self._autosave = autosave
+        self._patient_record = PatientRecord(autosave, phn, note_dao=note_dao) if note_dao is not None else None
+
+    @property
+    def patient_record(self) -> PatientRecord:
+        """The patient's record, created on first use."""
+        if self._patient_record is None:
+            self._patient_record = PatientRecord(self._autosave, self.phn)
+        return self._patient_record
 
     def __eq__(self, other) -> bool:
         """Check equality between this Patient and another based on personal details."""
@@ -37,9 +51,9 @@ class Patient:
         """Search for a note in the patient's record by its code."""
         return self.patient_record.search_note(code)
 
-    def retrieve_notes(self, text: str) -> List[Note]:
+    def retrieve_notes(self, text: str, match: str = 'substring') -> List[Note]:
         """Retrieve all notes in the patient's record that contain the specified text."""
-        return self.patient_record.retrieve_notes(text)
+        return self.patient_record.retrieve_notes(text, match)
 
     def update_note(self, code: int, new_text: str) -> bool:
         """Update the text of an existing note in the patient's record by code."""
@@ -49,6 +63,6 @@ class Patient:
         """Delete a note from the patient's record by code."""
         return self.patient_record.delete_note(code)
       
-    def list_notes(self) -> List[Note]:
+    def list_notes(self, limit: int = None, before_code: int = None) -> List[Note]:
         """List all notes in the patient's record from newest to oldest."""
-        return self.patient_record.list_notes()
\ No newline at end of file
+        return self.patient_record.list_notes(limit, before_code)
\ No newline at end of file
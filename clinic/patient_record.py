@@ -4,34 +4,63 @@ from typing import List, Union
 from clinic.dao.note_dao_pickle import NoteDAOPickle
 
 class PatientRecord:
-    def __init__(self, autosave, phn):
-        self.note_dao = NoteDAOPickle(autosave)
-        if autosave:
-            self.note_dao.load_notes(phn)
+    __slots__ = ('phn', 'note_dao', '_loaded')
+
+    def __init__(self, autosave, phn, lazy=True, note_dao=None):
+        """Create the record. When lazy, the notes file is only read the first time the notes are needed.
+        A note_dao that stores its own notes, such as NoteDAOSQLite, can be passed in instead."""
+        self.phn = phn
+        if note_dao is not None:
+            self.note_dao = note_dao
+            self._loaded = True
+        else:
+            self.note_dao = NoteDAOPickle(autosave)
+            # set here too, as the notes are never loaded from disk without autosave
+            self.note_dao.phn = phn
+            self._loaded = not autosave
+        if not lazy:
+            self.load_notes()
+
+    def load_notes(self) -> None:
+        """Load the patient's notes from disk, if they were not loaded yet."""
+        if not self._loaded:
+            self.note_dao.load_notes(self.phn)
+            self._loaded = True
+
+    def move(self, phn: int) -> None:
+        """Keep the notes under a new PHN, when the patient's PHN changes."""
+        self.note_dao.move_notes(phn)
+        self.phn = phn
 
     def create_note(self, text: str) -> Note:
        """Create a new note for the current patient."""
+       self.load_notes()
        return self.note_dao.create_note(text)
 
     def search_note(self, code: str) -> Union[Note, None]:
         """Search for a note by code."""
+        self.load_notes()
         return self.note_dao.search_note(code)
 
-    def retrieve_notes(self, text: str) -> List[Note]:
+    def retrieve_notes(self, text: str, match: str = 'substring') -> List[Note]:
         """Retrieve notes by text search."""
-        return self.note_dao.retrieve_notes(text)
+        self.load_notes()
+        return self.note_dao.retrieve_notes(text, match)
 
     def update_note(self, code: int, new_text: str) -> bool:
         """Update a note's text."""
+        self.load_notes()
         return self.note_dao.update_note(code, new_text)
 
     def delete_note(self, code: str) -> bool:
         """Delete a note by code.""" 
+        self.load_notes()
         return self.note_dao.delete_note(code)
 
-    def list_notes(self) -> List[Note]:
+    def list_notes(self, limit: int = None, before_code: int = None) -> List[Note]:
        """List all notes for the current patient from newest to oldest.""" 
-       return self.note_dao.list_notes()
+       self.load_notes()
+       return self.note_dao.list_notes(limit, before_code)
 
 
-    
\ No newline at end of file
+    
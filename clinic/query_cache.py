@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Tuple
+
+
+class QueryCache:
+    """Bounded LRU cache of query results, grouped into namespaces for invalidation.
+
+    Results are stored under (namespace, query). A change to the data behind a
+    namespace drops every entry of that namespace and nothing else, so a note
+    written for one patient keeps the cached patient searches and the notes of
+    other patients.
+    """
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: Hashable, query: Hashable) -> Tuple[bool, Any]:
+        """Return (True, result) for a cached query, or (False, None) after counting a miss."""
+        key = (namespace, query)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, namespace: Hashable, query: Hashable, result: Any) -> None:
+        """Cache the result of a query, evicting the least recently used entry when full."""
+        if self.capacity <= 0:
+            return
+        key = (namespace, query)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            self._namespaces.setdefault(namespace, set()).add(key)
+            while len(self._entries) > self.capacity:
+                old_key, _ = self._entries.popitem(last=False)
+                self._forget(old_key)
+
+    def invalidate(self, namespace: Hashable) -> None:
+        """Drop every cached result of a namespace."""
+        with self._lock:
+            for key in self._namespaces.pop(namespace, ()):
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._namespaces.clear()
+
+    def stats(self) -> dict:
+        """Hit and miss counters, and the current number of entries."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def _forget(self, key) -> None:
+        keys = self._namespaces.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._namespaces[key[0]]
@@ -0,0 +1,355 @@
+import asyncio
+import json
+import re
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from clinic.controller import Controller
+from clinic.exception.duplicate_login_exception import DuplicateLoginException
+from clinic.exception.illegal_access_exception import IllegalAccessException
+from clinic.exception.illegal_operation_exception import IllegalOperationException
+from clinic.exception.invalid_login_exception import InvalidLoginException
+from clinic.exception.invalid_logout_exception import InvalidLogoutException
+from clinic.exception.no_current_patient_exception import NoCurrentPatientException
+
+MAX_HEAD = 64 * 1024
+MAX_BODY = 1024 * 1024
+IDLE_TIMEOUT = 30.0
+PATIENT_FIELDS = ('phn', 'name', 'birth_date', 'phone', 'email', 'address')
+
+# how controller exceptions are reported to clients
+ERROR_STATUS = {
+    InvalidLoginException: HTTPStatus.UNAUTHORIZED,
+    IllegalAccessException: HTTPStatus.UNAUTHORIZED,
+    DuplicateLoginException: HTTPStatus.CONFLICT,
+    InvalidLogoutException: HTTPStatus.CONFLICT,
+    IllegalOperationException: HTTPStatus.CONFLICT,
+    NoCurrentPatientException: HTTPStatus.CONFLICT,
+}
+
+
+class HTTPError(Exception):
+    """A request that is answered with an error status."""
+
+    def __init__(self, status: HTTPStatus, message: str = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+def patient_to_json(patient) -> dict:
+    return {field: getattr(patient, field) for field in PATIENT_FIELDS}
+
+
+def note_to_json(note) -> dict:
+    timestamp = note.timestamp
+    return {'code': note.code, 'text': note.text,
+        'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else str(timestamp)}
+
+
+class ClinicServer:
+    """JSON-over-HTTP API in front of one Controller, so many terminals share one loaded store.
+
+    Each login opens its own controller session, so every clinician works with their
+    own current patient. Connections are served by asyncio and kept alive between
+    requests. Controller calls run on a worker thread, one request at a time, so the
+    event loop keeps accepting and parsing requests while a call waits on disk.
+    """
+
+    def __init__(self, controller: Controller = None, host: str = '127.0.0.1', port: int = 8080):
+        if controller is None:
+            controller = Controller(autosave=True, journal=True, shared=True)
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clinic-controller')
+        self.server = None
+        # open sessions by token, one per login
+        self.sessions = {}
+        self.routes = [
+            ('POST', r'/login', self.login),
+            ('POST', r'/logout', self.logout),
+            ('GET', r'/patients', self.list_patients),
+            ('POST', r'/patients', self.create_patient),
+            ('GET', r'/patients/(\d+)', self.get_patient),
+            ('PUT', r'/patients/(\d+)', self.update_patient),
+            ('DELETE', r'/patients/(\d+)', self.delete_patient),
+            ('GET', r'/patients/(\d+)/notes', self.list_notes),
+            ('POST', r'/patients/(\d+)/notes', self.create_note),
+            ('GET', r'/patients/(\d+)/notes/(\d+)', self.get_note),
+            ('PUT', r'/patients/(\d+)/notes/(\d+)', self.update_note),
+            ('DELETE', r'/patients/(\d+)/notes/(\d+)', self.delete_note),
+        ]
+        self.routes = [(method, re.compile(pattern + '$'), handler) for method, pattern, handler in self.routes]
+
+    async def start(self):
+        """Start listening; the port is the one given, or the one picked by the OS for port 0."""
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port, limit=MAX_HEAD)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        """Stop listening and wait for the controller calls in progress, then save what is pending."""
+        if self.server is not None:
+            self.server.close()
+        self.executor.shutdown(wait=True)
+        self.controller.flush()
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._write_response(writer, e.status, {'error': e.message}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                status, payload = await self._dispatch(method, target, headers, body)
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Read one request, or return None when the client is done with the connection."""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise HTTPError(HTTPStatus.BAD_REQUEST)
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED)
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        if length > MAX_BODY:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        # a client sending its body slowly is given up on like an idle one
+        body = await asyncio.wait_for(reader.readexactly(length), IDLE_TIMEOUT) if length else b''
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = connection != 'close'
+        else:
+            keep_alive = connection == 'keep-alive'
+        return method, target, headers, body, keep_alive
+
+    async def _dispatch(self, method: str, target: str, headers: dict, body: bytes):
+        url = urlsplit(target)
+        allowed = []
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(url.path)
+            if match is None:
+                continue
+            if route_method != method:
+                allowed.append(route_method)
+                continue
+            session = None
+            if handler != self.login:
+                scheme, _, token = headers.get('authorization', '').partition(' ')
+                session = self.sessions.get(token) if scheme.lower() == 'bearer' else None
+                if session is None:
+                    return HTTPStatus.UNAUTHORIZED, {'error': 'log in first, then send the session token'}
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._run, handler, match.groups(), session, query, body)
+        if allowed:
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': HTTPStatus.METHOD_NOT_ALLOWED.phrase}
+        return HTTPStatus.NOT_FOUND, {'error': HTTPStatus.NOT_FOUND.phrase}
+
+    def _run(self, handler, params, session, query, body):
+        """Run a handler on the controller thread and encode its answer there, off the event loop."""
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'the request body must be a JSON object')
+            status, payload = handler(*params, session=session, query=query, data=data)
+        except HTTPError as e:
+            status, payload = e.status, {'error': e.message}
+        except json.JSONDecodeError:
+            status, payload = HTTPStatus.BAD_REQUEST, {'error': 'the request body is not valid JSON'}
+        except tuple(ERROR_STATUS) as e:
+            status = ERROR_STATUS[type(e)]
+            payload = {'error': str(e) or type(e).__name__}
+        except Exception:
+            traceback.print_exc()
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': HTTPStatus.INTERNAL_SERVER_ERROR.phrase}
+        return status, None if payload is None else json.dumps(payload).encode()
+
+    async def _write_response(self, writer, status: HTTPStatus, payload, keep_alive: bool):
+        if isinstance(payload, dict):
+            payload = json.dumps(payload).encode()
+        head = [f'HTTP/1.1 {status.value} {status.phrase}',
+            f'Content-Length: {len(payload) if payload is not None else 0}',
+            'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+        if payload is not None:
+            head.append('Content-Type: application/json')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        if payload is not None:
+            writer.write(payload)
+        await writer.drain()
+
+    # handlers, run on the controller thread
+
+    def login(self, session, query, data):
+        """Open a session; later requests send its token as 'Authorization: Bearer <token>'."""
+        session = self.controller.open_session(_text(data, 'username'), _text(data, 'password'))
+        self.sessions[session.token] = session
+        return HTTPStatus.OK, {'token': session.token}
+
+    def logout(self, session, query, data):
+        self.controller.logout(session=session)
+        self.sessions.pop(session.token, None)
+        return HTTPStatus.OK, {'logged_in': False}
+
+    def list_patients(self, session, query, data):
+        """Search by name, prefix, email, phone or birth dates, or else list one page or all patients."""
+        if 'name' in query:
+            patients = self.controller.retrieve_patients(query['name'], query.get('match', 'substring'),
+                session=session)
+        elif 'prefix' in query:
+            patients = self.controller.complete_patients(query['prefix'], _int(query, 'limit', 10), session=session)
+        elif 'email' in query:
+            patients = self.controller.find_patients_by_email(query['email'], session=session)
+        elif 'phone' in query:
+            patients = self.controller.find_patients_by_phone(query['phone'], session=session)
+        elif 'born_from' in query or 'born_to' in query:
+            patients = self.controller.find_patients_born_between(query.get('born_from', '0000-01-01'),
+                query.get('born_to', '9999-12-31'), session=session)
+        else:
+            patients = self.controller.list_patients(_int(query, 'limit'), _int(query, 'after'), session=session)
+        return HTTPStatus.OK, [patient_to_json(patient) for patient in patients]
+
+    def create_patient(self, session, query, data):
+        patient = self.controller.create_patient(_int(data, 'phn', required=True),
+            *(_text(data, field) for field in PATIENT_FIELDS[1:]), session=session)
+        return HTTPStatus.CREATED, patient_to_json(patient)
+
+    def get_patient(self, phn, session, query, data):
+        return HTTPStatus.OK, patient_to_json(self._patient(phn, session))
+
+    def update_patient(self, phn, session, query, data):
+        """Change the fields given in the body; the others keep their value."""
+        patient = self._patient(phn, session)
+        new_phn = _int(data, 'phn', patient.phn)
+        fields = [_text(data, field, getattr(patient, field)) for field in PATIENT_FIELDS[1:]]
+        self.controller.update_patient(patient.phn, new_phn, *fields, session=session)
+        return HTTPStatus.OK, patient_to_json(self.controller.search_patient(new_phn, session=session))
+
+    def delete_patient(self, phn, session, query, data):
+        self.controller.delete_patient(self._patient(phn, session).phn, session=session)
+        return HTTPStatus.NO_CONTENT, None
+
+    def list_notes(self, phn, session, query, data):
+        """Search the notes of a patient by text, or else list one page or all of them, newest first."""
+        def run():
+            if 'text' in query:
+                return self.controller.retrieve_notes(query['text'], query.get('match', 'substring'),
+                    session=session)
+            return self.controller.list_notes(_int(query, 'limit'), _int(query, 'before'), session=session)
+        return HTTPStatus.OK, [note_to_json(note) for note in self._with_patient(phn, session, run)]
+
+    def create_note(self, phn, session, query, data):
+        note = self._with_patient(phn, session,
+            lambda: self.controller.create_note(_text(data, 'text'), session=session))
+        return HTTPStatus.CREATED, note_to_json(note)
+
+    def get_note(self, phn, code, session, query, data):
+        note = self._with_patient(phn, session, lambda: self.controller.search_note(int(code), session=session))
+        if note is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, 'no such note')
+        return HTTPStatus.OK, note_to_json(note)
+
+    def update_note(self, phn, code, session, query, data):
+        def run():
+            if not self.controller.update_note(int(code), _text(data, 'text'), session=session):
+                raise HTTPError(HTTPStatus.NOT_FOUND, 'no such note')
+            return self.controller.search_note(int(code), session=session)
+        return HTTPStatus.OK, note_to_json(self._with_patient(phn, session, run))
+
+    def delete_note(self, phn, code, session, query, data):
+        if not self._with_patient(phn, session, lambda: self.controller.delete_note(int(code), session=session)):
+            raise HTTPError(HTTPStatus.NOT_FOUND, 'no such note')
+        return HTTPStatus.NO_CONTENT, None
+
+    def _patient(self, phn, session):
+        patient = self.controller.search_patient(int(phn), session=session)
+        if patient is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, 'no such patient')
+        return patient
+
+    def _with_patient(self, phn, session, run):
+        """Run a note operation with phn as the current patient, then unset it again."""
+        self._patient(phn, session)
+        self.controller.set_current_patient(int(phn), session=session)
+        try:
+            return run()
+        finally:
+            # a current patient cannot be updated or deleted, so do not leave one behind
+            self.controller.unset_current_patient(session=session)
+
+
+def _int(values: dict, name: str, default=None, required=False):
+    if name not in values:
+        if required:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'{name} is missing')
+        return default
+    try:
+        return int(values[name])
+    except (TypeError, ValueError):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'{name} must be an integer')
+
+
+def _text(values: dict, name: str, default=None) -> str:
+    value = values.get(name, default)
+    if value is None:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'{name} is missing')
+    if not isinstance(value, str):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f'{name} must be a string')
+    return value
+
+
+def main(port: int = 8080, host: str = '127.0.0.1'):
+    server = ClinicServer(host=host, port=port)
+    try:
+        asyncio.run(_serve(server))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # save the changes still waiting for a group commit
+        server.close()
+
+
+async def _serve(server: ClinicServer):
+    await server.start()
+    print(f'Serving the clinic on http://{server.host}:{server.port}', file=sys.stderr)
+    await server.serve_forever()
@@ -0,0 +1,22 @@
+import secrets
+
+
+class Session:
+    """One clinician's login to a Controller: who they are and the patient they are working with.
+
+    A session is true while it is logged in. Its token lets a front end such as the
+    API server find the session of a request again.
+    """
+    __slots__ = ('username', 'token', 'current_patient', 'logged_in')
+
+    def __init__(self, username: str):
+        self.username = username
+        self.token = secrets.token_urlsafe(24)
+        self.current_patient = None
+        self.logged_in = True
+
+    def __bool__(self) -> bool:
+        return self.logged_in
+
+    def __repr__(self) -> str:
+        return f"Session({self.username}, logged_in={self.logged_in})"
@@ -0,0 +1,40 @@
+import hashlib
+import os
+import sys
+
+import pytest
+
+# the tests import the clinic package from the repository root, whatever the working directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PASSWORD = '123456'
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty data directory laid out like clinic/ in the repository, made the working directory,
+    with one user 'user' whose password is PASSWORD."""
+    records = tmp_path / 'clinic' / 'records'
+    records.mkdir(parents=True)
+    password_hash = hashlib.sha256(PASSWORD.encode('utf-8')).hexdigest()
+    (tmp_path / 'clinic' / 'users.txt').write_text(f'user,{password_hash}\n')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """The Qt application the GUI tests run in, drawing offscreen. Skips them without PyQt6."""
+    pytest.importorskip('PyQt6')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def controller(workdir):
+    """A controller without autosave, logged in as 'user'."""
+    from clinic.controller import Controller
+    controller = Controller(autosave=False)
+    controller.login('user', '123456')
+    return controller
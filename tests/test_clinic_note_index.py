@@ -0,0 +1,89 @@
+import pytest
+
+from clinic.controller import Controller
+from clinic.dao.clinic_note_index import ClinicNoteIndex
+from clinic.note import Note
+
+
+def add(controller, phn, name, *notes):
+    controller.create_patient(phn, name, '1980-05-05', '2505551234', f'{phn}@example.com', '2 Street')
+    controller.set_current_patient(phn)
+    for text in notes:
+        controller.create_note(text)
+    controller.unset_current_patient()
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def controller(workdir, backend):
+    controller = Controller(autosave=True, backend=backend)
+    controller.login('user', '123456')
+    add(controller, 1, 'Ana Lima', 'Blood pressure high', 'Asthma follow up')
+    add(controller, 2, 'Bo Chen', 'Asthma inhaler refill')
+    return controller
+
+
+def test_search_across_patients(controller):
+    assert controller.search_all_notes('asthma') == [(2, 1), (1, 2)]
+    assert controller.search_all_notes('blood high') == [(1, 1)]
+    assert controller.search_all_notes('inh', prefix=True) == [(2, 1)]
+    assert controller.search_all_notes('asthma', limit=1) == [(2, 1)]
+
+
+def test_note_changes_are_indexed(controller):
+    controller.rebuild_note_index()
+    controller.set_current_patient(2)
+    controller.update_note(1, 'Migraine')
+    controller.create_note('Asthma again')
+    controller.unset_current_patient()
+
+    assert controller.search_all_notes('migraine') == [(2, 1)]
+    assert controller.search_all_notes('asthma') == [(2, 2), (1, 2)]
+
+
+def test_deleted_patient_leaves_the_index(controller):
+    controller.rebuild_note_index()
+    controller.delete_patient(1)
+    assert controller.search_all_notes('asthma') == [(2, 1)]
+    assert controller.search_all_notes('blood') == []
+
+
+def test_changed_phn_moves_the_notes(controller):
+    controller.rebuild_note_index()
+    controller.update_patient(1, 7, 'Ana Lima', '1980-05-05', '2505551234', 'ana@example.com', '2 Street')
+    assert controller.search_all_notes('blood') == [(7, 1)]
+
+    controller.set_current_patient(7)
+    controller.create_note('Blood test ordered')
+    assert [note.text for note in controller.list_notes()] == \
+        ['Blood test ordered', 'Asthma follow up', 'Blood pressure high']
+    controller.unset_current_patient()
+    assert controller.search_all_notes('blood') == [(7, 3), (7, 1)]
+
+
+def test_changed_phn_keeps_the_notes_after_a_restart(controller, backend):
+    controller.update_patient(1, 7, 'Ana Lima', '1980-05-05', '2505551234', 'ana@example.com', '2 Street')
+    controller.logout()
+
+    restarted = Controller(autosave=True, backend=backend)
+    restarted.login('user', '123456')
+    restarted.set_current_patient(7)
+    assert [note.text for note in restarted.list_notes()] == ['Asthma follow up', 'Blood pressure high']
+    assert restarted.search_all_notes('blood') == [(7, 1)]
+
+
+def test_index_methods():
+    index = ClinicNoteIndex(':memory:')
+    index.note_changed(1, Note(1, 'alpha beta'))
+    index.note_changed(2, Note(1, 'alpha'))
+    index.note_changed(3, Note(1, 'stale alpha'))
+    index.patient_moved(1, 3)
+    assert sorted(index.search('alpha')) == [(2, 1), (3, 1)]
+    assert index.search('stale') == []
+    index.patient_removed(2)
+    index.note_removed(3, 1)
+    assert index.search('alpha') == []
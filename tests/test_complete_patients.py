@@ -0,0 +1,59 @@
+import pytest
+
+from clinic.dao.name_index import PrefixIndex, name_suffixes
+from clinic.dao.patient_dao_indexed import PatientDAOIndexed
+from clinic.dao.patient_dao_json import PatientDAOJSON
+from clinic.dao.patient_dao_sqlite import PatientDAOSQLite
+
+NAMES = {1: 'Anna Smith', 2: 'Smith,  Anna', 3: 'John Smithers', 4: 'Ann Lee', 5: 'Lee Ann Jones', 6: 'Bo Chen'}
+
+
+@pytest.fixture(params=['json', 'sqlite', 'index'])
+def dao(workdir, request):
+    writer = PatientDAOSQLite(autosave=True) if request.param == 'sqlite' \
+        else PatientDAOJSON(autosave=True, phn_index=True)
+    for phn, name in NAMES.items():
+        writer.create_patient(phn, name, '1980-05-05', '250', 'a@b.c', 'x')
+    if request.param == 'index':
+        return PatientDAOIndexed()
+    return writer
+
+
+@pytest.mark.parametrize('prefix, limit, expected', [
+    ('ann', 10, [5, 4, 2, 1]),
+    ('Ann  L', 10, [4]),
+    ('smi', 10, [1, 2, 3]),
+    ('smith, a', 10, [2]),
+    ('lee ann', 10, [5]),
+    ('  LEE ', 10, [4, 5]),
+    ('a', 2, [5, 4]),
+    ('zed', 10, []),
+    ('', 3, [5, 4, 2]),
+])
+def test_every_backend_matches_word_prefixes(dao, prefix, limit, expected):
+    assert [patient.phn for patient in dao.complete_patients(prefix, limit)] == expected
+
+
+def test_name_suffixes():
+    assert name_suffixes(' Lee  Ann Jones ') == ['lee ann jones', 'ann jones', 'jones']
+
+
+def test_bulk_and_incremental_builds_agree():
+    one_by_one = PrefixIndex()
+    for key, name in NAMES.items():
+        one_by_one.add(key, name)
+    bulk = PrefixIndex()
+    bulk.add_all(NAMES.items())
+    assert bulk._entries == one_by_one._entries
+    for prefix in ('a', 'ann', 'smith', 'lee a', 'j'):
+        assert bulk.complete(prefix) == one_by_one.complete(prefix)
+
+
+def test_narrowing_queries_reuse_the_last_range():
+    index = PrefixIndex()
+    index.add_all(NAMES.items())
+    assert index.complete('s') == [1, 2, 3]
+    assert index.complete('smithe') == [3]
+    index.remove(3)
+    assert index.complete('smithe') == []
+    assert index.complete('s') == [1, 2]
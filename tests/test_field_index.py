@@ -0,0 +1,72 @@
+import pytest
+
+from clinic.controller import Controller
+from clinic.dao.field_index import RangeIndex, normalize_email, normalize_phone
+
+PATIENTS = [
+    (1, 'Ana Lima', '1980-05-05', '(250) 555-1234', 'Ana@Example.com'),
+    (2, 'Bo Chen', '1975-01-31', '250.555.9999', 'bo@example.com'),
+    (3, 'Cy Dunn', '1980-05-05', '250 555 1234', ' ana@example.COM '),
+    (4, 'Di Eve', '2001-12-01', '2505550000', 'di@example.com'),
+]
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def controller(workdir, backend):
+    controller = Controller(autosave=True, backend=backend)
+    controller.login('user', '123456')
+    for phn, name, birth_date, phone, email in PATIENTS:
+        controller.create_patient(phn, name, birth_date, phone, email, 'x')
+    return controller
+
+
+def phns(patients):
+    return [patient.phn for patient in patients]
+
+
+def test_normalizers():
+    assert normalize_email(' Ana@Example.COM ') == 'ana@example.com'
+    assert normalize_phone('+1 (250) 555-1234') == '12505551234'
+
+
+def test_exact_lookups(controller):
+    assert phns(controller.find_patients_by_email('ANA@example.com')) == [1, 3]
+    assert phns(controller.find_patients_by_phone('250-555-1234')) == [1, 3]
+    assert phns(controller.find_patients_by_phone('1')) == []
+
+
+def test_birth_date_ranges(controller):
+    assert phns(controller.find_patients_born_between('1975-01-31', '1980-05-05')) == [2, 1, 3]
+    assert phns(controller.find_patients_born_between('1980-05-06', '2001-12-01')) == [4]
+    assert phns(controller.find_patients_born_between('2002-01-01', '2003-01-01')) == []
+
+
+def test_indexes_follow_changes(controller):
+    controller.update_patient(1, 5, 'Ana Lima', '2001-12-01', '250 555 0000', 'new@example.com', 'x')
+    controller.delete_patient(3)
+    assert phns(controller.find_patients_by_email('ana@example.com')) == []
+    assert phns(controller.find_patients_by_phone('2505550000')) == [4, 5]
+    assert phns(controller.find_patients_born_between('2001-12-01', '2001-12-01')) == [4, 5]
+
+
+def test_bulk_and_incremental_range_builds_agree():
+    one_by_one = RangeIndex()
+    for phn, _, birth_date, _, _ in PATIENTS:
+        one_by_one.add(phn, birth_date)
+    bulk = RangeIndex()
+    bulk.add_all((phn, birth_date) for phn, _, birth_date, _, _ in PATIENTS)
+    assert bulk._entries == one_by_one._entries
+    bulk.remove(1)
+    assert bulk.between('1980-01-01', '1980-12-31') == [3]
+
+
+def test_loaded_roster_is_indexed(controller, backend):
+    controller.logout()
+    reloaded = Controller(autosave=True, backend=backend)
+    reloaded.login('user', '123456')
+    assert phns(reloaded.find_patients_born_between('1980-01-01', '2001-12-31')) == [1, 3, 4]
@@ -0,0 +1,56 @@
+import pytest
+
+from clinic.cli.main_menu_cli import MainMenuCLI
+from clinic.controller import Controller
+from clinic.dao.phonetic_index import bounded_distance, name_words, rank_fuzzy, soundex
+
+NAMES = {1: 'Robert Smith', 2: 'Rupert Smyth', 3: 'Katherine Lee', 4: 'Catherine Li', 5: 'José Núñez'}
+
+
+@pytest.mark.parametrize('word, code', [
+    ('Robert', 'r163'), ('rupert', 'r163'), ('Ashcraft', 'a261'), ('Tymczak', 't522'), ('Lee', 'l000'), ('', ''),
+])
+def test_soundex(word, code):
+    assert soundex(word) == code
+
+
+def test_bounded_distance():
+    assert bounded_distance('smith', 'smyth', 2) == 1
+    assert bounded_distance('kitten', 'sitting', 5) == 3
+    assert bounded_distance('kitten', 'sitting', 2) == 3
+    assert bounded_distance('a', 'abcdef', 2) == 3
+
+
+def test_name_words_and_ranking():
+    assert name_words("O'Neil-Smith 3rd") == ['o', 'neil', 'smith', 'rd']
+    assert rank_fuzzy('smith', NAMES.items()) == [1, 2]
+    assert rank_fuzzy('', NAMES.items()) == []
+
+
+@pytest.fixture(params=['json', 'sqlite', 'index'])
+def controller(workdir, request):
+    writer = Controller(autosave=True, backend='sqlite' if request.param == 'sqlite' else 'json', phn_index=True)
+    writer.login('user', '123456')
+    for phn, name in NAMES.items():
+        writer.create_patient(phn, name, '1980-05-05', '250', 'a@b.c', 'x')
+    if request.param != 'index':
+        return writer
+    writer.logout()
+    reader = Controller(autosave=True, backend='index')
+    reader.login('user', '123456')
+    return reader
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('Smith', [1, 2]), ('rupret', [2]), ('Kathrine', [3]), ('catherine lee', [3, 4]), ('jose nunez', [5]),
+    ('zzz', []),
+])
+def test_fuzzy_search_on_every_backend(controller, query, expected):
+    assert [patient.phn for patient in controller.retrieve_patients(query, 'fuzzy')] == expected
+
+
+def test_cli_falls_back_to_fuzzy(monkeypatch, capsys, controller):
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'Smyht')
+    MainMenuCLI(controller).retrieve_patients_by_name()
+    out = capsys.readouterr().out
+    assert 'No exact match' in out and 'Rupert Smyth' in out
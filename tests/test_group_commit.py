@@ -0,0 +1,54 @@
+import threading
+
+from clinic.dao.group_commit import GroupCommitWriter
+from clinic.dao.patient_dao_json import PatientDAOJSON
+
+
+class Owner:
+    def __init__(self):
+        self.writes = 0
+        self.written = threading.Event()
+
+    def write_pending(self):
+        self.writes += 1
+        self.written.set()
+
+
+def test_changes_are_coalesced_until_flush():
+    writer = GroupCommitWriter(delay=60, batch_size=100)
+    owner = Owner()
+    for _ in range(10):
+        writer.mark_dirty(owner)
+    assert owner.writes == 0
+    writer.flush()
+    assert owner.writes == 1
+    writer.flush()
+    assert owner.writes == 1
+
+
+def test_full_batch_is_written_right_away():
+    writer = GroupCommitWriter(delay=60, batch_size=3)
+    owner = Owner()
+    for _ in range(3):
+        writer.mark_dirty(owner)
+    assert owner.written.wait(5)
+
+
+def test_timer_writes_after_the_delay():
+    writer = GroupCommitWriter(delay=0.01, batch_size=100)
+    owner = Owner()
+    writer.mark_dirty(owner)
+    assert owner.written.wait(5)
+
+
+def test_dao_saves_once_per_group(workdir):
+    dao = PatientDAOJSON(autosave=True, group_commit=True, commit_delay=60)
+    for phn in range(1, 6):
+        dao.create_patient(phn, f'Patient {phn}', '1980-05-05', '250', 'a@b.c', 'x')
+    dao.open_patient(1).create_note('saved with the group')
+    assert not (workdir / 'clinic' / 'patients.json').exists()
+    assert not (workdir / 'clinic' / 'records' / '1.notes').exists()
+
+    dao.flush()
+    assert [patient.phn for patient in PatientDAOJSON(autosave=True).list_patients()] == [1, 2, 3, 4, 5]
+    assert (workdir / 'clinic' / 'records' / '1.notes').exists()
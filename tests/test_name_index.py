@@ -0,0 +1,54 @@
+import pytest
+
+from clinic.dao.name_index import TrigramIndex, trigrams
+from clinic.dao.patient_dao_json import PatientDAOJSON
+
+NAMES = {1: 'Ana Lima', 2: 'Bo Chen', 3: 'Anabel Chenoweth', 4: 'Liam Nash', 5: 'Ünal Öz'}
+
+
+@pytest.fixture
+def index():
+    index = TrigramIndex()
+    for key, name in NAMES.items():
+        index.add(key, name)
+    return index
+
+
+def test_trigrams():
+    assert trigrams('chen') == {'che', 'hen'}
+    assert trigrams('ab') == set()
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('chen', [2, 3]), ('CHEN', [2, 3]), ('a l', [1]), ('an', [1, 3]), ('ünal', [5]),
+    ('mna', []), ('zzz', []), ('', [1, 2, 3, 4, 5]),
+])
+def test_substring_search(index, query, expected):
+    assert index.search(query) == expected
+
+
+def test_every_trigram_is_not_enough():
+    index = TrigramIndex()
+    index.add(1, 'abcd bcde')
+    # abc, bcd and cde all occur, but not as one run
+    assert index.search('abcde') == []
+
+
+def test_remove_and_re_add(index):
+    index.remove(2)
+    index.remove(99)
+    assert index.search('chen') == [3]
+    index.add(2, 'Bo Chen')
+    # a re-added name goes to the end of the insertion order
+    assert index.search('chen') == [3, 2]
+    assert 'bo ' in index._postings and index.search('bo c') == [2]
+
+
+def test_dao_search_follows_changes(workdir):
+    dao = PatientDAOJSON(autosave=False)
+    for phn, name in NAMES.items():
+        dao.create_patient(phn, name, '1980-05-05', '250', 'a@b.c', 'x')
+    dao.update_patient(2, 6, 'Bo Smith', '1980-05-05', '250', 'a@b.c', 'x')
+    dao.delete_patient(3)
+    assert [patient.phn for patient in dao.retrieve_patients('chen')] == []
+    assert [patient.phn for patient in dao.retrieve_patients('smi')] == [6]
@@ -0,0 +1,81 @@
+import pytest
+
+from clinic.cli.appointment_menu_cli import AppointmentMenuCLI
+from clinic.dao.note_dao_pickle import NoteDAOPickle
+from clinic.dao.note_dao_sqlite import NoteDAOSQLite
+from clinic.dao.note_index import NoteTextIndex
+from clinic.dao.sqlite_connection import connect
+from clinic.note import Note
+
+TEXTS = ['Blood pressure high', 'Pressure of blood normal', 'Booked an x-ray', 'bloodwork pending']
+
+
+@pytest.fixture(params=['pickle', 'sqlite'])
+def note_dao(request):
+    note_dao = NoteDAOPickle() if request.param == 'pickle' else NoteDAOSQLite(connect(':memory:'), 1)
+    for text in TEXTS:
+        note_dao.create_note(text)
+    return note_dao
+
+
+@pytest.mark.parametrize('query, match, expected', [
+    ('blood pressure', 'substring', [1]),
+    ('blood pressure', 'word', [1, 2]),
+    ('BLOOD', 'word', [1, 2]),
+    ('blood', 'prefix', [1, 2, 4]),
+    ('pres bl', 'prefix', [1, 2]),
+    ('x-ray', 'word', [3]),
+    ('ood', 'substring', [1, 2, 4]),
+    ('ood', 'prefix', []),
+    ('', 'word', []),
+])
+def test_match_modes_agree_on_every_backend(note_dao, query, match, expected):
+    assert [note.code for note in note_dao.retrieve_notes(query, match)] == expected
+
+
+def test_index_follows_updates_and_deletes():
+    note_dao = NoteDAOPickle()
+    for text in TEXTS:
+        note_dao.create_note(text)
+    note_dao.update_note(1, 'Heart rate high')
+    note_dao.delete_note(4)
+
+    assert [note.code for note in note_dao.retrieve_notes('blood', 'prefix')] == [2]
+    assert [note.code for note in note_dao.retrieve_notes('heart', 'word')] == [1]
+    assert 'bloodwork' not in note_dao.index._words
+
+
+def test_rebuild():
+    index = NoteTextIndex()
+    index.add(9, 'stale')
+    index.rebuild([Note(1, 'fresh start')])
+    assert index.search_words('stale') == set()
+    assert index.search_words('fre', prefix=True) == {1}
+
+
+class RecordingController:
+    def __init__(self, found):
+        self.found = found
+        self.calls = []
+
+    def retrieve_notes(self, text, match='substring'):
+        self.calls.append(match)
+        return self.found.get(match, [])
+
+
+def test_substring_search_finds_the_text_inside_words(note_dao):
+    note_dao.create_note('prediabetes noted')
+    note_dao.create_note('diabetes type 2')
+    assert [note.text for note in note_dao.retrieve_notes('diabetes')] == ['prediabetes noted', 'diabetes type 2']
+    assert [note.text for note in note_dao.retrieve_notes('diabetes', 'prefix')] == ['diabetes type 2']
+
+
+@pytest.mark.parametrize('choice, match', [(2, 'substring'), (3, 'prefix')])
+def test_cli_searches_in_the_chosen_mode(monkeypatch, capsys, choice, match):
+    controller = RecordingController({match: [Note(1, 'blood pressure')]})
+    controller.unset_current_patient = lambda: None
+    answers = iter([str(choice), 'blood', '', '7'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    AppointmentMenuCLI(controller).appointment_menu()
+    assert controller.calls == [match]
+    assert 'Notes found for blood' in capsys.readouterr().out
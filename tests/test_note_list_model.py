@@ -0,0 +1,57 @@
+import pytest
+
+from clinic.note import Note
+
+
+@pytest.fixture
+def model(qapp, controller):
+    from clinic.gui.note_list_model import NoteListModel
+    controller.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    controller.set_current_patient(1)
+    for count in range(1, 6):
+        controller.create_note(f'note {count}')
+    model = NoteListModel(controller, page_size=2)
+    model.show_all()
+    return model
+
+
+def shown(model):
+    return [model._notes[row].code for row in range(model.rowCount())]
+
+
+def test_older_pages_are_fetched_as_the_view_scrolls(model):
+    assert shown(model) == [5, 4]
+    model.fetchMore()
+    model.fetchMore()
+    assert shown(model) == [5, 4, 3, 2, 1]
+    assert not model.canFetchMore()
+
+
+def test_rows_are_formatted_once(model):
+    text = model.data(model.index(0))
+    assert text.startswith('(Note Code: 5) "note 5"')
+    assert model.data(model.index(0)) is text
+
+
+def test_changes_touch_single_rows(model, controller):
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append(first.row()))
+    model.insert_note(controller.create_note('note 6'))
+    note = controller.search_note(5)
+    controller.update_note(5, 'edited')
+    model.update_note(note)
+    model.remove_note(6)
+
+    assert changed == [1]
+    assert shown(model) == [5, 4]
+    assert '"edited"' in model.data(model.index(0))
+    model.remove_note(1)
+    assert shown(model) == [5, 4]
+
+
+def test_search_results(model):
+    model.show_notes([Note(2, 'two'), Note(4, 'four')])
+    assert shown(model) == [2, 4]
+    assert model.row_of(4) == 1 and model.row_of(5) == -1
+    model.insert_note(Note(9, 'not shown in a search'))
+    assert shown(model) == [2, 4]
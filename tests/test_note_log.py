@@ -0,0 +1,65 @@
+import os
+from pickle import dump, load
+
+from clinic.dao.note_dao_pickle import NoteDAOPickle
+from clinic.dao.note_migration import migrate_records
+from clinic.note import Note
+
+
+def open_notes(phn, compact_after=256):
+    note_dao = NoteDAOPickle(autosave=True, compact_after=compact_after)
+    note_dao.load_notes(phn)
+    return note_dao
+
+
+def read_log(phn):
+    records = []
+    with open(f'clinic/records/{phn}.notes', 'rb') as file:
+        while True:
+            try:
+                records.append(load(file))
+            except EOFError:
+                return records
+
+
+def test_each_change_is_one_record(workdir):
+    note_dao = open_notes(7)
+    note_dao.create_note('first')
+    note_dao.create_note('second')
+    note_dao.update_note(1, 'first, edited')
+    note_dao.delete_note(2)
+
+    # the first save writes the compacted log, the later ones append
+    assert [record[0] for record in read_log(7)] == ['counter', 'create', 'create', 'update', 'delete']
+    reloaded = open_notes(7)
+    assert [note.text for note in reloaded.notes] == ['first, edited']
+    assert reloaded.create_note('third').code == 3
+
+
+def test_log_is_compacted_once_it_grows(workdir):
+    note_dao = open_notes(8, compact_after=4)
+    note_dao.create_note('kept')
+    for count in range(10):
+        note_dao.update_note(1, f'edit {count}')
+
+    assert len(read_log(8)) <= 2 + 4 + 1
+    assert open_notes(8).search_note(1).text == 'edit 9'
+
+
+def test_torn_record_is_ignored(workdir):
+    note_dao = open_notes(9)
+    note_dao.create_note('whole')
+    with open('clinic/records/9.notes', 'ab') as file:
+        file.write(b'\x80\x04\x95')
+
+    assert [note.text for note in open_notes(9).notes] == ['whole']
+
+
+def test_old_pickle_files_are_read_and_migrated(workdir):
+    with open('clinic/records/10.dat', 'wb') as file:
+        dump([Note(1, 'old format', None), Note(2, 'still old', None)], file)
+
+    assert [note.text for note in open_notes(10).notes] == ['old format', 'still old']
+    assert migrate_records() == 1
+    assert not os.path.exists('clinic/records/10.dat')
+    assert [note.text for note in open_notes(10).notes] == ['old format', 'still old']
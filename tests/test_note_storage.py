@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from clinic.controller import Controller
+from clinic.dao.note_dao_pickle import NewestFirstView, NoteDAOPickle
+
+
+@pytest.fixture
+def note_dao():
+    note_dao = NoteDAOPickle()
+    for text in ('first', 'second', 'third', 'fourth'):
+        note_dao.create_note(text)
+    note_dao.delete_note(2)
+    return note_dao
+
+
+def test_lookups_by_code(note_dao):
+    assert note_dao.search_note(3).text == 'third'
+    assert note_dao.search_note('3').text == 'third'
+    assert note_dao.search_note(2) is None
+    assert note_dao.update_note(4, 'fourth, edited')
+    assert not note_dao.update_note(2, 'gone')
+    assert not note_dao.delete_note(2)
+    assert note_dao.codes == [1, 3, 4]
+
+
+def test_view_is_a_newest_first_sequence(note_dao):
+    view = note_dao.list_notes()
+    assert isinstance(view, NewestFirstView)
+    assert [note.code for note in view] == [4, 3, 1]
+    assert view[0].code == 4 and view[-1].code == 1
+    assert [note.code for note in view[1:]] == [3, 1]
+    with pytest.raises(IndexError):
+        view[3]
+    assert view == list(view)
+    assert view != None
+    assert view.index(note_dao.search_note(3)) == 1
+
+
+def test_view_follows_changes(note_dao):
+    view = note_dao.list_notes()
+    note_dao.create_note('fifth')
+    assert view[0].text == 'fifth' and len(view) == 4
+
+
+def test_pages(note_dao):
+    assert [note.code for note in note_dao.list_notes(2)] == [4, 3]
+    assert [note.code for note in note_dao.list_notes(2, 3)] == [1]
+    assert note_dao.list_notes(2, 1) == []
+
+
+def test_controller_returns_a_snapshot(workdir):
+    controller = Controller(autosave=False)
+    controller.login('user', '123456')
+    controller.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    controller.set_current_patient(1)
+    controller.create_note('first')
+    notes = controller.list_notes()
+    controller.create_note('second')
+
+    assert isinstance(notes, list) and notes[0].text == 'first'
+    assert notes != None
+    assert [note.text for note in controller.list_notes()] == ['second', 'first']
+
+
+def test_listing_while_other_sessions_write(workdir):
+    controller = Controller(autosave=False)
+    controller.login('user', '123456')
+    controller.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    controller.set_current_patient(1)
+    writer = controller.open_session('ali', '@G00dPassw0rd')
+    controller.set_current_patient(1, session=writer)
+    errors = []
+
+    def write():
+        for count in range(300):
+            controller.create_note(f'note {count}', session=writer)
+
+    def read():
+        try:
+            for _ in range(300):
+                for note in controller.list_notes():
+                    note.text
+        except RuntimeError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=write), threading.Thread(target=read)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(controller.list_notes()) == 300
@@ -0,0 +1,56 @@
+import pytest
+
+from clinic.controller import Controller
+from clinic.dao.patient_dao_json import PatientDAOJSON
+
+PHNS = [50, 10, 40, 20, 30]
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def controller(workdir, request):
+    controller = Controller(autosave=True, backend=request.param)
+    controller.login('user', '123456')
+    for phn in PHNS:
+        controller.create_patient(phn, f'Patient {phn}', '1980-05-05', '250', 'a@b.c', 'x')
+    return controller
+
+
+def phns(patients):
+    return [patient.phn for patient in patients]
+
+
+def test_patient_pages(controller):
+    assert phns(controller.list_patients()) == [10, 20, 30, 40, 50]
+    assert phns(controller.list_patients(2)) == [10, 20]
+    assert phns(controller.list_patients(2, 20)) == [30, 40]
+    assert phns(controller.list_patients(2, 45)) == [50]
+    assert phns(controller.list_patients(2, 50)) == []
+    assert phns(controller.list_patients(None, 30)) == [40, 50]
+
+
+def test_pages_follow_changes(controller):
+    assert phns(controller.list_patients(2, 20)) == [30, 40]
+    controller.create_patient(25, 'Patient 25', '1980-05-05', '250', 'a@b.c', 'x')
+    controller.delete_patient(30)
+    assert phns(controller.list_patients(2, 20)) == [25, 40]
+
+
+def test_note_pages(controller):
+    controller.set_current_patient(10)
+    for count in range(1, 6):
+        controller.create_note(f'note {count}')
+    assert [note.code for note in controller.list_notes(2)] == [5, 4]
+    assert [note.code for note in controller.list_notes(2, 4)] == [3, 2]
+    assert [note.code for note in controller.list_notes(2, 2)] == [1]
+    assert [note.code for note in controller.list_notes(None, 3)] == [2, 1]
+
+
+def test_loaded_phns_are_sorted_once(workdir):
+    dao = PatientDAOJSON(autosave=True)
+    for phn in PHNS:
+        dao.create_patient(phn, f'Patient {phn}', '1980-05-05', '250', 'a@b.c', 'x')
+    reloaded = PatientDAOJSON(autosave=True)
+    assert reloaded.sorted_phns == [10, 20, 30, 40, 50]
+    reloaded.create_patient(35, 'Patient 35', '1980-05-05', '250', 'a@b.c', 'x')
+    reloaded.delete_patient(10)
+    assert reloaded.sorted_phns == [20, 30, 35, 40, 50]
@@ -0,0 +1,56 @@
+import json
+
+from clinic.dao.patient_dao_json import PatientDAOJSON
+from clinic.dao.patient_journal import PatientJournal
+
+
+def add(dao, phn, name):
+    return dao.create_patient(phn, name, '1980-05-05', '2505551234', f'{phn}@example.com', '2 Street')
+
+
+def test_changes_are_appended_not_rewritten(workdir):
+    dao = PatientDAOJSON(autosave=True, journal=True)
+    add(dao, 1, 'Ana Lima')
+    add(dao, 2, 'Bo Chen')
+    dao.update_patient(2, 3, 'Bo Chen', '1980-05-05', '2505551234', 'bo@example.com', '2 Street')
+    dao.delete_patient(1)
+
+    assert not (workdir / 'clinic' / 'patients.json').exists()
+    ops = [json.loads(line)['op'] for line in open(workdir / 'clinic' / 'patients.journal')]
+    assert ops == ['put', 'put', 'delete', 'put', 'delete']
+
+    reloaded = PatientDAOJSON(autosave=True, journal=True)
+    assert [patient.phn for patient in reloaded.list_patients()] == [3]
+    assert reloaded.search_patient(3).email == 'bo@example.com'
+
+
+def test_compaction_writes_a_snapshot_and_drops_the_log(workdir):
+    dao = PatientDAOJSON(autosave=True, journal=True)
+    dao.journal.threshold = 1
+    add(dao, 1, 'Ana Lima')
+    dao.journal.wait()
+
+    assert (workdir / 'clinic' / 'patients.json').exists()
+    assert not (workdir / 'clinic' / 'patients.journal.old').exists()
+    assert PatientDAOJSON(autosave=True).search_patient(1).name == 'Ana Lima'
+
+
+def test_interrupted_compaction_still_replays(workdir):
+    dao = PatientDAOJSON(autosave=True, journal=True)
+    add(dao, 1, 'Ana Lima')
+    # as if a compaction had rotated the log and crashed before writing the snapshot
+    (workdir / 'clinic' / 'patients.journal').rename(workdir / 'clinic' / 'patients.journal.old')
+    add(dao, 2, 'Bo Chen')
+
+    patients = {}
+    PatientJournal('clinic/patients.json').replay(patients)
+    assert sorted(patients) == [1, 2]
+
+
+def test_torn_last_line_is_skipped(workdir):
+    dao = PatientDAOJSON(autosave=True, journal=True)
+    add(dao, 1, 'Ana Lima')
+    with open(workdir / 'clinic' / 'patients.journal', 'a') as file:
+        file.write('{"op": "put", "key": "2", "pat')
+
+    assert [patient.phn for patient in PatientDAOJSON(autosave=True, journal=True).list_patients()] == [1]
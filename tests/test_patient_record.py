@@ -0,0 +1,43 @@
+from clinic.controller import Controller
+from clinic.patient_record import PatientRecord
+
+
+def test_notes_are_read_on_first_use(workdir):
+    record = PatientRecord(True, 9001)
+    record.create_note('first visit')
+    record.create_note('follow up')
+
+    reloaded = PatientRecord(True, 9001)
+    assert not reloaded._loaded
+    assert [note.text for note in reloaded.list_notes()] == ['follow up', 'first visit']
+    assert reloaded._loaded
+
+
+def test_eager_record_loads_right_away(workdir):
+    PatientRecord(True, 9002).create_note('allergic to penicillin')
+
+    record = PatientRecord(True, 9002, lazy=False)
+    assert record._loaded
+    assert record.search_note(1).text == 'allergic to penicillin'
+
+
+def test_record_without_autosave_needs_no_file(workdir):
+    record = PatientRecord(False, 9003)
+    assert record._loaded
+    assert record.create_note('no disk').code == 1
+
+
+def test_startup_does_not_read_notes(workdir):
+    controller = Controller(autosave=True)
+    controller.login('user', '123456')
+    controller.create_patient(9004, 'Ana Lima', '1990-01-01', '2505550000', 'ana@example.com', '1 Road')
+    controller.set_current_patient(9004)
+    controller.create_note('blood pressure normal')
+    controller.logout()
+
+    controller = Controller(autosave=True)
+    patient = controller.patient_dao.search_patient(9004)
+    assert patient._patient_record is None
+    controller.login('user', '123456')
+    controller.set_current_patient(9004)
+    assert [note.text for note in controller.list_notes()] == ['blood pressure normal']
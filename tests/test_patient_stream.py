@@ -0,0 +1,43 @@
+import io
+import json
+
+import pytest
+
+from clinic.dao.patient_decoder import PatientDecoder
+from clinic.dao.patient_stream import dump_patients, iter_patients
+from clinic.patient import Patient
+
+
+def patients(count):
+    return {phn: Patient(phn, f'Patient {phn} "quoted" {{braces}}', '1980-05-05', '250', f'{phn}@example.com',
+        'Unit 1, Street') for phn in range(1, count + 1)}
+
+
+def test_dump_matches_the_patients_json_layout():
+    file = io.StringIO()
+    dump_patients(patients(3), file)
+    assert json.loads(file.getvalue(), cls=PatientDecoder) == {str(phn): patient
+        for phn, patient in patients(3).items()}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64 * 1024])
+def test_round_trip_in_any_chunk_size(chunk_size):
+    file = io.StringIO()
+    dump_patients(patients(20), file)
+    file.seek(0)
+    assert {int(key): patient for key, patient in iter_patients(file, chunk_size)} == patients(20)
+
+
+def test_empty_and_spaced_documents():
+    assert list(iter_patients(io.StringIO('{}'))) == []
+    assert list(iter_patients(io.StringIO(' \n{ \n} '))) == []
+    document = json.dumps({'5': {'__type__': 'Patient', 'phn': 5, 'name': 'Ana', 'dob': '1980-05-05',
+        'phone': '250', 'email': 'a@b.c', 'address': 'x'}}, indent=4)
+    assert [(key, patient.name) for key, patient in iter_patients(io.StringIO(document), 3)] == [('5', 'Ana')]
+
+
+def test_truncated_document_raises():
+    file = io.StringIO()
+    dump_patients(patients(2), file)
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_patients(io.StringIO(file.getvalue()[:-10]), 8))
@@ -0,0 +1,73 @@
+import pytest
+
+from clinic.patient import Patient
+
+
+@pytest.fixture
+def model(qapp, controller):
+    from clinic.gui.patient_table_model import PatientTableModel
+    for phn in (10, 20, 30, 40, 50, 60, 70):
+        controller.create_patient(phn, f'Patient {phn}', '1980-05-05', '250', 'a@b.c', 'x')
+    model = PatientTableModel(controller, page_size=3)
+    model.show_all()
+    return model
+
+
+def shown(model):
+    return [model.patient_at(row).phn for row in range(model.rowCount())]
+
+
+def test_pages_are_fetched_as_the_view_scrolls(model):
+    assert shown(model) == [10, 20, 30]
+    assert model.canFetchMore()
+    model.fetchMore()
+    model.fetchMore()
+    assert shown(model) == [10, 20, 30, 40, 50, 60, 70]
+    assert not model.canFetchMore()
+    assert model.columnCount() == 6
+    assert model.data(model.index(1, 1)) == 'Patient 20'
+
+
+def test_changes_touch_single_rows(model):
+    inserted = []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    model.insert_patient(Patient(15, 'Patient 15', '1980-05-05', '250', 'a@b.c', 'x'))
+    # after the loaded pages: fetched with them later
+    model.insert_patient(Patient(45, 'Patient 45', '1980-05-05', '250', 'a@b.c', 'x'))
+    assert inserted == [(1, 1)]
+    assert shown(model) == [10, 15, 20, 30]
+
+    model.remove_patient(20)
+    model.update_patient(10, Patient(25, 'Patient 25', '1980-05-05', '250', 'a@b.c', 'x'))
+    assert shown(model) == [15, 25, 30]
+    assert model.row_of(30) == 2 and model.row_of(20) == -1
+
+
+def test_search_results_keep_their_order(model, controller):
+    model.show_patients([controller.search_patient(40), controller.search_patient(10)])
+    assert shown(model) == [40, 10]
+    assert not model.canFetchMore()
+    model.insert_patient(Patient(5, 'Patient 5', '1980-05-05', '250', 'a@b.c', 'x'))
+    model.update_patient(40, Patient(45, 'Renamed', '1980-05-05', '250', 'a@b.c', 'x'))
+    assert shown(model) == [45, 10]
+    model.show_all()
+    assert shown(model) == [10, 20, 30]
+
+
+def test_failed_delete_puts_the_row_back(model, controller):
+    place = model.remove_patient(20)
+    model.restore_patient(place, controller.search_patient(20))
+    assert shown(model) == [10, 20, 30]
+
+    model.show_patients([controller.search_patient(40), controller.search_patient(10)])
+    place = model.remove_patient(40)
+    assert shown(model) == [10]
+    model.restore_patient(place, controller.search_patient(40))
+    assert shown(model) == [40, 10]
+
+    # results shown since the delete are left as they are
+    place = model.remove_patient(10)
+    model.show_patients([controller.search_patient(30)])
+    model.restore_patient(place, controller.search_patient(10))
+    assert shown(model) == [30]
+    assert model.remove_patient(10) is None
@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+from clinic.controller import Controller
+from clinic.dao.patient_dao_indexed import PatientDAOIndexed
+from clinic.dao.patient_dao_json import PatientDAOJSON
+from clinic.dao.phn_index import PhnIndex, write_phn_index
+from clinic.exception.illegal_operation_exception import IllegalOperationException
+from clinic.patient import Patient
+
+
+def patient(phn, name='Ana Lima'):
+    return Patient(phn, name, '1980-05-05', '2505551234', f'{phn}@example.com', '2 Street')
+
+
+@pytest.fixture
+def index(workdir):
+    write_phn_index([patient(phn) for phn in (50, 10, 40, 20, 30)], 'clinic/patients.jsonl', 'clinic/patients.idx')
+    return PhnIndex('clinic/patients.idx', 'clinic/patients.jsonl')
+
+
+def test_point_lookups(index):
+    assert len(index) == 5
+    assert index.search(40) == patient(40)
+    assert index.search(35) is None
+    assert index.search(5) is None
+    assert index.search(60) is None
+
+
+def test_pages_and_iteration_are_in_phn_order(index):
+    assert [found.phn for found in index] == [10, 20, 30, 40, 50]
+    assert [found.phn for found in index.page(2)] == [10, 20]
+    assert [found.phn for found in index.page(2, 20)] == [30, 40]
+    assert [found.phn for found in index.page(None, 40)] == [50]
+
+
+def test_empty_index(workdir):
+    write_phn_index([], 'clinic/patients.jsonl', 'clinic/patients.idx')
+    index = PhnIndex('clinic/patients.idx', 'clinic/patients.jsonl')
+    assert index.search(1) is None
+    assert list(index) == []
+
+
+def test_json_dao_keeps_the_index_current(workdir):
+    dao = PatientDAOJSON(autosave=True, phn_index=True)
+    dao.create_patient(7, 'Bo Chen', '1970-01-01', '250', 'bo@example.com', '3 Street')
+    dao.create_patient(3, 'Ana Lima', '1980-05-05', '250', 'ana@example.com', '2 Street')
+
+    indexed = PatientDAOIndexed()
+    assert indexed.search_patient(7).name == 'Bo Chen'
+    assert [found.phn for found in indexed.list_patients()] == [3, 7]
+    with pytest.raises(IllegalOperationException):
+        indexed.delete_patient(7)
+
+
+def test_controller_index_backend(workdir):
+    controller = Controller(autosave=True, phn_index=True)
+    controller.login('user', '123456')
+    controller.create_patient(7, 'Bo Chen', '1970-01-01', '250', 'bo@example.com', '3 Street')
+    controller.logout()
+
+    controller = Controller(autosave=True, backend='index')
+    controller.login('user', '123456')
+    assert controller.search_patient(7).name == 'Bo Chen'
+    assert [found.phn for found in controller.retrieve_patients('chen')] == [7]
+
+
+def test_reader_maps_a_rewritten_index_again(workdir):
+    dao = PatientDAOJSON(autosave=True, phn_index=True)
+    dao.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'ana@example.com', '2 Street')
+    indexed = PatientDAOIndexed()
+    generation = indexed.generation
+
+    dao.create_patient(2, 'Bo Chen', '1970-01-01', '250', 'bo@example.com', '3 Street')
+    assert indexed.search_patient(2).name == 'Bo Chen'
+    assert len(indexed.index) == 2
+    assert indexed.generation != generation
+    assert not indexed.refresh()
+
+
+def test_reader_lays_journaled_changes_over_the_index(workdir):
+    dao = PatientDAOJSON(autosave=True, journal=True, phn_index=True)
+    for phn, name in ((1, 'Ana Lima'), (3, 'Cy Lima'), (5, 'Di Lima')):
+        dao.create_patient(phn, name, '1980-05-05', '250', f'{phn}@example.com', '2 Street')
+    indexed = PatientDAOIndexed()
+    assert len(indexed.index) == 0
+
+    dao.update_patient(3, 4, 'Cy Lima-Diaz', '1980-05-05', '250', '3@example.com', '2 Street')
+    dao.delete_patient(5)
+    dao.create_patient(2, 'Bo Chen', '1970-01-01', '250', 'bo@example.com', '3 Street')
+    assert indexed.search_patient(3) is None
+    assert indexed.search_patient(4).name == 'Cy Lima-Diaz'
+    assert [found.phn for found in indexed.list_patients()] == [1, 2, 4]
+    assert [found.phn for found in indexed.list_patients(1, 1)] == [2]
+    assert [found.phn for found in indexed.retrieve_patients('lima')] == [1, 4]
+
+    # compacting moves the changes from the journal into the index
+    dao.journal.threshold = 1
+    dao.create_patient(6, 'Ed Park', '1990-01-01', '250', 'ed@example.com', '4 Street')
+    dao.journal.wait()
+    assert [found.phn for found in indexed.list_patients()] == [1, 2, 4, 6]
+    assert len(indexed.index) == 4
+    assert indexed.changes == {}
+
+
+def test_controller_index_backend_drops_stale_results(workdir):
+    writer = Controller(autosave=True, journal=True, phn_index=True, shared=True)
+    writer.login('user', '123456')
+    writer.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'ana@example.com', '2 Street')
+    reader = Controller(autosave=True, backend='index')
+    reader.login('user', '123456')
+    assert [found.phn for found in reader.retrieve_patients('lima')] == [1]
+
+    writer.create_patient(2, 'Cy Lima', '1980-05-05', '250', 'cy@example.com', '2 Street')
+    assert [found.phn for found in reader.retrieve_patients('lima')] == [1, 2]
+
+
+def test_notes_are_read_only_through_the_index(workdir):
+    writer = Controller(autosave=True, journal=True, phn_index=True, shared=True)
+    writer.login('user', '123456')
+    writer.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'ana@example.com', '2 Street')
+    writer.set_current_patient(1)
+    writer.create_note('blood test')
+    reader = Controller(autosave=True, backend='index')
+    reader.login('user', '123456')
+    reader.set_current_patient(1)
+    assert [note.text for note in reader.list_notes()] == ['blood test']
+
+    saved = os.path.getsize('clinic/records/1.notes')
+    for change in (lambda: reader.create_note('x'), lambda: reader.update_note(1, 'x'),
+            lambda: reader.delete_note(1)):
+        with pytest.raises(IllegalOperationException):
+            change()
+    assert os.path.getsize('clinic/records/1.notes') == saved
+    writer.create_note('knee pain')
+    assert [note.text for note in reader.list_notes()] == ['knee pain', 'blood test']
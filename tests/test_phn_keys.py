@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from clinic.controller import Controller
+from clinic.dao.patient_dao_json import PatientDAOJSON
+from clinic.exception.illegal_operation_exception import IllegalOperationException
+
+
+@pytest.fixture
+def controller(workdir):
+    controller = Controller(autosave=True)
+    controller.login('user', '123456')
+    controller.create_patient('12', 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    return controller
+
+
+def test_string_and_int_phns_find_the_same_patient(controller):
+    assert controller.search_patient(12) is controller.search_patient('12')
+    assert controller.search_patient(12).phn == 12
+
+
+def test_created_patient_is_found_right_away_and_after_a_restart(controller):
+    controller.set_current_patient('12')
+    assert controller.get_current_patient().phn == 12
+    controller.logout()
+
+    dao = PatientDAOJSON(autosave=True)
+    assert list(dao._patients) == [12]
+    assert json.load(open('clinic/patients.json'))['12']['phn'] == 12
+
+
+def test_journal_keys_are_ints(workdir):
+    dao = PatientDAOJSON(autosave=True, journal=True)
+    dao.create_patient('7', 'Bo Chen', '1970-01-01', '250', 'b@c.d', 'y')
+    dao.delete_patient(7)
+    dao.create_patient(7, 'Bo Chen', '1970-01-01', '250', 'b@c.d', 'y')
+    assert list(PatientDAOJSON(autosave=True, journal=True)._patients) == [7]
+
+
+def test_unknown_patient_cannot_be_current(controller):
+    with pytest.raises(IllegalOperationException):
+        controller.set_current_patient(13)
+    with pytest.raises(IllegalOperationException):
+        controller.delete_patient('13')
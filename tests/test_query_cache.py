@@ -0,0 +1,91 @@
+import pytest
+
+from clinic.controller import Controller
+from clinic.query_cache import QueryCache
+
+
+def test_lru_eviction_and_stats():
+    cache = QueryCache(2)
+    cache.put('a', 1, 'one')
+    cache.put('a', 2, 'two')
+    assert cache.get('a', 1) == (True, 'one')
+    cache.put('b', 3, 'three')
+    assert cache.get('a', 2) == (False, None)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'size': 2}
+
+
+def test_invalidation_is_per_namespace():
+    cache = QueryCache()
+    cache.put('a', 1, 'one')
+    cache.put('b', 1, 'other')
+    cache.invalidate('a')
+    assert cache.get('a', 1) == (False, None)
+    assert cache.get('b', 1) == (True, 'other')
+    cache.clear()
+    assert cache.stats()['size'] == 0
+
+
+def test_zero_capacity_caches_nothing():
+    cache = QueryCache(0)
+    cache.put('a', 1, 'one')
+    assert cache.get('a', 1) == (False, None)
+
+
+@pytest.fixture
+def controller(workdir):
+    controller = Controller(autosave=False)
+    controller.login('user', '123456')
+    for phn, name in ((1, 'Ana Lima'), (2, 'Bo Chen')):
+        controller.create_patient(phn, name, '1980-05-05', '250', 'a@b.c', 'x')
+    return controller
+
+
+def test_repeated_queries_are_cache_hits(controller):
+    controller.retrieve_patients('ana')
+    first = controller.retrieve_patients('ANA')
+    assert controller.cache_stats()['hits'] == 1
+    # callers get their own copy of a cached result
+    first.clear()
+    assert [patient.phn for patient in controller.retrieve_patients('ana')] == [1]
+
+
+def test_patient_changes_invalidate_patient_queries(controller):
+    assert [patient.phn for patient in controller.list_patients()] == [1, 2]
+    controller.create_patient(3, 'Anabel Chen', '1980-05-05', '250', 'a@b.c', 'x')
+    assert [patient.phn for patient in controller.retrieve_patients('chen')] == [2, 3]
+    controller.update_patient(3, 4, 'Anabel Chen', '1980-05-05', '250', 'a@b.c', 'x')
+    controller.delete_patient(2)
+    assert [patient.phn for patient in controller.retrieve_patients('chen')] == [4]
+    assert [patient.phn for patient in controller.list_patients()] == [1, 4]
+
+
+def test_note_changes_only_invalidate_that_patient(controller):
+    controller.set_current_patient(1)
+    controller.create_note('first')
+    assert [note.text for note in controller.retrieve_notes('first')] == ['first']
+    controller.retrieve_patients('ana')
+    controller.update_note(1, 'changed')
+    assert controller.retrieve_notes('first') == []
+    hits = controller.cache_stats()['hits']
+    controller.retrieve_patients('ana')
+    assert controller.cache_stats()['hits'] == hits + 1
+    controller.delete_note(1)
+    assert controller.list_notes() == []
+
+
+def test_sqlite_results_are_dropped_after_other_processes_commit(workdir):
+    first, second = Controller(backend='sqlite'), Controller(backend='sqlite')
+    for controller in (first, second):
+        controller.login('user', '123456')
+    first.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    assert [patient.phn for patient in second.retrieve_patients('lima')] == [1]
+    first.set_current_patient(1)
+    second.set_current_patient(1)
+    first.create_note('blood test')
+    assert [note.text for note in second.list_notes()] == ['blood test']
+
+    first.create_patient(2, 'Cy Lima', '1980-05-05', '250', 'c@b.c', 'x')
+    first.create_note('knee pain')
+    assert [patient.phn for patient in second.retrieve_patients('lima')] == [1, 2]
+    assert [note.text for note in second.list_notes()] == ['knee pain', 'blood test']
+    assert not second.patient_dao.refresh()
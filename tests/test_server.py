@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import pytest
+
+from clinic.server import ClinicServer
+
+ANA = {'phn': 1, 'name': 'Ana Lima', 'birth_date': '1980-05-05', 'phone': '250', 'email': 'a@b.c', 'address': 'x'}
+
+
+class Client:
+    """One kept-alive connection to the server."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.token = None
+
+    async def send(self, raw: bytes):
+        self.writer.write(raw)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        headers = dict(line.lower().split(': ', 1) for line in lines[1:] if line)
+        length = int(headers.get('content-length', 0))
+        data = await self.reader.readexactly(length) if length else b''
+        return int(lines[0].split(' ')[1]), json.loads(data) if data else None
+
+    async def request(self, method, path, payload=None, token=None):
+        body = json.dumps(payload).encode() if payload is not None else b''
+        token = token or self.token
+        auth = f'Authorization: Bearer {token}\r\n' if token else ''
+        return await self.send(f'{method} {path} HTTP/1.1\r\nHost: test\r\n{auth}'
+            f'Content-Length: {len(body)}\r\n\r\n'.encode() + body)
+
+    async def login(self, username='user', password='123456'):
+        status, answer = await self.request('POST', '/login', {'username': username, 'password': password})
+        assert status == 200
+        self.token = answer['token']
+
+
+def serve(controller, scenario):
+    """Run scenario(server, connect) against a server on a free port."""
+    async def main():
+        server = ClinicServer(controller, port=0)
+        await server.start()
+
+        async def connect():
+            return Client(*await asyncio.open_connection('127.0.0.1', server.port))
+        try:
+            await scenario(server, connect)
+        finally:
+            server.close()
+            await server.server.wait_closed()
+    asyncio.run(main())
+
+
+def test_patients_and_notes_over_http(controller):
+    async def scenario(server, connect):
+        client = await connect()
+        assert (await client.request('GET', '/patients'))[0] == 401
+        await client.login()
+        assert await client.request('POST', '/patients', ANA) == (201, ANA)
+        assert (await client.request('POST', '/patients', ANA))[0] == 409
+        assert await client.request('GET', '/patients/1') == (200, ANA)
+        assert (await client.request('GET', '/patients/2'))[0] == 404
+        assert await client.request('GET', '/patients?name=lim') == (200, [ANA])
+        status, patient = await client.request('PUT', '/patients/1', {'phone': '999'})
+        assert status == 200 and patient['phone'] == '999'
+
+        status, note = await client.request('POST', '/patients/1/notes', {'text': 'blood test'})
+        assert status == 201 and note['code'] == 1
+        await client.request('PUT', '/patients/1/notes/1', {'text': 'blood test, normal'})
+        status, notes = await client.request('GET', '/patients/1/notes?text=blood&match=prefix')
+        assert [note['text'] for note in notes] == ['blood test, normal']
+        assert (await client.request('DELETE', '/patients/1/notes/1'))[0] == 204
+        assert (await client.request('GET', '/patients/1/notes/1'))[0] == 404
+        # no current patient is left behind, so the patient can be deleted
+        assert (await client.request('DELETE', '/patients/1'))[0] == 204
+        assert await client.request('POST', '/logout') == (200, {'logged_in': False})
+        assert (await client.request('GET', '/patients'))[0] == 401
+    serve(controller, scenario)
+
+
+def test_bad_requests(controller):
+    async def scenario(server, connect):
+        client = await connect()
+        await client.login()
+        assert (await client.request('PATCH', '/patients'))[0] == 405
+        assert (await client.request('GET', '/nowhere'))[0] == 404
+        assert (await client.request('GET', '/patients?limit=ten'))[0] == 400
+        assert (await client.request('POST', '/patients', {'phn': 5}))[0] == 400
+        status, answer = await client.send(b'POST /patients HTTP/1.1\r\nAuthorization: Bearer '
+            + client.token.encode() + b'\r\nContent-Length: 3\r\n\r\n[1]')
+        assert status == 400
+        # the connection is still usable after an error
+        assert (await client.request('GET', '/patients'))[0] == 200
+        assert (await client.send(b'GET /patients HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n'))[0] == 413
+        client = await connect()
+        assert (await client.send(b'GET /patients HTTP/1.1\r\nContent-Length: -5\r\n\r\n'))[0] == 400
+    serve(controller, scenario)
+
+
+def test_slow_body_is_given_up_on(controller, monkeypatch):
+    monkeypatch.setattr('clinic.server.IDLE_TIMEOUT', 0.2)
+
+    async def scenario(server, connect):
+        client = await connect()
+        client.writer.write(b'POST /login HTTP/1.1\r\nContent-Length: 10\r\n\r\n{"us')
+        await client.writer.drain()
+        # the server closes the connection instead of waiting for the rest of the body
+        assert await asyncio.wait_for(client.reader.read(), 5) == b''
+    serve(controller, scenario)
+
+
+def test_concurrent_clients(controller):
+    async def scenario(server, connect):
+        setup = await connect()
+        await setup.login()
+        for phn in range(1, 21):
+            await setup.request('POST', '/patients', dict(ANA, phn=phn, name=f'Patient {phn}'))
+
+        async def clinician(phn):
+            client = await connect()
+            await client.login()
+            for count in range(5):
+                status, _ = await client.request('POST', f'/patients/{phn}/notes', {'text': f'visit {count}'})
+                assert status == 201
+            status, notes = await client.request('GET', f'/patients/{phn}/notes?limit=3')
+            return [note['code'] for note in notes]
+
+        results = await asyncio.gather(*(clinician(phn) for phn in range(1, 21)))
+        assert results == [[5, 4, 3]] * 20
+    serve(controller, scenario)
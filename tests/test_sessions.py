@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from clinic.controller import Controller
+from clinic.exception.duplicate_login_exception import DuplicateLoginException
+from clinic.exception.illegal_access_exception import IllegalAccessException
+from clinic.exception.illegal_operation_exception import IllegalOperationException
+from clinic.exception.invalid_login_exception import InvalidLoginException
+from clinic.exception.invalid_logout_exception import InvalidLogoutException
+from clinic.exception.no_current_patient_exception import NoCurrentPatientException
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def controller(workdir, request):
+    controller = Controller(autosave=False, backend=request.param)
+    controller.login('user', '123456')
+    for phn in (1, 2):
+        controller.create_patient(phn, f'Patient {phn}', '1980-05-05', '250', 'a@b.c', 'x')
+    return controller
+
+
+def test_default_session_keeps_the_old_api(controller):
+    with pytest.raises(DuplicateLoginException):
+        controller.login('user', '123456')
+    controller.logout()
+    with pytest.raises(InvalidLogoutException):
+        controller.logout()
+    with pytest.raises(IllegalAccessException):
+        controller.list_patients()
+    with pytest.raises(InvalidLoginException):
+        controller.login('user', 'wrong')
+
+
+def test_sessions_have_their_own_current_patient(controller):
+    other = controller.open_session('ali', '@G00dPassw0rd')
+    controller.set_current_patient(1)
+    controller.set_current_patient(2, session=other)
+    controller.create_note('for patient 1')
+    controller.create_note('for patient 2', session=other)
+
+    assert controller.get_current_patient().phn == 1
+    assert controller.get_current_patient(session=other).phn == 2
+    assert [note.text for note in controller.list_notes()] == ['for patient 1']
+    assert [note.text for note in controller.list_notes(session=other)] == ['for patient 2']
+    controller.unset_current_patient(session=other)
+    with pytest.raises(NoCurrentPatientException):
+        controller.list_notes(session=other)
+    assert controller.get_current_patient().phn == 1
+
+
+def test_patient_current_in_any_session_cannot_change(controller):
+    other = controller.open_session('ali', '@G00dPassw0rd')
+    controller.set_current_patient(2, session=other)
+    with pytest.raises(IllegalOperationException):
+        controller.delete_patient(2)
+    with pytest.raises(IllegalOperationException):
+        controller.update_patient(2, 3, 'Patient 3', '1980-05-05', '250', 'a@b.c', 'x')
+    controller.logout(session=other)
+    controller.delete_patient(2)
+
+
+def test_logged_out_session_is_refused(controller):
+    other = controller.open_session('ali', '@G00dPassw0rd')
+    controller.logout(session=other)
+    assert not other
+    with pytest.raises(IllegalAccessException):
+        controller.list_patients(session=other)
+    assert controller.list_patients()
+
+
+def test_sessions_used_from_many_threads(controller):
+    errors = []
+
+    def clinician(phn):
+        try:
+            session = controller.open_session('user', '123456')
+            for count in range(50):
+                controller.set_current_patient(phn, session=session)
+                controller.create_note(f'{phn}/{count}', session=session)
+                assert controller.get_current_patient(session=session).phn == phn
+            controller.logout(session=session)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=clinician, args=(phn,)) for phn in (1, 2) * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    controller.set_current_patient(1)
+    assert len(controller.list_notes()) == 200
@@ -0,0 +1,200 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from clinic.controller import Controller
+from clinic.dao.file_lock import FileLock
+from clinic.dao.note_dao_pickle import NoteDAOPickle
+from clinic.dao.patient_dao_json import PatientDAOJSON
+from clinic.dao.patient_journal import PatientJournal
+from clinic.patient import Patient
+
+
+def add(dao, phn, name):
+    return dao.create_patient(phn, name, '1980-05-05', '250', f'{phn}@example.com', 'x')
+
+
+def held_by_other(lock_filename, exclusive):
+    """Check, from another lock instance, if taking the lock would have to wait."""
+    other = FileLock(lock_filename)
+    acquired = threading.Event()
+
+    def take():
+        with (other.exclusive() if exclusive else other.shared()):
+            acquired.set()
+
+    thread = threading.Thread(target=take, daemon=True)
+    thread.start()
+    waited = not acquired.wait(0.2)
+    return waited, thread, other
+
+
+def test_file_lock_readers_share_and_writers_exclude(workdir):
+    lock = FileLock('clinic/patients.lock')
+    with lock.shared():
+        waited, thread, other = held_by_other('clinic/patients.lock', exclusive=False)
+        assert not waited
+        waited, thread, other = held_by_other('clinic/patients.lock', exclusive=True)
+        assert waited
+    thread.join(5)
+    assert not thread.is_alive()
+    other.close()
+    lock.close()
+
+
+def test_file_lock_is_reentrant_and_upgrades(workdir):
+    lock = FileLock('clinic/patients.lock')
+    with lock.shared():
+        with lock.exclusive():
+            with lock.shared():
+                waited, thread, other = held_by_other('clinic/patients.lock', exclusive=False)
+                assert waited
+        # back to shared: other readers get in
+        thread.join(5)
+        assert not thread.is_alive()
+    other.close()
+    lock.close()
+
+
+@pytest.fixture(params=[False, True], ids=['snapshot', 'journal'])
+def daos(workdir, request):
+    first = PatientDAOJSON(autosave=True, journal=request.param, shared=True)
+    second = PatientDAOJSON(autosave=True, journal=request.param, shared=True)
+    return first, second
+
+
+def test_changes_of_other_processes_are_merged(daos):
+    first, second = daos
+    add(first, 1, 'Ana Lima')
+    add(first, 2, 'Bo Chen')
+    assert [patient.phn for patient in second.list_patients()] == [1, 2]
+
+    first.update_patient(2, 2, 'Bo Chen-Smith', '1980-05-05', '250', 'bo@example.com', 'x')
+    first.delete_patient(1)
+    generation = second.generation
+    assert second.refresh()
+    assert second.generation != generation
+    assert not second.refresh()
+    assert [patient.phn for patient in second.list_patients()] == [2]
+    assert [patient.phn for patient in second.retrieve_patients('smith')] == [2]
+
+
+def test_merge_updates_patients_in_place(daos):
+    first, second = daos
+    add(first, 1, 'Ana Lima')
+    patient = second.open_patient(1)
+    first.update_patient(1, 1, 'Ana Lima-Diaz', '1980-05-05', '250', 'ana@example.com', 'x')
+    second.refresh()
+    # an open patient keeps its loaded notes
+    assert second.search_patient(1) is patient
+    assert patient.name == 'Ana Lima-Diaz'
+
+
+def test_unsaved_group_commit_change_is_not_overwritten(workdir):
+    first = PatientDAOJSON(autosave=True, shared=True)
+    second = PatientDAOJSON(autosave=True, shared=True, group_commit=True, commit_delay=60)
+    add(first, 1, 'Ana Lima')
+    add(second, 2, 'Bo Chen')
+    first.update_patient(1, 1, 'Ana Lima-Diaz', '1980-05-05', '250', 'ana@example.com', 'x')
+    assert second.search_patient(2) is not None
+    assert second.search_patient(1).name == 'Ana Lima-Diaz'
+    second.flush()
+    assert [patient.phn for patient in PatientDAOJSON(autosave=True).list_patients()] == [1, 2]
+
+
+def test_notes_of_other_processes_are_picked_up(workdir):
+    lock = FileLock('clinic/patients.lock')
+    first, second = NoteDAOPickle(autosave=True), NoteDAOPickle(autosave=True)
+    for note_dao in (first, second):
+        note_dao.lock = lock
+        note_dao.load_notes(1)
+    first.create_note('first')
+    first.create_note('second')
+    assert [note.text for note in second.list_notes()] == ['second', 'first']
+    first.update_note(1, 'edited')
+    first.delete_note(2)
+    assert second.refresh()
+    assert [note.text for note in second.list_notes()] == ['edited']
+    assert second.create_note('third').code == 3
+
+
+def test_only_one_process_compacts_at_a_time(workdir):
+    dao = PatientDAOJSON(autosave=True, journal=True, shared=True)
+    add(dao, 1, 'Ana Lima')
+    installing, go_on = threading.Event(), threading.Event()
+
+    def hold(patients):
+        installing.set()
+        go_on.wait(5)
+
+    first = PatientJournal('clinic/patients.json', on_snapshot=hold, lock_filename='clinic/patients.lock')
+    second = PatientJournal('clinic/patients.json', lock_filename='clinic/patients.lock')
+    first.compact({1: dao.search_patient(1)})
+    assert installing.wait(5)
+    # logged after the rotation, so the first compaction's install must not drop it
+    second.append_put(2, Patient(2, 'Bo Chen', '1980-05-05', '250', 'bo@example.com', 'x'))
+    second.compact({})
+    assert os.path.exists('clinic/patients.journal')
+    go_on.set()
+    first.wait()
+
+    assert [patient.phn for patient in PatientDAOJSON(autosave=True, journal=True).list_patients()] == [1, 2]
+    assert [name for name in os.listdir('clinic') if name.endswith('.tmp')] == []
+
+
+def shared_controller():
+    controller = Controller(autosave=True, journal=True, shared=True)
+    controller.login('user', '123456')
+    return controller
+
+
+def test_cached_results_are_dropped_after_reads_refreshed_the_dao(workdir):
+    first, second = shared_controller(), shared_controller()
+    first.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    assert [patient.phn for patient in second.retrieve_patients('lima')] == [1]
+
+    first.create_patient(2, 'Cy Lima', '1980-05-05', '250', 'c@b.c', 'x')
+    # an uncached read picks up the change before the cached query looks for it
+    assert second.search_patient(2) is not None
+    assert [patient.phn for patient in second.retrieve_patients('lima')] == [1, 2]
+
+
+def test_cached_notes_are_dropped_after_reads_refreshed_the_dao(workdir):
+    first, second = shared_controller(), shared_controller()
+    first.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    first.set_current_patient(1)
+    second.set_current_patient(1)
+    first.create_note('blood test')
+    assert [note.text for note in second.retrieve_notes('blood')] == ['blood test']
+
+    first.create_note('blood pressure')
+    assert second.search_note(2).text == 'blood pressure'
+    assert [note.text for note in second.retrieve_notes('blood')] == ['blood test', 'blood pressure']
+    assert [note.code for note in second.list_notes()] == [2, 1]
+
+
+WRITER = '''
+import sys
+sys.path.insert(0, {root!r})
+from clinic.dao.patient_dao_json import PatientDAOJSON
+dao = PatientDAOJSON(autosave=True, journal=True, shared=True)
+# compact every few changes, so the processes also compact at the same time
+dao.journal.threshold = 1024
+for phn in range({start}, {start} + 20):
+    dao.create_patient(phn, 'Patient %d' % phn, '1980-05-05', '250', 'a@b.c', 'x')
+    dao.open_patient(phn).create_note('note of %d' % phn)
+'''
+
+
+def test_processes_writing_at_once_lose_nothing(workdir):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    writers = [subprocess.Popen([sys.executable, '-c', WRITER.format(root=root, start=start)])
+        for start in (100, 200, 300)]
+    assert [writer.wait(60) for writer in writers] == [0, 0, 0]
+
+    dao = PatientDAOJSON(autosave=True, journal=True)
+    assert len(dao.list_patients()) == 60
+    assert [note.text for note in dao.open_patient(215).list_notes()] == ['note of 215']
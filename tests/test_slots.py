@@ -0,0 +1,55 @@
+import pickle
+from datetime import datetime
+
+import pytest
+
+from clinic.note import Note
+from clinic.patient import Patient
+
+
+class OldNote:
+    """A Note as it was before __slots__, with its fields in __dict__."""
+
+    def __init__(self, code, text, timestamp):
+        self.code = code
+        self.text = text
+        self.timestamp = timestamp
+
+
+def old_pickle(note):
+    """Pickle note the way a dict-backed clinic.note.Note was pickled."""
+    data = pickle.dumps(note, protocol=2)
+    return data.replace(f'{OldNote.__module__}\nOldNote\n'.encode(), b'clinic.note\nNote\n')
+
+
+def test_no_instance_dict():
+    note = Note(1, 'text')
+    patient = Patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    for value in (note, patient):
+        assert not hasattr(value, '__dict__')
+        with pytest.raises(AttributeError):
+            value.unknown = 1
+
+
+def test_notes_pickled_before_slots_still_load():
+    timestamp = datetime(2020, 1, 2, 3, 4)
+    note = pickle.loads(old_pickle(OldNote(3, 'old note', timestamp)))
+    assert isinstance(note, Note)
+    assert (note.code, note.text, note.timestamp) == (3, 'old note', timestamp)
+
+
+def test_slotted_notes_round_trip():
+    note = Note(4, 'new note', datetime(2021, 5, 6))
+    copy = pickle.loads(pickle.dumps(note))
+    assert copy == note and copy.timestamp == note.timestamp
+    # the (dict, slots) state of a pickle written by a class with both
+    restored = Note.__new__(Note)
+    restored.__setstate__((None, {'code': 5, 'text': 'both', 'timestamp': None}))
+    assert (restored.code, restored.text) == (5, 'both')
+
+
+def test_patient_record_is_created_on_first_use():
+    patient = Patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    assert patient._patient_record is None
+    assert patient.patient_record.phn == 1
+    assert patient._patient_record is not None
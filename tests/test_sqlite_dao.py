@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+from clinic.dao.patient_dao_json import PatientDAOJSON
+from clinic.dao.patient_dao_sqlite import PatientDAOSQLite
+from clinic.dao.sqlite_migration import migrate_to_sqlite
+from clinic.exception.illegal_operation_exception import IllegalOperationException
+
+NAMES = {1: 'Ana Lima', 2: 'Bo Chen', 3: 'Anabel Chenoweth', 4: 'Liam Nash'}
+
+
+def add(dao, phn, name):
+    return dao.create_patient(phn, name, '1980-05-05', '2505551234', f'{phn}@example.com', '2 Street')
+
+
+@pytest.fixture
+def dao(workdir):
+    dao = PatientDAOSQLite(autosave=True)
+    for phn, name in NAMES.items():
+        add(dao, phn, name)
+    return dao
+
+
+def test_patients_and_notes_are_stored(dao):
+    with pytest.raises(IllegalOperationException):
+        add(dao, 1, 'Someone Else')
+    dao.search_patient(2).create_note('x-ray booked')
+    dao.update_patient(2, 20, 'Bo Chen', '1980-05-05', '2505550000', 'bo@example.com', '2 Street')
+    dao.delete_patient(4)
+
+    reloaded = PatientDAOSQLite(autosave=True)
+    assert [patient.phn for patient in reloaded.list_patients()] == [1, 3, 20]
+    assert reloaded.search_patient(20).phone == '2505550000'
+    assert [note.text for note in reloaded.search_patient(20).list_notes()] == ['x-ray booked']
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('chen', [2, 3]), ('CHEN', [2, 3]), ('a l', [1]), ('an', [1, 3]), ('nash', [4]), ('lim', [1]),
+    ('mna', []), ('zzz', []), ('', [1, 2, 3, 4]),
+])
+def test_name_substring_search(dao, query, expected):
+    assert [patient.phn for patient in dao.retrieve_patients(query)] == expected
+
+
+def test_name_search_follows_updates_and_deletes(dao):
+    dao.update_patient(2, 5, 'Bo Smith', '1980-05-05', '2505551234', 'bo@example.com', '2 Street')
+    dao.delete_patient(3)
+
+    assert [patient.phn for patient in dao.retrieve_patients('chen')] == []
+    assert [patient.phn for patient in dao.retrieve_patients('smith')] == [5]
+    assert dao.connection.execute('SELECT count(*) FROM name_trigrams WHERE phn IN (2, 3)').fetchone()[0] == 0
+
+
+def test_name_search_uses_the_trigram_table(dao):
+    plan = ' '.join(str(row) for row in dao.connection.execute(
+        'EXPLAIN QUERY PLAN SELECT phn FROM name_trigrams WHERE gram IN (?, ?) GROUP BY phn', ('che', 'hen')))
+    assert 'SCAN name_trigrams' not in plan
+
+
+def test_old_database_gets_its_name_tables_filled(workdir):
+    connection = sqlite3.connect('clinic/clinic.db')
+    connection.execute('CREATE TABLE patients (phn INTEGER PRIMARY KEY, name TEXT NOT NULL, '
+        'name_folded TEXT NOT NULL, birth_date TEXT NOT NULL, phone TEXT NOT NULL, email TEXT NOT NULL, '
+        'address TEXT NOT NULL)')
+    connection.execute("INSERT INTO patients VALUES (1, 'Ana Lima', 'ana lima', '1980-05-05', '250', 'a@b', 'x')")
+    connection.commit()
+    connection.close()
+
+    dao = PatientDAOSQLite(autosave=True)
+    assert [patient.phn for patient in dao.retrieve_patients('lima')] == [1]
+    assert [patient.phn for patient in dao.retrieve_patients('ana lama', 'fuzzy')] == [1]
+
+
+def test_migration_copies_patients_notes_and_journal(workdir):
+    json_dao = PatientDAOJSON(autosave=True)
+    add(json_dao, 1, 'Ana Lima')
+    add(json_dao, 2, 'Bo Chen')
+    json_dao.search_patient(1).create_note('first visit')
+    # later changes that are only in the journal
+    journaled = PatientDAOJSON(autosave=True, journal=True)
+    add(journaled, 3, 'Anabel Chenoweth')
+    journaled.delete_patient(2)
+
+    assert migrate_to_sqlite() == (2, 1)
+    dao = PatientDAOSQLite(autosave=True)
+    assert [patient.phn for patient in dao.list_patients()] == [1, 3]
+    assert [patient.phn for patient in dao.retrieve_patients('chen')] == [3]
+    assert [note.text for note in dao.search_patient(1).list_notes()] == ['first visit']
@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_by(code):
+    """The modules loaded by running code in a fresh interpreter."""
+    result = subprocess.run([sys.executable, '-c', code + '\nimport sys\nprint("\\n".join(sys.modules))'],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+@pytest.mark.parametrize('entry_point', ['clinic.__main__', 'clinic.cli.clinic_cli'])
+def test_cli_does_not_load_the_gui_or_sqlite(entry_point):
+    modules = imported_by(f'import {entry_point}')
+    assert not any(name.startswith(('PyQt6', 'clinic.gui', 'sqlite3', 'clinic.server')) for name in modules)
+
+
+def test_wrong_arguments_print_usage_without_loading_any_mode():
+    result = subprocess.run([sys.executable, '-m', 'clinic'], cwd=ROOT, capture_output=True, text=True)
+    assert 'cli, gui or serve' in result.stdout
+
+
+def test_other_backends_are_imported_on_demand():
+    modules = imported_by('import clinic.controller')
+    assert 'clinic.dao.patient_dao_sqlite' not in modules
+    assert 'clinic.dao.patient_dao_indexed' not in modules
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def pool(qapp):
+    from clinic.gui.worker import WorkerPool
+    pool = WorkerPool()
+    yield pool
+    pool.wait()
+
+
+def settle(qapp, pool):
+    """Wait for the pool, then deliver the callbacks it queued for the GUI thread."""
+    pool.wait()
+    qapp.processEvents()
+
+
+def test_calls_run_off_the_gui_thread_one_at_a_time(qapp, pool):
+    threads, results = [], []
+
+    def call(value):
+        threads.append(threading.current_thread())
+        return value * 2
+
+    for value in range(5):
+        pool.submit(call, value, on_done=results.append)
+    settle(qapp, pool)
+    assert results == [0, 2, 4, 6, 8]
+    assert threading.main_thread() not in threads
+    assert len(set(threads)) == 1
+
+
+def test_errors_go_to_on_error(qapp, pool):
+    errors = []
+
+    def fail():
+        raise ValueError('no such patient')
+
+    pool.submit(fail, on_done=pytest.fail, on_error=errors.append)
+    settle(qapp, pool)
+    assert [str(error) for error in errors] == ['no such patient']
+
+
+def test_busy_while_calls_are_in_flight(qapp, pool):
+    busy = []
+    pool.busy_changed.connect(busy.append)
+    pool.submit(lambda: None)
+    pool.submit(lambda: None)
+    settle(qapp, pool)
+    assert busy == [True, False]
+    assert pool.in_flight == 0
+
+
+def test_window_searches_notes_in_the_background(qapp, workdir, monkeypatch):
+    from PyQt6.QtWidgets import QMessageBox
+    from clinic.gui.clinic_gui import ClinicGUI
+    messages = []
+    monkeypatch.setattr(QMessageBox, 'information', lambda parent, title, text: messages.append(text))
+    monkeypatch.setattr(QMessageBox, 'warning', lambda parent, title, text: messages.append(text))
+    window = ClinicGUI()
+    controller = window.controller
+    controller.login('user', '123456')
+    controller.create_patient(1, 'Ana Lima', '1980-05-05', '250', 'a@b.c', 'x')
+    controller.set_current_patient(1)
+    for text in ('Blood pressure high', 'Bloodwork pending', 'Knee pain'):
+        controller.create_note(text)
+    window.init_record_screen(1, 'Ana Lima')
+    settle(qapp, window.pool)
+    assert window.note_model.rowCount() == 3
+
+    # by default the text is found anywhere in the notes
+    window.text_note_retrieve.setText('ee pa')
+    window.retrieve_notes_clicked()
+    settle(qapp, window.pool)
+    assert [note.code for note in window.note_model._notes] == [3]
+    window.text_note_retrieve.setText('pressure blood')
+    window.retrieve_notes_clicked()
+    settle(qapp, window.pool)
+    assert messages == ['No notes found with that text.']
+    messages.clear()
+    # words starting with the search words, in any order, come from the note index
+    window.check_note_words.setChecked(True)
+    window.retrieve_notes_clicked()
+    settle(qapp, window.pool)
+    assert [note.code for note in window.note_model._notes] == [1]
+    window.text_note_retrieve.setText('blood')
+    window.retrieve_notes_clicked()
+    settle(qapp, window.pool)
+    assert [note.code for note in window.note_model._notes] == [1, 2]
+    assert messages == []
+    window.pool.wait()
+    controller.logout()
+
+
+def test_window_restores_a_search_result_that_failed_to_delete(qapp, workdir, monkeypatch):
+    from PyQt6.QtWidgets import QMessageBox
+    from clinic.gui.clinic_gui import ClinicGUI
+    from clinic.exception.illegal_operation_exception import IllegalOperationException
+    messages = []
+    monkeypatch.setattr(QMessageBox, 'information', lambda parent, title, text: messages.append(text))
+    monkeypatch.setattr(QMessageBox, 'warning', lambda parent, title, text: messages.append(text))
+    window = ClinicGUI()
+    controller = window.controller
+    controller.login('user', '123456')
+    for phn in (1, 2, 3):
+        controller.create_patient(phn, f'Patient {phn}', '1980-05-05', '250', 'a@b.c', 'x')
+    window.manage_patients_clicked()
+    settle(qapp, window.pool)
+    window.show_found_patients([controller.search_patient(3), controller.search_patient(1)])
+
+    def refuse(phn):
+        raise IllegalOperationException('cannot delete')
+    monkeypatch.setattr(controller, 'delete_patient', refuse)
+    window.patient_table.setCurrentIndex(window.patient_model.index(0, 0))
+    window.delete_patient_clicked()
+    assert window.patient_model.rowCount() == 1
+    settle(qapp, window.pool)
+    assert [window.patient_model.patient_at(row).phn for row in range(2)] == [3, 1]
+    assert messages == ['An error occurred: cannot delete']
+    window.pool.wait()
+    controller.logout()